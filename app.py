@@ -2,10 +2,17 @@ from __future__ import annotations
 
 import streamlit as st
 
+import piece_table
+import profiling
+import project_store
 from auth import is_authenticated, login_form, logout, current_user
 from ui import inject_global_css, header, render_toast
 
 from pages_cadastro_obras import page_cadastro_obras
+from pages_d5 import page_d5
+from pages_desempenho import render_profiling_panel
+from pages_formas import page_formas
+from pages_gargalos import page_gargalos
 from pages_pecas import page_pecas
 from pages_programacao import page_programacao
 from pages_usuarios import page_usuarios
@@ -13,11 +20,26 @@ from pages_usuarios import page_usuarios
 
 ASSETS = "assets"
 LOGO = f"{ASSETS}/logo_transparente.png"
+RECENT_TRACES = 10
 
 BASE_PAGES = {
     "Obras": page_cadastro_obras,
     "Peças": page_pecas,
+    "Formas": page_formas,
     "Mix de Produção": page_programacao,
+    "D-5": page_d5,
+    "Gargalos": page_gargalos,
+}
+
+# tabelas do disco (project_store) que cada página usa; carregadas só ao abrir a página
+PAGE_TABLES = {
+    "Obras": ("df_obras_etapas",),            # sequências: só o CT aberto (project_store.load_cts)
+    "Peças": ("df_capacidade",),              # peças: só o CT filtrado na Consulta, ou tudo em "(todos)"
+    "Formas": ("df_formas",),
+    "Mix de Produção": ("df_pecas", "df_seq_montagem", "df_formas", "df_capacidade"),
+    "D-5": (),
+    "Gargalos": (),
+    "Usuários": (),
 }
 
 
@@ -69,7 +91,21 @@ def page_shell() -> None:
         page_side = st.radio("Navegação", list(pages.keys()), index=list(pages.keys()).index(page_name), label_visibility="collapsed")
         st.session_state["nav_page"] = page_side
 
-    pages[st.session_state["nav_page"]]()
+    # cada rerun vira um trace (profiling); o st.rerun() da página também passa pelo finally
+    traces = st.session_state.setdefault("profiling_traces", [])
+    try:
+        with profiling.trace(st.session_state["nav_page"]) as tr:
+            with profiling.span("Carga do armazenamento"):
+                project_store.hydrate(st.session_state, PAGE_TABLES.get(st.session_state["nav_page"], ()))
+                # exclusões de peças: a versão compactada substitui df_pecas
+                piece_table.sync(st.session_state, build=False)
+            pages[st.session_state["nav_page"]]()
+    finally:
+        traces.append(tr)
+        del traces[:-RECENT_TRACES]
+
+    if u.role == "admin":
+        render_profiling_panel(traces)
 
 
 def main() -> None:
@@ -0,0 +1,4 @@
+"""Benchmarks do motor de programação (fora do app).
+
+Uso: ``python -m bench.run_scheduler --sizes 1000 10000 100000``
+"""
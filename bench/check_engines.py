@@ -0,0 +1,170 @@
+"""Confere que os motores e a reprogramação incremental batem com a referência ``"python"``.
+
+    python -m bench.check_engines
+
+Em fábricas sintéticas (``bench.synthetic.generate``, sementes fixas) compara,
+com a tolerância de arredondamento de ponto flutuante, o mix diário, as
+pendências e a capacidade por linha de:
+
+- cada motor de ``scheduler.ENGINES`` contra ``engine="python"``;
+- ``build_mix_incremental`` (a partir da execução anterior, após alterar peças,
+  janelas ou capacidade) contra o mix completo das novas entradas.
+
+Sai com código 1 se algum caso divergir.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+
+import scheduler
+from bench.synthetic import capacity_for_load, generate
+from name_sets import materialize
+
+
+RTOL = 1e-7
+ATOL = 1e-7
+
+
+def _diff(a: Optional[pd.DataFrame], b: Optional[pd.DataFrame]) -> Optional[str]:
+    if a is None or b is None:
+        return None if a is None and b is None else "tabela ausente em um dos lados"
+    try:
+        pd.testing.assert_frame_equal(
+            a.reset_index(drop=True), b.reset_index(drop=True),
+            check_exact=False, rtol=RTOL, atol=ATOL, check_dtype=False,
+        )
+    except AssertionError as e:
+        return str(e).strip().splitlines()[0]
+    return None
+
+
+def compare(out: scheduler.MixOutputs, ref: scheduler.MixOutputs) -> List[str]:
+    """Diferenças entre dois resultados (vazio = iguais)."""
+    checks = [
+        ("mix", materialize(out.mix_diario, out.name_sets), materialize(ref.mix_diario, ref.name_sets)),
+        ("pendências", out.pendencias, ref.pendencias),
+        ("capacidade", out.capacidade, ref.capacidade),
+    ]
+    out_diffs = []
+    for name, a, b in checks:
+        d = _diff(a, b)
+        if d is not None:
+            out_diffs.append(f"{name}: {d}")
+    return out_diffs
+
+
+def _factory(seed: int, n_pecas: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    return generate(n_pecas=n_pecas, n_ct=6, n_etapas=2, n_seq=5, n_setups=8, horizon_days=240, seed=seed)
+
+
+def _lines(df_seq: pd.DataFrame) -> pd.DataFrame:
+    """Duas linhas sem restrição de tipologia, um feriado e um sábado trabalhado."""
+    start = pd.to_datetime(df_seq["DATA_INICIO_PRODUÇÃO"], dayfirst=True).min().normalize()
+    holiday = start + pd.offsets.BDay(15)
+    saturday = start + pd.offsets.Week(5, weekday=5)
+    return pd.DataFrame([
+        {"LINHA": "L1", "CAPACIDADE_M3_DIA": 0.6},
+        {"LINHA": "L2", "CAPACIDADE_M3_DIA": 0.4},
+        {"LINHA": "", "CAPACIDADE_M3_DIA": 0.0, "DATA_INICIO": holiday.strftime("%d/%m/%Y")},
+        {"LINHA": "L1", "CAPACIDADE_M3_DIA": 0.3, "DATA_INICIO": saturday.strftime("%d/%m/%Y")},
+    ])
+
+
+def _scaled(lines: Optional[pd.DataFrame], cap: float) -> Optional[pd.DataFrame]:
+    if lines is None:
+        return None
+    return lines.assign(CAPACIDADE_M3_DIA=lines["CAPACIDADE_M3_DIA"] * cap)
+
+
+# ---- alterações aplicadas entre a execução anterior e a incremental
+def _more_volume(p: pd.DataFrame, s: pd.DataFrame, cap: float) -> Tuple[pd.DataFrame, pd.DataFrame, float]:
+    p = p.copy()
+    i = p.index[len(p) * 2 // 3]
+    p.loc[i, "VOLUME (M3)"] = p.loc[i, "VOLUME (M3)"] * 3 + 5
+    p.loc[p.index[len(p) // 2], "NOME PEÇA"] = "NOVA"
+    return p, s, cap
+
+
+def _drop_ct(p: pd.DataFrame, s: pd.DataFrame, cap: float) -> Tuple[pd.DataFrame, pd.DataFrame, float]:
+    ct = sorted(p["CT"].unique())[-1]
+    return p[p["CT"] != ct], s, cap
+
+
+def _shift_window(p: pd.DataFrame, s: pd.DataFrame, cap: float) -> Tuple[pd.DataFrame, pd.DataFrame, float]:
+    s = s.copy()
+    i = s.index[len(s) // 2]
+    for c in ["DATA_INICIO_PRODUÇÃO", "DATA_FIM_PRODUÇÃO"]:
+        d = pd.to_datetime(s[c], dayfirst=True) + pd.Timedelta(days=9)
+        s.loc[i, c] = d.loc[i].strftime("%d/%m/%Y") if isinstance(s.loc[i, c], str) else d.loc[i]
+    return p, s, cap
+
+
+def _less_capacity(p: pd.DataFrame, s: pd.DataFrame, cap: float) -> Tuple[pd.DataFrame, pd.DataFrame, float]:
+    return p, s, cap * 0.8
+
+
+CHANGES: List[Tuple[str, Callable]] = [
+    ("volume", _more_volume),
+    ("remove CT", _drop_ct),
+    ("janela", _shift_window),
+    ("capacidade", _less_capacity),
+]
+
+
+def run(seeds: List[int], n_pecas: int, loads: List[float]) -> int:
+    """Roda todos os casos; devolve o número de divergências."""
+    bad = 0
+
+    def report(case: str, diffs: List[str]) -> None:
+        nonlocal bad
+        status = "ok" if not diffs else "DIVERGE"
+        print(f"{case:<60} {status}")
+        for d in diffs:
+            print(f"    {d}")
+        bad += bool(diffs)
+
+    for seed in seeds:
+        p, s = _factory(seed, n_pecas)
+        for load in loads:
+            for bd in (True, False):
+                cap = capacity_for_load(p, s, load, bd)
+                for with_lines in (False, True):
+                    lines = _lines(s) if with_lines else None
+                    tag = f"seed={seed} carga={load:g} {'úteis' if bd else 'corridos'}{' linhas' if with_lines else ''}"
+                    ref = scheduler.build_mix_diario_simple(p, s, cap, bd, engine="python", capacidade_linhas=_scaled(lines, cap))
+                    for engine in scheduler.ENGINES:
+                        if engine == "python":
+                            continue
+                        out = scheduler.build_mix_diario_simple(p, s, cap, bd, engine=engine, capacidade_linhas=_scaled(lines, cap))
+                        report(f"{tag} {engine}", compare(out, ref))
+
+                    first, state = scheduler.build_mix_incremental(p, s, cap, bd, capacidade_linhas=_scaled(lines, cap))
+                    report(f"{tag} incremental (sem anterior)", compare(first, ref))
+                    for name, change in CHANGES:
+                        p2, s2, cap2 = change(p, s, cap)
+                        out, _ = scheduler.build_mix_incremental(
+                            p2, s2, cap2, bd, previous=state, capacidade_linhas=_scaled(lines, cap2),
+                        )
+                        full = scheduler.build_mix_diario_simple(p2, s2, cap2, bd, engine="python", capacidade_linhas=_scaled(lines, cap2))
+                        report(f"{tag} incremental ({name})", compare(out, full))
+    return bad
+
+
+def main(argv: List[str] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    ap.add_argument("--pecas", type=int, default=1_500)
+    ap.add_argument("--loads", type=float, nargs="+", default=[0.7, 1.3], help="ocupação alvo (> 1 gera pendências)")
+    args = ap.parse_args(argv)
+
+    bad = run(args.seeds, args.pecas, args.loads)
+    print(f"{bad} divergência(s)")
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Mede o motor de programação por fase em fábricas sintéticas de tamanhos crescentes.
+
+    python -m bench.run_scheduler --sizes 1000 10000 100000 --engines numpy eventos
+
+Grava um JSON (``--out``) com tempos por fase, pico de memória e tamanho da
+saída de cada execução, para comparar curvas de escala entre versões.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import scheduler
+from bench.synthetic import capacity_for_load, generate
+
+
+RESULTS_DIR = Path("bench") / "results"
+
+_ALLOCATORS: Dict[str, Callable] = {
+    "python": scheduler._allocate_python,
+    "numpy": scheduler._allocate_numpy,
+    "eventos": scheduler._allocate_events,
+}
+
+
+def run_once(df_pecas: pd.DataFrame, df_seq: pd.DataFrame, capacidade: float, engine: str, business_days: bool = True) -> dict:
+    """Executa o pipeline do ``build_mix_diario_simple`` cronometrando cada fase."""
+    phases: Dict[str, float] = {}
+
+    t = time.perf_counter()
+    norm = scheduler._normalize(df_pecas, df_seq)
+    phases["normalizacao"] = time.perf_counter() - t
+    if isinstance(norm, scheduler.MixOutputs):
+        return {"phases": phases, "skipped": "nada a programar"}
+
+    t = time.perf_counter()
+    prep = scheduler._build_lots(*norm, use_business_days=business_days)
+    phases["lotes"] = time.perf_counter() - t
+    if isinstance(prep, scheduler.MixOutputs):
+        return {"phases": phases, "skipped": "nada a programar"}
+
+    t = time.perf_counter()
+    mix_df, pend_rest = _ALLOCATORS[engine](prep, float(capacidade))
+    phases["alocacao"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    mix_diario, _ = scheduler._aggregate_day_setup(mix_df, prep)
+    phases["agregacao"] = time.perf_counter() - t
+
+    phases["total"] = sum(phases.values())
+    return {
+        "phases": phases,
+        "lots": int(len(prep.lots)),
+        "days": int(len(prep.days)),
+        "mix_rows": int(len(mix_diario)),
+        "pendencias": int(len(prep.pend) + len(pend_rest)),
+        "volume_alocado": float(mix_diario["Volume"].sum()) if not mix_diario.empty else 0.0,
+    }
+
+
+def peak_memory_mb(df_pecas: pd.DataFrame, df_seq: pd.DataFrame, capacidade: float, engine: str, business_days: bool = True) -> float:
+    """Pico de memória Python (tracemalloc) de uma execução completa, em MB."""
+    tracemalloc.start()
+    try:
+        run_once(df_pecas, df_seq, capacidade, engine, business_days)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main(argv: List[str] = None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    ap.add_argument("--engines", nargs="+", default=["eventos"], choices=list(scheduler.ENGINES))
+    ap.add_argument("--ct", type=int, default=10)
+    ap.add_argument("--etapas", type=int, default=3)
+    ap.add_argument("--seq", type=int, default=6)
+    ap.add_argument("--setups", type=int, default=12)
+    ap.add_argument("--horizon", type=int, default=365, help="horizonte em dias corridos")
+    ap.add_argument("--capacidade", type=float, default=None, help="m³/dia (padrão: derivada de --load)")
+    ap.add_argument("--load", type=float, default=0.9, help="ocupação alvo quando --capacidade não é dada")
+    ap.add_argument("--calendar-days", action="store_true", help="usa dias corridos em vez de dias úteis")
+    ap.add_argument("--repeat", type=int, default=3, help="repetições (vale a menor)")
+    ap.add_argument("--no-memory", action="store_true", help="não mede pico de memória (mais rápido)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", type=Path, default=None)
+    args = ap.parse_args(argv)
+
+    business_days = not args.calendar_days
+    results = []
+    for n in args.sizes:
+        df_pecas, df_seq = generate(
+            n_pecas=n, n_ct=args.ct, n_etapas=args.etapas, n_seq=args.seq,
+            n_setups=args.setups, horizon_days=args.horizon, seed=args.seed,
+        )
+        cap = args.capacidade if args.capacidade is not None else capacity_for_load(df_pecas, df_seq, args.load, business_days)
+        for engine in args.engines:
+            runs = [run_once(df_pecas, df_seq, cap, engine, business_days) for _ in range(max(args.repeat, 1))]
+            best = min(runs, key=lambda r: r["phases"].get("total", np.inf))
+            rec = {"pecas": n, "engine": engine, "capacidade": cap, **best}
+            if not args.no_memory:
+                rec["peak_mb"] = peak_memory_mb(df_pecas, df_seq, cap, engine, business_days)
+            results.append(rec)
+            ph = rec["phases"]
+            print(
+                f"{n:>9} {engine:<8} total={ph.get('total', 0):8.3f}s  "
+                + "  ".join(f"{k}={v:.3f}" for k, v in ph.items() if k != "total")
+                + (f"  pico={rec['peak_mb']:.1f}MB" if "peak_mb" in rec else "")
+            )
+
+    out = args.out or RESULTS_DIR / f"scheduler-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "engine_version": scheduler.ENGINE_VERSION,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "params": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "results": results,
+    }
+    out.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"resultados: {out}")
+
+
+if __name__ == "__main__":
+    main()
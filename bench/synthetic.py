@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+TIPOLOGIAS = ["VIGA", "PILAR", "LAJE", "TERÇA", "PAINEL"]
+ARMACOES = ["ARMADA", "PROTENDIDA"]
+FUNDOS = [20, 30, 40, 50, 60]
+LATERAIS = [40, 50, 60, 70, 80, 90]
+
+
+def generate(
+    n_pecas: int = 10_000,
+    n_ct: int = 10,
+    n_etapas: int = 3,
+    n_seq: int = 6,
+    n_setups: int = 12,
+    horizon_days: int = 365,
+    max_gap_days: int = 10,
+    start: str = "2026-01-05",
+    seed: int = 0,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Fábrica sintética: (df_pecas, df_seq_montagem) no formato das páginas.
+
+    Cada CT/ETAPA começa num dia aleatório do primeiro terço do horizonte e
+    divide o restante entre as sequências (com folgas de até ``max_gap_days``).
+    Cada peça recebe um dos ``n_setups`` setups (tipologia, armação, fundo, lateral).
+    """
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp(start)
+
+    # ---- janelas das sequências
+    n_stages = n_ct * n_etapas
+    ct_of = np.repeat(np.arange(n_ct), n_etapas)
+    et_of = np.tile(np.arange(n_etapas), n_ct)
+    offset = rng.integers(0, max(horizon_days // 3, 1), n_stages)
+    span = np.maximum((horizon_days - offset) // n_seq, 2)
+
+    st_idx = np.repeat(np.arange(n_stages), n_seq)
+    sq_idx = np.tile(np.arange(n_seq), n_stages)
+    gap = rng.integers(0, max_gap_days + 1, len(st_idx))
+    dur = np.maximum(span[st_idx] - gap, 1)
+    ini = offset[st_idx] + sq_idx * span[st_idx]
+    df_seq = pd.DataFrame({
+        "CT": _labels("CT-", ct_of[st_idx]),
+        "ETAPA": _labels("E", et_of[st_idx] + 1, width=1),
+        "SEQUENCIA": (sq_idx + 1).astype(str),
+        "VOLUME": 0.0,
+        "DATA_INICIO_PRODUÇÃO": base + pd.to_timedelta(ini, unit="D"),
+        "DATA_FIM_PRODUÇÃO": base + pd.to_timedelta(ini + dur, unit="D"),
+    })
+
+    # ---- setups disponíveis
+    combos = np.array(np.meshgrid(
+        np.arange(len(TIPOLOGIAS)), np.arange(len(ARMACOES)), np.arange(len(FUNDOS)), np.arange(len(LATERAIS)),
+        indexing="ij",
+    )).reshape(4, -1).T
+    setups = combos[rng.choice(len(combos), size=min(n_setups, len(combos)), replace=False)]
+
+    # ---- peças
+    seq_of = rng.integers(0, len(st_idx), n_pecas)
+    su = setups[rng.integers(0, len(setups), n_pecas)]
+    qtde = rng.integers(1, 5, n_pecas)
+    df_pecas = pd.DataFrame({
+        "CT": _labels("CT-", ct_of[st_idx[seq_of]]),
+        "ETAPA": _labels("E", et_of[st_idx[seq_of]] + 1, width=1),
+        "SEQUENCIA": (sq_idx[seq_of] + 1).astype(str),
+        "NOME PEÇA": _labels("P", np.arange(n_pecas), width=7),
+        "TIPOLOGIA": np.asarray(TIPOLOGIAS, dtype=object)[su[:, 0]],
+        "TIPO ARMAÇÃO": np.asarray(ARMACOES, dtype=object)[su[:, 1]],
+        "FUNDO (CM)": np.asarray(FUNDOS)[su[:, 2]],
+        "LATERAL (CM)": np.asarray(LATERAIS)[su[:, 3]],
+        "QTDE": qtde,
+        "COMPRIMENTO (M)": rng.uniform(3, 15, n_pecas).round(2),
+        "VOLUME (M3)": (qtde * rng.uniform(0.2, 2.5, n_pecas)).round(3),
+    })
+    return df_pecas, df_seq
+
+
+def capacity_for_load(df_pecas: pd.DataFrame, df_seq: pd.DataFrame, load: float = 0.9, business_days: bool = True) -> float:
+    """Capacidade diária (m³) para que a demanda total ocupe ``load`` do horizonte."""
+    start = pd.to_datetime(df_seq["DATA_INICIO_PRODUÇÃO"]).min()
+    end = pd.to_datetime(df_seq["DATA_FIM_PRODUÇÃO"]).max()
+    n_days = len(pd.bdate_range(start, end) if business_days else pd.date_range(start, end))
+    return float(pd.to_numeric(df_pecas["VOLUME (M3)"]).sum()) / max(n_days, 1) / max(load, 1e-6)
+
+
+def _labels(prefix: str, ids: np.ndarray, width: int = 3) -> np.ndarray:
+    return np.char.add(prefix, np.char.zfill(np.asarray(ids).astype(str), width)).astype(object)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+TOP_N = 20
+SATURATED_PCT = 99.9   # dia "cheio": utilização a partir deste valor
+
+
+@dataclass
+class Bottlenecks:
+    """Indicadores de gargalo do mix, calculados uma vez na geração.
+
+    - ``daily``: índice Data; Volume (m³), Capacidade (m³), Utilização (%),
+      Setups e, com mapa de formas, Qtd Pistas;
+    - ``pend_ct``: índice CT; volume pendente, participação, sequências e motivo principal;
+    - ``top``: os ``TOP_N`` dias de maior utilização (ver ``top_days``).
+    """
+    daily: pd.DataFrame
+    pend_ct: pd.DataFrame
+    top: pd.DataFrame
+
+    @property
+    def pending_total(self) -> float:
+        return float(self.pend_ct["Volume pendente (m³)"].sum()) if not self.pend_ct.empty else 0.0
+
+
+def top_days(daily: pd.DataFrame, n: int = TOP_N, col: str = "Utilização (%)") -> pd.DataFrame:
+    """Os ``n`` dias com maior ``col`` (seleção parcial com argpartition; só os ``n`` são ordenados)."""
+    if daily is None or daily.empty or n <= 0:
+        return daily.iloc[:0] if daily is not None else pd.DataFrame()
+    v = daily[col].to_numpy(dtype=float)
+    k = min(int(n), len(v))
+    kth = v[np.argpartition(-v, k - 1)[k - 1]]
+    # empates no k-ésimo valor: ficam os dias mais cedo (como numa ordenação estável)
+    above = np.flatnonzero(v > kth)
+    tied = np.flatnonzero(v == kth)[: k - len(above)]
+    idx = np.concatenate([above, tied])
+    idx = idx[np.lexsort((idx, -v[idx]))]
+    return daily.iloc[idx]
+
+
+def _daily(mix_diario: pd.DataFrame, df_linhas: Optional[pd.DataFrame], capacidade_m3_dia: float) -> pd.DataFrame:
+    cols = ["Volume (m³)", "Capacidade (m³)", "Utilização (%)", "Setups"]
+    if df_linhas is not None and not df_linhas.empty:
+        d = df_linhas.groupby("Data", sort=True)[["Volume (m³)", "Capacidade (m³)"]].sum()
+        d.index = pd.to_datetime(d.index)
+    elif mix_diario is not None and not mix_diario.empty:
+        v = mix_diario.groupby(pd.to_datetime(mix_diario["Data"]), sort=True)["Volume"].sum()
+        d = pd.DataFrame({"Volume (m³)": v, "Capacidade (m³)": float(capacidade_m3_dia)})
+    else:
+        return pd.DataFrame(columns=cols, index=pd.DatetimeIndex([], name="Data"))
+    d.index.name = "Data"
+
+    cap = d["Capacidade (m³)"].to_numpy(dtype=float)
+    vol = d["Volume (m³)"].to_numpy(dtype=float)
+    d["Utilização (%)"] = np.where(cap > 0, vol / np.where(cap > 0, cap, 1.0) * 100.0, 0.0)
+
+    d["Setups"] = 0
+    if mix_diario is not None and not mix_diario.empty:
+        md = mix_diario.assign(Data=pd.to_datetime(mix_diario["Data"]))
+        g = md.groupby("Data", sort=False)
+        d["Setups"] = g["Setup"].nunique().reindex(d.index, fill_value=0).astype(int)
+        if "Qtd Pistas" in md.columns:
+            d["Qtd Pistas"] = g["Qtd Pistas"].sum().reindex(d.index, fill_value=0).astype(int)
+    return d
+
+
+def _pend_ct(pendencias: Optional[pd.DataFrame]) -> pd.DataFrame:
+    cols = ["Volume pendente (m³)", "Participação (%)", "Sequências", "Motivo principal"]
+    empty = pd.DataFrame(columns=cols, index=pd.Index([], name="CT"))
+    if pendencias is None or pendencias.empty or "VOLUME_RESTANTE_M3" not in pendencias.columns:
+        return empty
+    p = pendencias[pendencias["VOLUME_RESTANTE_M3"].fillna(0) > 0]
+    if p.empty or "CT" not in p.columns:
+        return empty
+    p = p.assign(CT=p["CT"].astype(str), _SEQ=p["ETAPA"].astype(str) + "|" + p["SEQUENCIA"].astype(str))
+    g = p.groupby("CT", sort=False)
+    out = pd.DataFrame({
+        "Volume pendente (m³)": g["VOLUME_RESTANTE_M3"].sum(),
+        "Sequências": g["_SEQ"].nunique(),
+    })
+    # motivo com mais volume em cada CT
+    by_motivo = p.groupby(["CT", "MOTIVO"], sort=False)["VOLUME_RESTANTE_M3"].sum().reset_index()
+    main = by_motivo.loc[by_motivo.groupby("CT", sort=False)["VOLUME_RESTANTE_M3"].idxmax()].set_index("CT")["MOTIVO"]
+    out["Motivo principal"] = main.reindex(out.index)
+    total = float(out["Volume pendente (m³)"].sum())
+    out["Participação (%)"] = out["Volume pendente (m³)"] / total * 100.0 if total > 0 else 0.0
+    out = out.sort_values("Volume pendente (m³)", ascending=False)
+    out.index.name = "CT"
+    return out[cols]
+
+
+def build_bottlenecks(
+    mix_diario: pd.DataFrame,
+    df_linhas: Optional[pd.DataFrame],
+    pendencias: Optional[pd.DataFrame],
+    capacidade_m3_dia: float,
+) -> Bottlenecks:
+    """Utilização por dia, setups por dia, dias mais carregados e pendências por CT.
+
+    ``df_linhas`` é ``MixOutputs.capacidade`` (capacidade e volume por dia e
+    linha); sem ela, a capacidade é ``capacidade_m3_dia`` em todos os dias.
+    """
+    daily = _daily(mix_diario, df_linhas, capacidade_m3_dia)
+    return Bottlenecks(daily=daily, pend_ct=_pend_ct(pendencias), top=top_days(daily, TOP_N))
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from constants import REQUIRED_CAPACIDADE_COLS as CAPACIDADE_COLS
+from formas_index import parse_tipos
+
+if TYPE_CHECKING:
+    from factory_calendar import FactoryCalendar
+
+
+DEFAULT_LINE = "Geral"
+
+
+@dataclass
+class CapacityModel:
+    """Capacidade (m³) por linha de produção e dia do calendário do mix.
+
+    ``cap[l, d]`` é a capacidade da linha ``l`` no dia ``days[d]``; ``tipos[l]``
+    são as tipologias que a linha aceita (vazio = todas).
+    """
+    lines: List[str]
+    cap: np.ndarray
+    tipos: List[FrozenSet[str]]
+    days: pd.DatetimeIndex
+    _masks: Dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+
+    @property
+    def uniform(self) -> bool:
+        """Todas as linhas aceitam todas as tipologias: equivale a um único pool por dia."""
+        return all(not t for t in self.tipos)
+
+    def total(self) -> np.ndarray:
+        """Capacidade total por dia (todas as linhas)."""
+        return self.cap.sum(axis=0)
+
+    def mask(self, tipologia: str) -> np.ndarray:
+        """Linhas que aceitam a tipologia."""
+        key = str(tipologia).strip().upper()
+        m = self._masks.get(key)
+        if m is None:
+            m = np.array([not t or key in t for t in self.tipos], dtype=bool)
+            self._masks[key] = m
+        return m
+
+    def fill_in_order(self, used: np.ndarray) -> np.ndarray:
+        """Distribui o volume usado por dia pelas linhas, na ordem da tabela (pool único)."""
+        cum = np.cumsum(self.cap, axis=0)
+        return np.clip(used[None, :] - (cum - self.cap), 0.0, self.cap)
+
+    def frame(self, used: np.ndarray) -> pd.DataFrame:
+        """Tabela longa Data x Linha com capacidade e volume usado (``used`` no formato de ``cap``)."""
+        n_lines, n_days = self.cap.shape
+        return pd.DataFrame({
+            "Data": np.tile(self.days.date, n_lines),
+            "Linha": np.repeat(np.asarray(self.lines, dtype=object), n_days),
+            "Capacidade (m³)": self.cap.ravel(),
+            "Volume (m³)": used.ravel(),
+        })
+
+
+def normalize_capacidade(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Padroniza a tabela de capacidade (nomes de coluna, datas e números)."""
+    if df is None:
+        return pd.DataFrame(columns=CAPACIDADE_COLS)
+    d = df.copy()
+    d.columns = [str(c).strip().upper().replace(" ", "_") for c in d.columns]
+    for c in CAPACIDADE_COLS:
+        if c not in d.columns:
+            d[c] = None
+    d["LINHA"] = d["LINHA"].fillna("").astype(str).str.strip()
+    d["CAPACIDADE_M3_DIA"] = pd.to_numeric(d["CAPACIDADE_M3_DIA"], errors="coerce")
+    for c in ["DATA_INICIO", "DATA_FIM"]:
+        d[c] = pd.to_datetime(d[c], errors="coerce", dayfirst=True).dt.normalize()
+    d = d[d["CAPACIDADE_M3_DIA"].notna() & (d["CAPACIDADE_M3_DIA"] >= 0)]
+    return d[CAPACIDADE_COLS].reset_index(drop=True)
+
+
+def build_capacity_model(
+    df_capacidade: Optional[pd.DataFrame],
+    days: pd.DatetimeIndex,
+    default_m3_dia: float,
+    calendar: Optional["FactoryCalendar"] = None,
+) -> CapacityModel:
+    """Monta a matriz linha x dia a partir da tabela de capacidade.
+
+    Regras (linhas da tabela aplicadas na ordem; a última vence):
+    - sem datas: capacidade padrão da LINHA em todos os dias (e define as
+      TIPOLOGIAS aceitas por ela);
+    - com DATA_INICIO/DATA_FIM: sobrepõe a capacidade no intervalo (turno
+      extra, turno reduzido; 0 = feriado/parada). Uma data só vale para um dia;
+    - LINHA vazia com datas: vale para todas as linhas (feriado/parada da fábrica).
+
+    Sem nenhuma linha cadastrada, usa uma linha única com ``default_m3_dia``.
+    Com ``calendar``, a capacidade padrão só vale nos dias normais da semana: um
+    dia extra (sábado com turno) tem só a capacidade das linhas com data nele.
+    """
+    d = normalize_capacidade(df_capacidade)
+    base = d[d["DATA_INICIO"].isna() & d["DATA_FIM"].isna() & (d["LINHA"] != "")]
+
+    lines: List[str] = list(dict.fromkeys(base["LINHA"]))
+    if not lines:
+        lines = [DEFAULT_LINE]
+    row_of = {ln: i for i, ln in enumerate(lines)}
+    n_days = len(days)
+    cap = np.zeros((len(lines), n_days), dtype=float)
+    tipos: List[FrozenSet[str]] = [frozenset()] * len(lines)
+    if base.empty:
+        cap[0, :] = float(default_m3_dia)
+    for r in base.itertuples(index=False):
+        i = row_of[r.LINHA]
+        cap[i, :] = float(r.CAPACIDADE_M3_DIA)
+        tipos[i] = parse_tipos(r.TIPOLOGIAS)
+    if calendar is not None and n_days:
+        cap[:, ~calendar.is_regular(days.values)] = 0.0
+
+    day_vals = days.values.astype("datetime64[D]")
+    for r in d[d["DATA_INICIO"].notna() | d["DATA_FIM"].notna()].itertuples(index=False):
+        start = r.DATA_INICIO if pd.notna(r.DATA_INICIO) else r.DATA_FIM
+        end = r.DATA_FIM if pd.notna(r.DATA_FIM) else r.DATA_INICIO
+        a = int(np.searchsorted(day_vals, np.datetime64(start.date(), "D"), side="left"))
+        b = int(np.searchsorted(day_vals, np.datetime64(end.date(), "D"), side="right"))
+        if a >= b:
+            continue
+        if r.LINHA == "":
+            cap[:, a:b] = float(r.CAPACIDADE_M3_DIA)
+        elif r.LINHA in row_of:
+            cap[row_of[r.LINHA], a:b] = float(r.CAPACIDADE_M3_DIA)
+
+    return CapacityModel(lines=lines, cap=cap, tipos=tipos, days=days)
+
+
+def nominal_m3_dia(df_capacidade: Optional[pd.DataFrame], default_m3_dia: float) -> float:
+    """Capacidade total de um dia normal: soma das capacidades padrão das linhas (sem datas)."""
+    d = normalize_capacidade(df_capacidade)
+    base = d[d["DATA_INICIO"].isna() & d["DATA_FIM"].isna() & (d["LINHA"] != "")]
+    if base.empty:
+        return float(default_m3_dia)
+    return float(base.groupby("LINHA", sort=False)["CAPACIDADE_M3_DIA"].last().sum())
+
+
+def daily_totals(df_linhas: Optional[pd.DataFrame]) -> Optional[pd.Series]:
+    """Capacidade total por dia (índice de datas) a partir de ``MixOutputs.capacidade``."""
+    if df_linhas is None or df_linhas.empty:
+        return None
+    s = df_linhas.groupby("Data", sort=True)["Capacidade (m³)"].sum()
+    s.index = pd.to_datetime(s.index)
+    return s
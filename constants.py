@@ -2,6 +2,7 @@ from __future__ import annotations
 
 DEFAULT_PARAMS = {
     "capacidade_m3_dia": 30.0,
+    "d5_dias_uteis": 5,
 }
 
 REQUIRED_OBRAS_ETAPAS_COLS = [
@@ -25,6 +26,27 @@ REQUIRED_SEQ_PROD_COLS = [
     "DATA_FIM_MONTAGEM",
 ]
 
+# mapa de formas (padrão interno, após formas_io.normalize_formas)
+REQUIRED_FORMAS_COLS = [
+    "FORMA",
+    "TIPO",              # tipologias aceitas, separadas por ";" (vazio = qualquer)
+    "ARMACAO_FORMA",     # ARMADA | PROTENDIDA
+    "QUANTIDADE",        # nº de pistas
+    "COMPRIMENTO_UTIL_M",
+    "FUNDO_CM",
+    "LATERAL_CM",
+    "STATUS",            # só INSTALADO entra na programação
+]
+
+# linhas de produção (capacity.build_capacity_model)
+REQUIRED_CAPACIDADE_COLS = [
+    "LINHA",
+    "TIPOLOGIAS",         # tipologias aceitas, separadas por ";" (vazio = todas)
+    "CAPACIDADE_M3_DIA",
+    "DATA_INICIO",        # vazio = capacidade padrão da linha; com data = turno/feriado no intervalo
+    "DATA_FIM",
+]
+
 # MVP simples: colunas fixas para o Excel de peças (sem mapeamento)
 REQUIRED_PECAS_COLS = [
     "CT",
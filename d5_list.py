@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from factory_calendar import FactoryCalendar
+from name_sets import NameSets
+
+
+DEFAULT_D5_DIAS_UTEIS = 5
+
+_LOT_COLS = ["CT", "ETAPA", "SEQUENCIA", "TIPOLOGIA", "TIPO ARMAÇÃO", "SETUP"]
+
+
+@dataclass
+class LotStarts:
+    """Primeiro dia programado de cada lote do mix (base da lista D-5).
+
+    ``lots`` tem ``_LOT_COLS`` + INICIO; o conjunto ``i`` de ``pieces`` são as
+    peças do lote ``i``. ``calendar`` é o calendário usado no mix.
+    """
+    lots: pd.DataFrame
+    pieces: NameSets
+    calendar: FactoryCalendar
+
+    @classmethod
+    def from_allocations(
+        cls,
+        lots: pd.DataFrame,
+        lot_names: NameSets,
+        days: pd.DatetimeIndex,
+        alloc_lot: np.ndarray,
+        alloc_day: np.ndarray,
+        calendar: FactoryCalendar,
+    ) -> "LotStarts":
+        """Uma passada sobre as alocações (lote, índice do dia): menor dia por lote."""
+        n_days = len(days)
+        first = np.full(len(lots), n_days, dtype=np.int64)
+        np.minimum.at(first, np.asarray(alloc_lot, dtype=np.int64), np.asarray(alloc_day, dtype=np.int64))
+        ok = np.flatnonzero(first < n_days)
+        out = lots.iloc[ok][_LOT_COLS].reset_index(drop=True)
+        out["INICIO"] = days.values[first[ok]]
+        return cls(lots=out, pieces=lot_names.take(ok), calendar=calendar)
+
+
+def _seqnum(x) -> int:
+    m = re.match(r"\d+", str(x))
+    return int(m.group(0)) if m else 999999
+
+
+def build_d5(
+    starts: Optional[LotStarts],
+    dias_uteis: int = DEFAULT_D5_DIAS_UTEIS,
+    hoje: Optional[pd.Timestamp] = None,
+) -> pd.DataFrame:
+    """Lista D-N por peça: data em que a engenharia precisa entregar o detalhamento.
+
+    A entrega é o primeiro dia programado do lote da peça menos ``dias_uteis``
+    dias úteis do calendário do mix (ordinais, sem laço por peça). Peça repetida
+    na mesma sequência fica com a entrega mais cedo. Ordenada por CT, ETAPA,
+    SEQUENCIA e data de entrega.
+    """
+    cols = ["CT", "ETAPA", "SEQUENCIA", "NOME PEÇA", "TIPOLOGIA", "TIPO ARMAÇÃO", "SETUP",
+            "INÍCIO PRODUÇÃO", "ENTREGA ENGENHARIA", "DIAS ÚTEIS ATÉ ENTREGA"]
+    if starts is None or starts.lots.empty:
+        return pd.DataFrame(columns=cols)
+
+    cal = starts.calendar
+    inicio = starts.lots["INICIO"].to_numpy(dtype="datetime64[D]")
+    entrega = cal.add(inicio, -int(dias_uteis))
+    hoje = pd.Timestamp.today().normalize() if hoje is None else pd.Timestamp(hoje).normalize()
+    restantes = cal.ordinal(entrega) - cal.ordinal(np.datetime64(hoje.date(), "D"))[0]
+
+    # ordem das sequências (CT, ETAPA, nº da SEQUENCIA) calculada por lote, não por peça
+    lots = starts.lots
+    seq_order = pd.DataFrame({
+        "CT": lots["CT"], "ETAPA": lots["ETAPA"],
+        "N": lots["SEQUENCIA"].map(_seqnum), "SEQUENCIA": lots["SEQUENCIA"],
+    })
+    grp = seq_order.groupby(["CT", "ETAPA", "N", "SEQUENCIA"], sort=True).ngroup().to_numpy(dtype=np.int64)
+
+    # uma linha por (lote, peça): expande o CSR dos conjuntos; os códigos já
+    # seguem a ordem alfabética dos nomes
+    ps = starts.pieces
+    lot = np.repeat(np.arange(len(ps), dtype=np.int64), np.diff(ps.offsets))
+    code = ps.codes.astype(np.int64)
+    day = entrega.astype(np.int64)
+    order = np.lexsort((code, day[lot], grp[lot]))
+    # peça repetida na sequência: fica a primeira (entrega mais cedo)
+    _, first = np.unique(grp[lot][order] * max(len(ps.names), 1) + code[order], return_index=True)
+    sel = order[np.sort(first)]
+    lot, code = lot[sel], code[sel]
+
+    out = pd.DataFrame({
+        "CT": lots["CT"].to_numpy()[lot],
+        "ETAPA": lots["ETAPA"].to_numpy()[lot],
+        "SEQUENCIA": lots["SEQUENCIA"].to_numpy()[lot],
+        "NOME PEÇA": ps.names[code],
+        "TIPOLOGIA": lots["TIPOLOGIA"].to_numpy()[lot],
+        "TIPO ARMAÇÃO": lots["TIPO ARMAÇÃO"].to_numpy()[lot],
+        "SETUP": lots["SETUP"].to_numpy()[lot],
+        "INÍCIO PRODUÇÃO": inicio.astype("datetime64[ns]")[lot],
+        "ENTREGA ENGENHARIA": entrega.astype("datetime64[ns]")[lot],
+        "DIAS ÚTEIS ATÉ ENTREGA": restantes[lot],
+    })
+    return out[cols]
+
+
+def summarize_d5(df_d5: pd.DataFrame) -> pd.DataFrame:
+    """Uma linha por CT/ETAPA/SEQUENCIA: primeira entrega, início da produção e nº de peças."""
+    cols = ["CT", "ETAPA", "SEQUENCIA", "ENTREGA ENGENHARIA", "INÍCIO PRODUÇÃO", "PEÇAS", "DIAS ÚTEIS ATÉ ENTREGA"]
+    if df_d5 is None or df_d5.empty:
+        return pd.DataFrame(columns=cols)
+    g = df_d5.groupby(["CT", "ETAPA", "SEQUENCIA"], sort=False)
+    out = g.agg(**{
+        "ENTREGA ENGENHARIA": ("ENTREGA ENGENHARIA", "min"),
+        "INÍCIO PRODUÇÃO": ("INÍCIO PRODUÇÃO", "min"),
+        "PEÇAS": ("NOME PEÇA", "size"),
+        "DIAS ÚTEIS ATÉ ENTREGA": ("DIAS ÚTEIS ATÉ ENTREGA", "min"),
+    }).reset_index()
+    return out[cols]
+
+
+def d5_excel_bytes(df_d5: pd.DataFrame) -> bytes:
+    """Excel com o resumo por sequência e a lista por peça."""
+    bio = BytesIO()
+    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
+        summarize_d5(df_d5).to_excel(writer, index=False, sheet_name="D-5 Sequências")
+        df_d5.to_excel(writer, index=False, sheet_name="D-5 Peças")
+    return bio.getvalue()
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+WEEKDAYS = (True, True, True, True, True, False, False)   # seg..dom
+ALL_DAYS = (True,) * 7
+
+_PAD_DAYS = 400   # folga do índice além das datas já vistas
+
+
+def _as_days(values) -> np.ndarray:
+    """Datas como números de dia (dias desde 1970-01-01). Inteiros já são números de dia."""
+    arr = np.atleast_1d(np.asarray(values))
+    if arr.dtype.kind in "iu":
+        return arr.astype(np.int64)
+    if arr.dtype.kind != "M":
+        arr = pd.to_datetime(pd.Series(arr.astype(object)), errors="coerce").to_numpy(dtype="datetime64[ns]")
+    return arr.astype("datetime64[D]").astype(np.int64)
+
+
+def _weekday(day_nums: np.ndarray) -> np.ndarray:
+    # 1970-01-01 foi quinta-feira (3 com segunda = 0)
+    return (day_nums + 3) % 7
+
+
+@dataclass
+class FactoryCalendar:
+    """Dias de trabalho da fábrica: dias da semana + exceções.
+
+    - ``weekmask``: dias da semana trabalhados (seg..dom);
+    - ``closed``: feriados e paradas (deixam de ser dia útil);
+    - ``extra``: dias trabalhados fora da semana normal (ex.: sábado com turno).
+
+    Mantém um índice pré-calculado dia <-> ordinal de dia útil, então somar
+    ``n`` dias úteis ou contar dias úteis entre duas datas é uma consulta em array.
+    """
+    weekmask: Tuple[bool, ...] = WEEKDAYS
+    closed: Iterable = ()
+    extra: Iterable = ()
+    _lo: int = field(default=0, init=False, repr=False)
+    _hi: int = field(default=-1, init=False, repr=False)
+    _shift: int = field(default=0, init=False, repr=False)
+    _work: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+    _ord: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+    _days: Optional[np.ndarray] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.weekmask = tuple(bool(x) for x in self.weekmask)
+        closed, extra = list(self.closed), list(self.extra)
+        self.closed = np.unique(_as_days(closed)) if closed else np.zeros(0, dtype=np.int64)
+        self.extra = np.setdiff1d(np.unique(_as_days(extra)) if extra else np.zeros(0, dtype=np.int64), self.closed)
+        known = np.concatenate([self.closed, self.extra])
+        today = int(np.datetime64("today", "D").astype(np.int64))
+        lo = int(known.min()) if known.size else today
+        hi = int(known.max()) if known.size else today
+        self._build(lo - _PAD_DAYS, hi + _PAD_DAYS)
+
+    @classmethod
+    def default(cls, use_business_days: bool = True) -> "FactoryCalendar":
+        """Segunda a sexta (ou todos os dias) sem feriados: o calendário antigo do mix."""
+        return cls(weekmask=WEEKDAYS if use_business_days else ALL_DAYS)
+
+    # ---- índice: dias [lo, hi] -> ordinal (dias úteis antes do dia, + _shift)
+    def _build(self, lo: int, hi: int) -> None:
+        nums = np.arange(lo, hi + 1, dtype=np.int64)
+        work = np.asarray(self.weekmask, dtype=bool)[_weekday(nums)]
+        work[np.isin(nums, self.closed)] = False
+        work[np.isin(nums, self.extra)] = True
+        ords = np.concatenate(([0], np.cumsum(work))).astype(np.int64)
+        if self._work is not None:
+            # ampliação: os ordinais já entregues não mudam
+            self._shift -= int(ords[self._lo - lo])
+        self._lo, self._hi = lo, hi
+        self._work = work
+        self._ord = ords
+        self._days = nums[work]
+
+    def _ensure(self, day_nums: np.ndarray) -> None:
+        if day_nums.size == 0:
+            return
+        lo, hi = int(day_nums.min()), int(day_nums.max())
+        if lo < self._lo or hi > self._hi:
+            self._build(min(lo - _PAD_DAYS, self._lo), max(hi + _PAD_DAYS, self._hi))
+
+    def _days_of(self, ords: np.ndarray) -> np.ndarray:
+        idx = np.asarray(ords, dtype=np.int64) - self._shift
+        while idx.size and (idx.min() < 0 or idx.max() >= len(self._days)):
+            self._build(self._lo - _PAD_DAYS, self._hi + _PAD_DAYS)
+            idx = np.asarray(ords, dtype=np.int64) - self._shift
+        return self._days[idx]
+
+    # ---- consultas (vetorizadas)
+    def is_working(self, dates) -> np.ndarray:
+        d = _as_days(dates)
+        self._ensure(d)
+        return self._work[d - self._lo]
+
+    def is_regular(self, dates) -> np.ndarray:
+        """Dia da semana normal que não é feriado (os dias ``extra`` ficam de fora)."""
+        d = _as_days(dates)
+        return np.asarray(self.weekmask, dtype=bool)[_weekday(d)] & ~np.isin(d, self.closed)
+
+    def ordinal(self, dates) -> np.ndarray:
+        """Ordinal de dia útil; um dia não útil recebe o ordinal do próximo dia útil."""
+        d = _as_days(dates)
+        self._ensure(d)
+        return self._ord[d - self._lo] + self._shift
+
+    def days(self, start, end) -> pd.DatetimeIndex:
+        """Dias úteis em ``[start, end]``."""
+        a, b = _as_days([start, end])
+        first = self.ordinal(a)[0]
+        last = self.ordinal(b + 1)[0]
+        return pd.DatetimeIndex(self._days_of(np.arange(first, last)).astype("datetime64[D]").astype("datetime64[ns]"))
+
+    def add(self, dates, n: int) -> np.ndarray:
+        """Soma ``n`` dias úteis (negativo = volta). Retorna ``datetime64[D]``."""
+        return self._days_of(self.ordinal(dates) + int(n)).astype("datetime64[D]")
+
+    def count(self, start, end) -> np.ndarray:
+        """Dias úteis em ``[start, end)``."""
+        return self.ordinal(end) - self.ordinal(start)
+
+
+def calendar_from_capacidade(df_capacidade: Optional[pd.DataFrame], use_business_days: bool = True) -> FactoryCalendar:
+    """Calendário a partir da tabela de linhas de produção (ver ``capacity``).
+
+    Linhas com datas e LINHA vazia e capacidade 0 fecham a fábrica no intervalo
+    (feriado/parada). Linhas com datas e capacidade > 0 em dia fora da semana
+    normal (ex.: sábado) tornam o dia trabalhado.
+    """
+    from capacity import normalize_capacidade
+
+    weekmask = WEEKDAYS if use_business_days else ALL_DAYS
+    d = normalize_capacidade(df_capacidade)
+    d = d[d["DATA_INICIO"].notna() | d["DATA_FIM"].notna()]
+    if d.empty:
+        return FactoryCalendar(weekmask=weekmask)
+
+    start = d["DATA_INICIO"].fillna(d["DATA_FIM"])
+    end = d["DATA_FIM"].fillna(d["DATA_INICIO"])
+    closed, extra = [], []
+    for a, b, linha, cap in zip(start, end, d["LINHA"], d["CAPACIDADE_M3_DIA"]):
+        if b < a:
+            continue
+        rng = pd.date_range(a, b, freq="D")
+        if linha == "" and cap <= 0:
+            closed.append(rng)
+        elif cap > 0:
+            wd = rng.weekday.to_numpy()
+            extra.append(rng[~np.asarray(weekmask, dtype=bool)[wd]])
+    return FactoryCalendar(weekmask=weekmask, closed=_concat_days(closed), extra=_concat_days(extra))
+
+
+def _concat_days(parts) -> np.ndarray:
+    return np.concatenate([p.values for p in parts]) if parts else np.zeros(0, dtype="datetime64[ns]")
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from formas_io import normalize_formas
+
+
+ARMADA = "ARMADA"
+PROTENDIDA = "PROTENDIDA"
+
+SetupKey = Tuple[str, str, int, int]   # (TIPOLOGIA, TIPO ARMAÇÃO, FUNDO, LATERAL)
+
+
+@dataclass
+class FormIndex:
+    """Formas INSTALADAS (uma entrada por linha do mapa) e compatibilidade por setup.
+
+    Cada forma tem ``qty`` pistas de ``length`` metros úteis por dia. Uma peça
+    cabe na forma com mesmo fundo/lateral, tipologia listada em TIPO (vazio =
+    qualquer) e armação compatível: forma PROTENDIDA fabrica PROTENDIDA e
+    ARMADA; forma ARMADA só ARMADA.
+    """
+    forma: np.ndarray
+    length: np.ndarray
+    qty: np.ndarray
+    armacao: np.ndarray
+    tipos: List[FrozenSet[str]]
+    # (fundo, lateral) -> formas com essa seção
+    by_section: Dict[Tuple[int, int], List[int]] = field(default_factory=dict)
+    _memo: Dict[SetupKey, List[int]] = field(default_factory=dict, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.forma)
+
+    def compatible(self, tipologia: str, armacao: str, fundo: float, lateral: float) -> List[int]:
+        """Formas que fabricam o setup, na ordem de preferência.
+
+        Primeiro as de armação igual (poupa as PROTENDIDAS para peças protendidas),
+        depois as mais longas (menos pistas por metro).
+        """
+        key = (str(tipologia).strip().upper(), str(armacao).strip().upper(), _cm(fundo), _cm(lateral))
+        hit = self._memo.get(key)
+        if hit is not None:
+            return hit
+        tip, arm, f, lat = key
+        out = []
+        for g in self.by_section.get((f, lat), []):
+            if self.tipos[g] and tip not in self.tipos[g]:
+                continue
+            ga = self.armacao[g]
+            if ga == arm or (ga == PROTENDIDA and arm == ARMADA):
+                out.append(g)
+        out.sort(key=lambda g: (self.armacao[g] != arm, -self.length[g]))
+        self._memo[key] = out
+        return out
+
+    def table(self, lots: pd.DataFrame) -> Tuple[np.ndarray, List[List[int]]]:
+        """Para cada lote: id do setup e, por setup, a lista de formas compatíveis.
+
+        Pré-calculado uma vez; no laço diário a consulta é ``compat[setup_id[lote]]``.
+        """
+        cols = ["TIPOLOGIA", "TIPO ARMAÇÃO", "FUNDO (CM)", "LATERAL (CM)"]
+        codes, uniq = pd.MultiIndex.from_frame(lots[cols].astype(str)).factorize()
+        first = pd.Series(np.arange(len(lots))).groupby(codes).first().to_numpy()
+        compat = [
+            self.compatible(*lots.iloc[i][cols].tolist())
+            for i in first
+        ]
+        return codes.astype(np.int64), compat
+
+
+def _cm(v) -> int:
+    try:
+        return int(round(float(v)))
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_tipos(v) -> FrozenSet[str]:
+    """Lista de tipologias (separadas por ``;``, ``,`` ou ``/``) em maiúsculas; vazio = todas."""
+    if v is None or (isinstance(v, float) and np.isnan(v)):
+        return frozenset()
+    parts = re.split(r"[;,/]", str(v).upper())
+    return frozenset(p.strip() for p in parts if p.strip() and p.strip() != "NAN")
+
+
+def build_form_index(df_formas: Optional[pd.DataFrame]) -> Optional[FormIndex]:
+    """Índice das formas com STATUS = INSTALADO, pistas > 0 e comprimento útil > 0.
+
+    Retorna ``None`` se não houver nenhuma forma utilizável.
+    """
+    if df_formas is None or df_formas.empty:
+        return None
+    d = normalize_formas(df_formas)
+    for c in ["QUANTIDADE", "COMPRIMENTO_UTIL_M", "FUNDO_CM", "LATERAL_CM"]:
+        if c not in d.columns:
+            return None
+    if "STATUS" in d.columns:
+        d = d[d["STATUS"].astype(str).str.strip().str.upper() == "INSTALADO"]
+    d = d[(d["QUANTIDADE"].fillna(0) > 0) & (d["COMPRIMENTO_UTIL_M"].fillna(0) > 0)].reset_index(drop=True)
+    if d.empty:
+        return None
+
+    arm = d.get("ARMACAO_FORMA", pd.Series(ARMADA, index=d.index)).astype(str).str.strip().str.upper()
+    idx = FormIndex(
+        forma=d.get("FORMA", pd.Series(d.index.astype(str), index=d.index)).astype(str).to_numpy(dtype=object),
+        length=d["COMPRIMENTO_UTIL_M"].to_numpy(dtype=float),
+        qty=d["QUANTIDADE"].fillna(0).astype(int).to_numpy(),
+        armacao=arm.to_numpy(dtype=object),
+        tipos=[parse_tipos(v) for v in d.get("TIPO", pd.Series(None, index=d.index))],
+    )
+    for g, (f, lat) in enumerate(zip(d["FUNDO_CM"], d["LATERAL_CM"])):
+        idx.by_section.setdefault((_cm(f), _cm(lat)), []).append(g)
+    return idx
@@ -2,9 +2,59 @@ from __future__ import annotations
 
 from typing import Optional, Dict, Any, List
 
+import numpy as np
 import pandas as pd
+import streamlit as st
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 
+from grid_index import PAGE_SIZE, PAGED_MIN_ROWS, index_for
+from profiling import span
+from schema import ID_COL
+
+
+_CUSTOM_CSS = {
+    ".ag-row-pinned": {"font-weight": "700"},
+    ".ag-row-pinned .ag-cell": {"border-top": "2px solid #CBD5E1"},
+}
+
+
+def _rows_to_ids(rows, id_col: str = ID_COL) -> List[Any]:
+    """ids das linhas selecionadas no AgGrid (lista de dicts ou DataFrame, conforme a versão)."""
+    if rows is None:
+        return []
+    if isinstance(rows, pd.DataFrame):
+        return rows[id_col].dropna().tolist() if id_col in rows.columns else []
+    if not isinstance(rows, list):
+        return []
+    return [r.get(id_col) for r in rows if isinstance(r, dict) and r.get(id_col) is not None]
+
+
+def selected_ids(resp, id_col: str = ID_COL) -> List[Any]:
+    """ids selecionados no retorno do ``show_grid`` (modo paginado ou não)."""
+    if not resp:
+        return []
+    try:
+        if "selected_ids" in resp:
+            return list(resp["selected_ids"])
+        return _rows_to_ids(resp.get("selected_rows"), id_col)
+    except Exception:
+        return []
+
+
+def _builder(df: pd.DataFrame, hide_columns: Optional[List[str]], header_tools: bool) -> GridOptionsBuilder:
+    gb = GridOptionsBuilder.from_dataframe(df)
+    gb.configure_default_column(
+        filter=header_tools,
+        sortable=header_tools,
+        resizable=True,
+        floatingFilter=header_tools,
+    )
+    if hide_columns:
+        for c in hide_columns:
+            if c in df.columns:
+                gb.configure_column(c, hide=True)
+    return gb
+
 
 def show_grid(
     df: pd.DataFrame,
@@ -15,28 +65,26 @@ def show_grid(
     selectable: bool = False,
     selection_mode: str = "multiple",
     hide_columns: Optional[List[str]] = None,
+    paged: Optional[bool] = None,
+    page_size: int = PAGE_SIZE,
 ):
     """Tabela com filtros no cabeçalho (estilo Excel).
 
     - pinned_bottom: linha TOTAL travada no rodapé
     - selectable: habilita seleção de linhas (checkbox) e retorna o response do AgGrid
     - hide_columns: oculta colunas (ex.: IDs internos)
+    - paged: filtros, ordenação e páginas no servidor (padrão: acima de
+      ``PAGED_MIN_ROWS`` linhas); ver ``_paged_grid``
     """
     if df is None or df.empty:
         return None
+    if paged is None:
+        paged = len(df) > PAGED_MIN_ROWS
+    if paged:
+        return _paged_grid(df, key, height, fit_columns, pinned_bottom, selectable, selection_mode,
+                           hide_columns, page_size)
 
-    gb = GridOptionsBuilder.from_dataframe(df)
-    gb.configure_default_column(
-        filter=True,
-        sortable=True,
-        resizable=True,
-        floatingFilter=True,
-    )
-
-    if hide_columns:
-        for c in hide_columns:
-            if c in df.columns:
-                gb.configure_column(c, hide=True)
+    gb = _builder(df, hide_columns, header_tools=True)
 
     update_mode = GridUpdateMode.NO_UPDATE
     if selectable:
@@ -50,18 +98,112 @@ def show_grid(
     if pinned_bottom is not None:
         opts["pinnedBottomRowData"] = [pinned_bottom]
 
-    resp = AgGrid(
-        df,
-        gridOptions=opts,
-        update_mode=update_mode,
-        data_return_mode="AS_INPUT",
-        allow_unsafe_jscode=True,
-        height=height,
-        fit_columns_on_grid_load=fit_columns,
-        custom_css={
-            ".ag-row-pinned": {"font-weight": "700"},
-            ".ag-row-pinned .ag-cell": {"border-top": "2px solid #CBD5E1"},
-        },
-        key=key,
-    )
+    with span(f"Grid {key}", rows=len(df)):
+        resp = AgGrid(
+            df,
+            gridOptions=opts,
+            update_mode=update_mode,
+            data_return_mode="AS_INPUT",
+            allow_unsafe_jscode=True,
+            height=height,
+            fit_columns_on_grid_load=fit_columns,
+            custom_css=_CUSTOM_CSS,
+            key=key,
+        )
     return resp
+
+
+def _paged_grid(
+    df: pd.DataFrame,
+    key: str,
+    height: int,
+    fit_columns: bool,
+    pinned_bottom: Optional[Dict[str, Any]],
+    selectable: bool,
+    selection_mode: str,
+    hide_columns: Optional[List[str]],
+    page_size: int,
+) -> Dict[str, Any]:
+    """Grid paginado: a tabela fica no servidor e o navegador recebe só a página visível.
+
+    Filtros (por coluna) e ordenação ficam acima da tabela e usam o
+    ``GridIndex`` da tabela (ordenações pré-calculadas). A seleção é guardada
+    por ``_id`` na sessão entre páginas; o retorno traz só esses ids.
+    """
+    idx = index_for(df, st.session_state.setdefault("grid_indexes", {}), key)
+    hidden = set(hide_columns or [])
+    cols = [c for c in idx.df.columns if c not in hidden]
+
+    with st.expander("Filtros e ordenação", expanded=False):
+        per_row = min(4, max(len(cols), 1))
+        filters: Dict[str, str] = {}
+        for i in range(0, len(cols), per_row):
+            row = st.columns(per_row)
+            for c, box in zip(cols[i:i + per_row], row):
+                filters[c] = box.text_input(
+                    str(c), key=f"{key}_f_{c}", placeholder="contém… / >10 / <=5"
+                )
+        s1, s2 = st.columns([3, 1], vertical_alignment="bottom")
+        sort_col = s1.selectbox("Ordenar por", ["(ordem original)"] + cols, key=f"{key}_sort")
+        desc = s2.checkbox("Decrescente", key=f"{key}_desc")
+
+    with span(f"Grid {key} (consulta)", rows=len(idx)):
+        pos = idx.query(filters, None if sort_col == "(ordem original)" else sort_col, desc)
+
+    n_pages = max(1, -(-len(pos) // int(page_size)))
+    page_key = f"{key}_page"
+    if int(st.session_state.get(page_key, 1)) > n_pages:
+        st.session_state[page_key] = n_pages
+    p1, p2 = st.columns([1, 3], vertical_alignment="center")
+    page = int(p1.number_input("Página", min_value=1, max_value=n_pages, step=1, key=page_key))
+    p2.caption(f"{len(pos):,} de {len(idx):,} linhas · página {page} de {n_pages}".replace(",", "."))
+
+    page_df = idx.page(pos, page - 1, page_size).reset_index(drop=True)
+    gb = _builder(page_df, hide_columns, header_tools=False)
+
+    # cada página/consulta é uma instância própria do componente; o retorno da
+    # primeira exibição não é interação do usuário
+    view = f"{key}_v{page}_{hash((tuple(sorted(filters.items())), sort_col, desc)) & 0xFFFFFFFF:x}"
+    sel_key = f"{key}_selected"
+    chosen = set(st.session_state.get(sel_key, set()))
+    page_ids = page_df[ID_COL].tolist() if ID_COL in page_df.columns else []
+
+    update_mode = GridUpdateMode.NO_UPDATE
+    if selectable and page_ids:
+        pre = [i for i, v in enumerate(page_ids) if v in chosen]
+        gb.configure_selection(selection_mode=selection_mode, use_checkbox=True, pre_selected_rows=pre)
+        update_mode = GridUpdateMode.SELECTION_CHANGED
+
+    gb.configure_grid_options(domLayout="normal")
+    opts = gb.build()
+    if pinned_bottom is not None:
+        opts["pinnedBottomRowData"] = [pinned_bottom]
+
+    with span(f"Grid {key}", rows=len(page_df)):
+        resp = AgGrid(
+            page_df,
+            gridOptions=opts,
+            update_mode=update_mode,
+            data_return_mode="AS_INPUT",
+            allow_unsafe_jscode=True,
+            height=height,
+            fit_columns_on_grid_load=fit_columns,
+            custom_css=_CUSTOM_CSS,
+            key=view,
+        )
+
+    if not selectable or not page_ids:
+        st.session_state.pop(sel_key, None)
+        return {"selected_ids": [], "rows": int(len(pos))}
+
+    if st.session_state.get(f"{key}_view") == view and resp is not None:
+        chosen.difference_update(page_ids)
+        chosen.update(_rows_to_ids(resp.get("selected_rows")))
+    st.session_state[f"{key}_view"] = view
+    # ids que saíram da tabela (ex.: excluídos) deixam de contar
+    if chosen:
+        ids = idx.df[ID_COL].to_numpy()
+        keep = np.asarray(list(chosen), dtype=ids.dtype)
+        chosen = set(keep[np.isin(keep, ids)].tolist())
+    st.session_state[sel_key] = chosen
+    return {"selected_ids": sorted(chosen), "rows": int(len(pos))}
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import weakref
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+PAGE_SIZE = 100          # linhas por página no modo paginado
+PAGED_MIN_ROWS = 2000    # acima disso o show_grid pagina no servidor
+
+_NUM_FILTER = re.compile(r"^\s*(>=|<=|>|<|=)\s*(.+?)\s*$")
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    """Hash do conteúdo inteiro da tabela (colunas, tipos e todos os valores)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((len(df), tuple(map(str, df.columns)), tuple(map(str, df.dtypes)))).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class GridIndex:
+    """Filtros, ordenação e páginas de uma tabela grande, resolvidos no servidor.
+
+    As ordenações (uma por coluna e sentido) e o texto minúsculo usado nos
+    filtros são calculados na primeira vez e ficam guardados; cada rerun só
+    combina máscaras e fatia posições.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        self.df = df.reset_index(drop=True)
+        self._orders: Dict[Tuple[str, bool], np.ndarray] = {}
+        self._text: Dict[str, Tuple[np.ndarray, Optional[np.ndarray]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def order(self, col: str, descending: bool = False) -> np.ndarray:
+        """Posições da tabela ordenada por ``col`` (estável, vazios no fim)."""
+        k = (col, bool(descending))
+        if k not in self._orders:
+            s = self.df[col]
+            try:
+                o = s.sort_values(ascending=not descending, kind="mergesort", na_position="last").index
+            except TypeError:
+                # coluna com tipos misturados: ordena pelo texto
+                o = s.astype(str).sort_values(ascending=not descending, kind="mergesort").index
+            self._orders[k] = o.to_numpy(dtype=np.int64)
+        return self._orders[k]
+
+    def _lower(self, col: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Texto minúsculo da coluna; em categorias, só o dicionário (+ códigos)."""
+        if col not in self._text:
+            s = self.df[col]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                cats = s.cat.categories.astype(str).str.lower().to_numpy(dtype=object)
+                self._text[col] = (cats, s.cat.codes.to_numpy())
+            else:
+                if pd.api.types.is_datetime64_any_dtype(s):
+                    txt = s.dt.strftime("%Y-%m-%d %d/%m/%Y")
+                else:
+                    txt = s.astype(str)
+                self._text[col] = (txt.fillna("").str.lower().to_numpy(dtype=object), None)
+        return self._text[col]
+
+    def _contains(self, col: str, term: str) -> np.ndarray:
+        values, codes = self._lower(col)
+        hit = np.fromiter((term in v for v in values), dtype=bool, count=len(values))
+        if codes is None:
+            return hit
+        return np.where(codes >= 0, hit[np.maximum(codes, 0)], False)
+
+    def _numeric(self, col: str, text: str) -> Optional[np.ndarray]:
+        """Filtro ``>x``, ``<=x``, ``=x`` etc. em coluna numérica (``None`` se não for o caso)."""
+        s = self.df[col]
+        if not pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+            return None
+        m = _NUM_FILTER.match(text)
+        op, raw = (m.group(1), m.group(2)) if m else ("=", text.strip())
+        try:
+            x = float(raw.replace(",", "."))
+        except ValueError:
+            return None
+        v = s.to_numpy(dtype=float, na_value=np.nan)
+        return {
+            ">": v > x, "<": v < x, ">=": v >= x, "<=": v <= x, "=": v == x,
+        }[op]
+
+    def mask(self, filters: Optional[Dict[str, str]]) -> Optional[np.ndarray]:
+        """Linhas que passam em todos os filtros do cabeçalho (``None`` = sem filtro).
+
+        Numéricas aceitam ``>``, ``<``, ``>=``, ``<=``, ``=`` ou o número; as
+        demais, trecho do texto (sem diferenciar maiúsculas).
+        """
+        out: Optional[np.ndarray] = None
+        for col, text in (filters or {}).items():
+            text = (text or "").strip()
+            if not text or col not in self.df.columns:
+                continue
+            m = self._numeric(col, text)
+            if m is None:
+                m = self._contains(col, text.lower())
+            out = m if out is None else (out & m)
+        return out
+
+    def query(
+        self,
+        filters: Optional[Dict[str, str]] = None,
+        sort_col: Optional[str] = None,
+        descending: bool = False,
+    ) -> np.ndarray:
+        """Posições filtradas, na ordem pedida (sem ordenação: ordem original)."""
+        m = self.mask(filters)
+        if sort_col is None or sort_col not in self.df.columns:
+            return np.arange(len(self.df), dtype=np.int64) if m is None else np.flatnonzero(m)
+        o = self.order(sort_col, descending)
+        return o if m is None else o[m[o]]
+
+    def page(self, positions: np.ndarray, page: int, size: int = PAGE_SIZE) -> pd.DataFrame:
+        """Fatia ``page`` (a partir de 0) das posições; só essas linhas vão para o navegador."""
+        start = max(int(page), 0) * int(size)
+        return self.df.iloc[positions[start:start + int(size)]]
+
+
+def index_for(df: pd.DataFrame, cache: Dict[str, tuple], key: str) -> GridIndex:
+    """``GridIndex`` da tabela mostrada no grid ``key``, reaproveitado enquanto ela não muda.
+
+    ``cache`` é um dict da sessão (os índices não são compartilhados entre
+    usuários). Mesmo objeto de tabela = acerto direto; objeto novo só
+    reaproveita o índice se o conteúdo for idêntico (``fingerprint``).
+    """
+    hit = cache.get(key)
+    if hit is not None and hit[0]() is df:
+        return hit[2]
+    fp = fingerprint(df)
+    idx = hit[2] if hit is not None and hit[1] == fp else GridIndex(df)
+    cache[key] = (weakref.ref(df), fp, idx)
+    return idx
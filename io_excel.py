@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import hashlib
 from io import BytesIO
-from typing import Optional
+from typing import Dict, List, Optional
 
 import pandas as pd
 
+from lru import LRUCache
+from profiling import span
+
+
+# DataFrames já lidos, por (hash do conteúdo, aba): reruns não re-parseiam o arquivo
+_parsed = LRUCache(maxsize=8)
+
 
 def normalize_columns(cols: list[str]) -> list[str]:
     """Normaliza nomes de colunas vindos de Excel.
@@ -27,11 +35,52 @@ def read_excel_any(content: bytes, sheet: Optional[str] = None) -> pd.DataFrame:
     """Lê Excel a partir de bytes e retorna DataFrame.
     - Tenta a primeira aba por padrão.
     - Normaliza nomes de colunas.
+    - Resultado em cache pelo hash do conteúdo (devolve sempre uma cópia).
+    """
+    key = (hashlib.sha256(content).hexdigest(), sheet)
+    df = _parsed.get(key)
+    if df is None:
+        with span("Leitura do Excel") as sp:
+            df = pd.read_excel(BytesIO(content), sheet_name=sheet or 0, engine="openpyxl")
+            df.columns = normalize_columns(list(df.columns))
+            sp.rows = len(df)
+        _parsed.put(key, df)
+    return df.copy()
+
+
+def read_excel_sheets(content: bytes, wanted: Dict[str, List[str]]) -> Dict[str, Optional[pd.DataFrame]]:
+    """Abre o arquivo uma vez e lê só as abas pedidas.
+
+    ``wanted`` mapeia um rótulo para os nomes candidatos da aba; vale o primeiro
+    candidato que existir (sem diferenciar maiúsculas/espaços). Rótulo sem aba
+    correspondente (ou arquivo ilegível) volta como ``None``. Tipos iguais aos
+    do ``pd.read_excel`` (é o mesmo parser).
     """
-    bio = BytesIO(content)
-    df = pd.read_excel(bio, sheet_name=sheet or 0, engine="openpyxl")
-    df.columns = normalize_columns(list(df.columns))
-    return df
+    digest = hashlib.sha256(content).hexdigest()
+    out: Dict[str, Optional[pd.DataFrame]] = {label: None for label in wanted}
+    try:
+        xl = pd.ExcelFile(BytesIO(content), engine="openpyxl")
+    except Exception:
+        return out
+    with xl:
+        by_norm = {_norm_sheet(n): n for n in xl.sheet_names}
+        for label, candidates in wanted.items():
+            name = next((by_norm[_norm_sheet(c)] for c in candidates if _norm_sheet(c) in by_norm), None)
+            if name is None:
+                continue
+            df = _parsed.get((digest, name))
+            if df is None:
+                with span(f"Leitura do Excel ({name})") as sp:
+                    df = xl.parse(name)
+                    df.columns = normalize_columns(list(df.columns))
+                    sp.rows = len(df)
+                _parsed.put((digest, name), df)
+            out[label] = df.copy()
+    return out
+
+
+def _norm_sheet(name: str) -> str:
+    return " ".join(str(name).replace("_", " ").upper().split())
 
 
 def coerce_dates(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+from lru import LRUCache
+
+
+MAX_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+FINISHED_KEEP = 32     # status de jobs encerrados guardados para consultas tardias
+ABANDONED_SECONDS = 15 * 60   # job sem consulta há mais tempo que isso é descartado (sessão encerrada)
+
+
+class JobCancelled(Exception):
+    """Levantada dentro do job quando o usuário pede cancelamento."""
+
+
+@dataclass
+class JobStatus:
+    state: str                  # "fila" | "executando" | "concluído" | "cancelado" | "erro"
+    done: int = 0
+    total: int = 0
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("concluído", "cancelado", "erro")
+
+    @property
+    def fraction(self) -> float:
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+
+@dataclass
+class _Job:
+    future: Future
+    shared: Any                 # dict (ou proxy) com "done"/"total"/"started"
+    cancel_event: Any           # threading.Event (ou proxy)
+    submitted: float
+    last_seen: float = 0.0      # última consulta (status/result)
+
+
+class _Progress:
+    """Callback ``progress(done, total)`` repassado ao job (também serve de ponto de cancelamento)."""
+
+    def __init__(self, shared: Any, cancel_event: Any) -> None:
+        self.shared = shared
+        self.cancel_event = cancel_event
+
+    def __call__(self, done: int, total: int) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+        self.shared.update(done=int(done), total=int(total))
+
+
+def _run(fn: Callable, shared: Any, cancel_event: Any, args: tuple, kwargs: dict) -> Any:
+    shared["started"] = time.time()
+    if cancel_event.is_set():
+        raise JobCancelled()
+    return fn(*args, progress=_Progress(shared, cancel_event), **kwargs)
+
+
+_lock = threading.Lock()
+_executor: Optional[Executor] = None
+_manager = None
+_jobs: Dict[str, _Job] = {}
+_finished = LRUCache(maxsize=FINISHED_KEEP)
+
+
+def _ensure_pool() -> Executor:
+    """Pool de processos compartilhado pelo servidor (threads se processos não estiverem disponíveis)."""
+    global _executor, _manager
+    if _executor is None:
+        try:
+            ctx = multiprocessing.get_context("spawn")
+            _manager = ctx.Manager()
+            _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=ctx)
+        except (OSError, NotImplementedError, PermissionError):
+            _manager = None
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="mix-job")
+    return _executor
+
+
+def submit(fn: Callable, *args: Any, **kwargs: Any) -> str:
+    """Enfileira ``fn(*args, progress=..., **kwargs)`` e devolve o id do job.
+
+    ``fn`` precisa ser uma função de módulo (é enviada a outro processo) e deve
+    chamar ``progress(done, total)`` de tempos em tempos; o cancelamento é
+    entregue nessa chamada.
+    """
+    with _lock:
+        ex = _ensure_pool()
+        if _manager is not None:
+            shared, cancel_event = _manager.dict(done=0, total=0), _manager.Event()
+        else:
+            shared, cancel_event = {"done": 0, "total": 0}, threading.Event()
+        job_id = uuid.uuid4().hex
+        fut = ex.submit(_run, fn, shared, cancel_event, args, kwargs)
+        now = time.time()
+        _jobs[job_id] = _Job(future=fut, shared=shared, cancel_event=cancel_event, submitted=now, last_seen=now)
+    # cancelado ou com erro sai da lista assim que termina (fora do lock: pode rodar aqui mesmo)
+    fut.add_done_callback(lambda f, job_id=job_id: _on_done(job_id))
+    _reap()
+    return job_id
+
+
+def _on_done(job_id: str) -> None:
+    job = _jobs.get(job_id)
+    if job is not None and _status_of(job).state in ("cancelado", "erro"):
+        _retire(job_id)
+
+
+def _retire(job_id: str, final: Optional[JobStatus] = None) -> None:
+    """Tira o job da lista (libera future, proxies e evento) e guarda só o status final."""
+    with _lock:
+        job = _jobs.pop(job_id, None)
+    if job is not None:
+        _finished.put(job_id, final or _status_of(job))
+
+
+def _reap() -> None:
+    """Descarta jobs que ninguém consulta há ``ABANDONED_SECONDS`` (cancela os que ainda rodam)."""
+    limit = time.time() - ABANDONED_SECONDS
+    for job_id, job in list(_jobs.items()):
+        if job.last_seen < limit:
+            job.cancel_event.set()
+            job.future.cancel()
+            _retire(job_id, JobStatus(state="cancelado", elapsed=time.time() - job.submitted))
+
+
+def status(job_id: str) -> JobStatus:
+    _reap()
+    job = _jobs.get(job_id)
+    if job is None:
+        return _finished.get(job_id) or JobStatus(state="erro", error="Job não encontrado.")
+    job.last_seen = time.time()
+    st = _status_of(job)
+    if st.state in ("cancelado", "erro"):
+        _retire(job_id)
+    return st
+
+
+def _status_of(job: _Job) -> JobStatus:
+    fut = job.future
+    elapsed = time.time() - job.submitted
+    if not fut.done():
+        try:
+            snap = dict(job.shared)
+        except (OSError, EOFError):
+            snap = {}
+        state = "executando" if "started" in snap else "fila"
+        return JobStatus(state=state, done=snap.get("done", 0), total=snap.get("total", 0), elapsed=elapsed)
+
+    try:
+        exc = fut.exception()
+    except CancelledError:
+        exc = JobCancelled()
+    if isinstance(exc, JobCancelled):
+        return JobStatus(state="cancelado", elapsed=elapsed)
+    if exc is not None:
+        return JobStatus(state="erro", error=f"{type(exc).__name__}: {exc}", elapsed=elapsed)
+    return JobStatus(state="concluído", done=1, total=1, elapsed=elapsed)
+
+
+def result(job_id: str) -> Any:
+    """Resultado de um job concluído (o job sai da lista; ``status`` continua respondendo)."""
+    job = _jobs.get(job_id)
+    if job is None:
+        raise KeyError(job_id)
+    _retire(job_id)
+    return job.future.result()
+
+
+def cancel(job_id: str) -> None:
+    """Pede o cancelamento: sai da fila na hora ou para no próximo ``progress``."""
+    job = _jobs.get(job_id)
+    if job is None:
+        return
+    job.cancel_event.set()
+    job.future.cancel()
+
+
+def mix_job(
+    pecas: pd.DataFrame,
+    seq_producao: pd.DataFrame,
+    capacidade_m3_dia: float,
+    use_business_days: bool = True,
+    previous: Any = None,
+    formas: Optional[pd.DataFrame] = None,
+    ordering: str = "setup",
+    capacidade_linhas: Optional[pd.DataFrame] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+):
+    """Job do mix: reprogramação incremental + rollup (roda no processo do pool)."""
+    from bottlenecks import build_bottlenecks
+    from capacity import daily_totals
+    from mix_rollup import build_rollup
+    from profiling import span, trace
+    from scheduler import build_mix_incremental
+    from schema import compact
+
+    # o processo do pool não vê o trace da página: grava o próprio no log
+    with trace("Mix (job)"):
+        out, state = build_mix_incremental(
+            pecas=pecas,
+            seq_producao=seq_producao,
+            capacidade_m3_dia=capacidade_m3_dia,
+            use_business_days=use_business_days,
+            previous=previous,
+            progress=progress,
+            formas=formas,
+            ordering=ordering,
+            capacidade_linhas=capacidade_linhas,
+        )
+        with span("Rollup Diária/Semanal/Mensal", rows=len(out.mix_diario)):
+            out.rollup = build_rollup(
+                out.mix_diario,
+                capacidade_m3_dia=capacidade_m3_dia,
+                name_sets=out.name_sets,
+                capacidade_dia=daily_totals(out.capacidade),
+            )
+        with span("Gargalos", rows=len(out.mix_diario)):
+            out.gargalos = build_bottlenecks(out.mix_diario, out.capacidade, out.pendencias, capacidade_m3_dia)
+        # agregações prontas: o mix guardado (sessão, cache) fica com tipos enxutos
+        out.mix_diario = compact(out.mix_diario, "mix_diario")
+    return out, state
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import weakref
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from lru import LRUCache
+
+
+PECAS_LEVELS = ("CT", "ETAPA", "SEQUENCIA")
+CT_LEVELS = ("CT",)
+
+# um índice por (tabela, níveis); a tabela é identificada pelo objeto (as
+# tabelas da sessão só trocam de objeto quando são salvas)
+_indexes = LRUCache(maxsize=16)
+
+
+def _level_codes(s: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Códigos (ordem alfabética) e valores do nível, como texto sem espaços nas pontas.
+
+    Vazio/NaN vira ``""`` (código 0 quando existe); em categorias o texto é
+    tratado só no dicionário.
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        cats = pd.Series(s.cat.categories.astype(str)).str.strip()
+        cat_codes, values = pd.factorize(pd.concat([cats, pd.Series([""])], ignore_index=True), sort=True)
+        raw = s.cat.codes.to_numpy()
+        codes = cat_codes[np.where(raw >= 0, raw, len(cats))]
+    else:
+        txt = s.astype(object).where(s.notna(), "").astype(str).str.strip()
+        codes, values = pd.factorize(txt, sort=True)
+    return codes.astype(np.int64), np.asarray(values, dtype=object)
+
+
+class KeyIndex:
+    """Índice hierárquico (ex.: CT → ETAPA → SEQUENCIA) de posições de linha.
+
+    Para cada combinação de níveis informados há uma ordenação estável das
+    linhas e as faixas de cada chave; consultas devolvem as posições (na ordem
+    original da tabela) com custo proporcional ao resultado. As listas de
+    opções de cada nível, dado o filtro dos outros, são montadas na criação.
+    ``None`` num nível = qualquer valor.
+    """
+
+    def __init__(self, df: pd.DataFrame, levels: Sequence[str]) -> None:
+        self.levels = tuple(levels)
+        self.n = len(df)
+        codes, self._values, self._lookup = [], [], []
+        for c in self.levels:
+            s = df[c] if c in df.columns else pd.Series("", index=df.index)
+            k, v = _level_codes(s)
+            codes.append(k)
+            self._values.append(v)
+            self._lookup.append({x: i for i, x in enumerate(v)})
+        self._radix = [max(len(v), 1) for v in self._values]
+
+        # mask (bits dos níveis informados) -> (ordem das linhas, chaves únicas, inícios)
+        self._groups: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        keys_by_mask: Dict[int, np.ndarray] = {}
+        for mask in range(1, 1 << len(self.levels)):
+            key = self._combine([codes[i] if mask >> i & 1 else None for i in range(len(self.levels))])
+            order = np.argsort(key, kind="stable").astype(np.int32)
+            uniq, starts = np.unique(key[order], return_index=True)
+            self._groups[mask] = (order, uniq, np.append(starts, self.n).astype(np.int64))
+            keys_by_mask[mask] = uniq
+
+        # opções: (mask informado, nível) -> chave do filtro -> valores do nível
+        self._options: Dict[Tuple[int, int], Dict[int, List[str]]] = {}
+        for lvl in range(len(self.levels)):
+            bit = 1 << lvl
+            for mask in range(0, 1 << len(self.levels)):
+                if mask & bit:
+                    continue
+                uniq = keys_by_mask[mask | bit]
+                lvl_code = self._digit(uniq, mask | bit, lvl)
+                parent = self._project(uniq, mask | bit, mask)
+                opts: Dict[int, List[str]] = {}
+                for p, c in zip(parent.tolist(), lvl_code.tolist()):
+                    v = self._values[lvl][c]
+                    if v:
+                        opts.setdefault(p, []).append(v)
+                self._options[(mask, lvl)] = opts
+
+    def _combine(self, parts: List[Optional[np.ndarray]]) -> np.ndarray:
+        """Chave inteira mista dos níveis informados (os demais ficam de fora)."""
+        key = None
+        for i, p in enumerate(parts):
+            if p is None:
+                continue
+            key = p.copy() if key is None else key * self._radix[i] + p
+        return np.zeros(self.n, dtype=np.int64) if key is None else key
+
+    def _digit(self, keys: np.ndarray, mask: int, lvl: int) -> np.ndarray:
+        """Código do nível ``lvl`` dentro de chaves montadas com ``mask``."""
+        div = 1
+        for i in range(len(self.levels) - 1, lvl, -1):
+            if mask >> i & 1:
+                div *= self._radix[i]
+        return (keys // div) % self._radix[lvl]
+
+    def _project(self, keys: np.ndarray, mask: int, sub: int) -> np.ndarray:
+        """Chaves de ``mask`` reduzidas aos níveis de ``sub``."""
+        out = np.zeros(len(keys), dtype=np.int64)
+        for i in range(len(self.levels)):
+            if sub >> i & 1:
+                out = out * self._radix[i] + self._digit(keys, mask, i)
+        return out
+
+    def _key(self, values: Sequence[Optional[str]]) -> Tuple[int, Optional[int]]:
+        """(mask, chave) do filtro; chave ``None`` se algum valor não existe."""
+        mask, key = 0, 0
+        for i, v in enumerate(list(values)[: len(self.levels)]):
+            if v is None:
+                continue
+            code = self._lookup[i].get(str(v).strip())
+            if code is None:
+                return mask | (1 << i), None
+            mask |= 1 << i
+            key = key * self._radix[i] + code
+        return mask, key
+
+    def positions(self, *values: Optional[str]) -> np.ndarray:
+        """Posições das linhas com os valores informados (na ordem da tabela)."""
+        mask, key = self._key(values)
+        if mask == 0:
+            return np.arange(self.n, dtype=np.int64)
+        if key is None:
+            return np.empty(0, dtype=np.int64)
+        order, uniq, starts = self._groups[mask]
+        j = int(np.searchsorted(uniq, key))
+        if j >= len(uniq) or uniq[j] != key:
+            return np.empty(0, dtype=np.int64)
+        return order[starts[j]:starts[j + 1]].astype(np.int64)
+
+    def options(self, level: str, *values: Optional[str]) -> List[str]:
+        """Valores (ordenados, sem vazio) de ``level`` nas linhas que casam com ``values``.
+
+        O valor do próprio ``level`` em ``values`` é ignorado.
+        """
+        lvl = self.levels.index(level)
+        vals = list(values) + [None] * (len(self.levels) - len(values))
+        vals[lvl] = None
+        mask, key = self._key(vals)
+        if key is None:
+            return []
+        return list(self._options[(mask, lvl)].get(key, []))
+
+    def take(self, df: pd.DataFrame, *values: Optional[str]) -> pd.DataFrame:
+        """Linhas de ``df`` (a tabela do índice) com os valores informados."""
+        if all(v is None for v in values):
+            return df
+        return df.iloc[self.positions(*values)]
+
+    def drop(self, df: pd.DataFrame, *values: Optional[str]) -> pd.DataFrame:
+        """``df`` sem as linhas com os valores informados."""
+        keep = np.ones(self.n, dtype=bool)
+        keep[self.positions(*values)] = False
+        return df.iloc[np.flatnonzero(keep)]
+
+
+def index_for(df: pd.DataFrame, levels: Sequence[str] = PECAS_LEVELS) -> KeyIndex:
+    """``KeyIndex`` da tabela, montado uma vez por versão (objeto) da tabela."""
+    k = (id(df), tuple(levels))
+    hit = _indexes.get(k)
+    if hit is not None and hit[0]() is df:
+        return hit[1]
+    idx = KeyIndex(df, levels)
+    _indexes.put(k, (weakref.ref(df), idx))
+    return idx
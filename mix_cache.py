@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from lru import LRUCache
+from scheduler import ENGINE_VERSION, MixOutputs
+
+
+CACHE_DIR = Path("data") / "mix_cache"
+DISK_MAX_BYTES = 256 * 1024 * 1024   # limite do cache em disco
+MEMORY_MAX_ITEMS = 8
+
+_memory = LRUCache(maxsize=MEMORY_MAX_ITEMS)
+_disk_lock = threading.Lock()
+
+
+def _hash_frame(h: "hashlib._Hash", df: Optional[pd.DataFrame]) -> None:
+    if df is None:
+        h.update(b"<none>")
+        return
+    h.update(repr(list(df.columns)).encode("utf-8"))
+    h.update(repr([str(t) for t in df.dtypes]).encode("utf-8"))
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    except TypeError:
+        # células não-hasheáveis (ex.: listas vindas do data_editor)
+        h.update(pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes())
+
+
+def mix_key(
+    df_pecas: pd.DataFrame,
+    df_seq_montagem: pd.DataFrame,
+    capacidade_m3_dia: float,
+    use_business_days: bool,
+    df_formas: Optional[pd.DataFrame] = None,
+    ordering: str = "setup",
+    df_capacidade: Optional[pd.DataFrame] = None,
+) -> str:
+    """Impressão digital estável das entradas do mix (inclui a versão do motor)."""
+    h = hashlib.sha256()
+    h.update(f"engine={ENGINE_VERSION}|cap={float(capacidade_m3_dia)!r}|bd={bool(use_business_days)}|ord={ordering}".encode("utf-8"))
+    _hash_frame(h, df_pecas)
+    _hash_frame(h, df_seq_montagem)
+    if df_formas is not None:
+        h.update(b"formas")
+        _hash_frame(h, df_formas)
+    if df_capacidade is not None:
+        h.update(b"capacidade")
+        _hash_frame(h, df_capacidade)
+    return h.hexdigest()
+
+
+def _private(out: MixOutputs) -> MixOutputs:
+    """Cópia rasa: tabelas compartilhadas (somente leitura), caches de exibição próprios.
+
+    O objeto em ``_memory`` é o mesmo para todas as sessões e nunca é alterado
+    depois do ``put``; quem recebe a cópia pode preencher ``rollup``/``gargalos``
+    e os caches do rollup (``excel``, exibição) sem afetar as outras sessões.
+    """
+    rollup = None if out.rollup is None else dataclasses.replace(out.rollup, excel={}, _display={})
+    return dataclasses.replace(out, rollup=rollup)
+
+
+def get(key: str) -> Optional[MixOutputs]:
+    """Busca em memória e, se não houver, em ``data/mix_cache`` (devolve uma cópia da sessão)."""
+    out = _memory.get(key)
+    if out is not None:
+        return _private(out)
+
+    path = CACHE_DIR / f"{key}.pkl"
+    try:
+        with open(path, "rb") as f:
+            out = pickle.load(f)
+        os.utime(path)  # marca uso recente (LRU do disco usa mtime)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # arquivo corrompido/versão incompatível: descarta
+        path.unlink(missing_ok=True)
+        return None
+
+    _memory.put(key, out)
+    return _private(out)
+
+
+def put(key: str, out: MixOutputs) -> None:
+    """Guarda o mix (uma cópia: ``out`` continua livre para a sessão que o gerou)."""
+    out = _private(out)
+    _memory.put(key, out)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = CACHE_DIR / f"{key}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(out, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, CACHE_DIR / f"{key}.pkl")
+        _evict_disk()
+    except OSError:
+        # disco indisponível (ex.: somente leitura): fica só em memória
+        pass
+
+
+def _evict_disk(max_bytes: int = DISK_MAX_BYTES) -> None:
+    """Remove os arquivos menos usados até caber no limite."""
+    with _disk_lock:
+        files = []
+        for p in CACHE_DIR.glob("*.pkl"):
+            try:
+                stt = p.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stt.st_mtime, stt.st_size, p))
+        total = sum(size for _, size, _ in files)
+        for _, size, p in sorted(files, key=lambda x: x[0]):
+            if total <= max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+
+
+def clear() -> None:
+    _memory.clear()
+    with _disk_lock:
+        for p in CACHE_DIR.glob("*.pkl"):
+            p.unlink(missing_ok=True)
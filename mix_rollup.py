@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from name_sets import NameSets, materialize
+
+
+MODES = ("Diária", "Semanal", "Mensal")
+LIST_COLS = ("Seq de Montagem", "Nome Peças")
+
+
+@dataclass
+class MixRollup:
+    """Agregações prontas do mix por modo de visualização (Diária/Semanal/Mensal).
+
+    - views: tabela do mix já agregada e ordenada ("Seq de Montagem"/"Nome Peças" como ids)
+    - sets: conjuntos de nomes de cada view (ver ``name_sets``)
+    - charts: Demanda x Capacidade (índice = período)
+    - totals: linha TOTAL travada no rodapé
+    - excel: bytes do download, preenchido sob demanda pela página
+    """
+    views: Dict[str, pd.DataFrame]
+    charts: Dict[str, pd.DataFrame]
+    totals: Dict[str, dict]
+    sets: Dict[str, Dict[str, NameSets]] = field(default_factory=dict)
+    excel: Dict[str, bytes] = field(default_factory=dict)
+    _display: Dict[str, pd.DataFrame] = field(default_factory=dict)
+
+    def display(self, mode: str) -> pd.DataFrame:
+        """View com as listas de nomes montadas como texto (memoizada por modo)."""
+        if mode not in self._display:
+            self._display[mode] = materialize(self.views.get(mode), self.sets.get(mode, {}))
+        return self._display[mode]
+
+
+def pinned_totals_row(df: pd.DataFrame, label_col: str) -> dict:
+    tot_comp = pd.to_numeric(df.get("Comprimento Total de Fundo (m)", pd.Series(dtype=float)), errors="coerce").sum() if "Comprimento Total de Fundo (m)" in df.columns else 0.0
+    tot_vol = pd.to_numeric(df.get("Volume", pd.Series(dtype=float)), errors="coerce").sum() if "Volume" in df.columns else 0.0
+    row = {c: "" for c in df.columns}
+    if label_col in row:
+        row[label_col] = "TOTAL"
+    if "Comprimento Total de Fundo (m)" in row:
+        row["Comprimento Total de Fundo (m)"] = float(tot_comp)
+    if "Volume" in row:
+        row["Volume"] = float(tot_vol)
+    if "Qtd Pistas" in row:
+        row["Qtd Pistas"] = int(pd.to_numeric(df["Qtd Pistas"], errors="coerce").fillna(0).sum())
+    return row
+
+
+def build_rollup(
+    df_daily: pd.DataFrame,
+    capacidade_m3_dia: float,
+    name_sets: Optional[Dict[str, NameSets]] = None,
+    capacidade_dia: Optional[pd.Series] = None,
+) -> MixRollup:
+    """Calcula uma vez as três visualizações do mix (datas e períodos parseados uma só vez).
+
+    ``name_sets`` são os conjuntos do ``MixOutputs``; sem eles, as colunas de
+    lista são lidas como texto separado por ";". ``capacidade_dia`` (capacidade
+    total por data, ver ``capacity.daily_totals``) dá a capacidade real de cada
+    período no gráfico, inclusive de períodos sem produção; sem ela, usa
+    ``capacidade_m3_dia`` x dias com produção.
+    """
+    rollup = MixRollup(views={}, charts={}, totals={})
+    if df_daily is None or df_daily.empty:
+        for mode in MODES:
+            rollup.views[mode] = df_daily if df_daily is not None else pd.DataFrame()
+            rollup.charts[mode] = pd.DataFrame()
+            rollup.totals[mode] = {}
+        return rollup
+
+    d = df_daily.reset_index(drop=True)
+    d["Data"] = pd.to_datetime(d["Data"], errors="coerce")
+    daily_sets: Dict[str, NameSets] = {}
+    for col in LIST_COLS:
+        if col not in d.columns:
+            continue
+        if name_sets and col in name_sets:
+            daily_sets[col] = name_sets[col].take(d[col].to_numpy(dtype=np.int64))
+        else:
+            daily_sets[col] = NameSets.encode(np.arange(len(d)), d[col].fillna("").to_numpy(), len(d), sep=";")
+        d[col] = np.arange(len(d), dtype=np.int64)
+
+    periods = period_labels(d["Data"])
+    cap_periods = None
+    if capacidade_dia is not None and len(capacidade_dia):
+        cap_dates = pd.Series(pd.to_datetime(capacidade_dia.index), index=capacidade_dia.index)
+        cap_periods = {m: capacidade_dia.groupby(lbl.to_numpy()).sum() for m, lbl in period_labels(cap_dates).items()}
+
+    for mode in MODES:
+        df_view, df_chart, sets = _aggregate(
+            d.assign(Periodo=periods[mode]),
+            daily_sets,
+            capacidade_m3_dia,
+            None if cap_periods is None else cap_periods[mode],
+        )
+
+        sort_cols = [c for c in ["Data", "Setup", "Tipologia", "Tipo Armação"] if c in df_view.columns]
+        if sort_cols:
+            df_view = df_view.sort_values(sort_cols, kind="mergesort").reset_index(drop=True)
+
+        rollup.views[mode] = df_view
+        rollup.charts[mode] = df_chart
+        rollup.totals[mode] = pinned_totals_row(df_view, label_col="Data")
+        rollup.sets[mode] = sets
+
+    return rollup
+
+
+def period_labels(dates: pd.Series) -> Dict[str, pd.Series]:
+    """Rótulo do período de cada data, por modo de visualização."""
+    iso = dates.dt.isocalendar()
+    return {
+        "Diária": dates.dt.date.astype(str),
+        "Semanal": iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2),
+        "Mensal": dates.dt.to_period("M").astype(str),
+    }
+
+
+def _aggregate(
+    d: pd.DataFrame,
+    daily_sets: Dict[str, NameSets],
+    capacidade_m3_dia: float,
+    cap_periodo: Optional[pd.Series] = None,
+) -> tuple[pd.DataFrame, pd.DataFrame, Dict[str, NameSets]]:
+    """Retorna (df_view, df_chart, sets) para as linhas diárias com a coluna ``Periodo``."""
+    gcols = ["Periodo", "Tipologia", "Tipo Armação", "Fundo (cm)", "Lateral (cm)", "Setup"]
+    g = d.groupby(gcols, dropna=False, observed=True)
+    sums = {"Comprimento Total de Fundo (m)": "sum", "Volume": "sum"}
+    if "Qtd Pistas" in d.columns:
+        # semanal/mensal: pistas-dia no período
+        sums["Qtd Pistas"] = "sum"
+    df_view = (
+        g.agg(sums)
+         .reset_index()
+         .rename(columns={"Periodo": "Data"})
+    )
+    gid = g.ngroup().to_numpy()
+    sets: Dict[str, NameSets] = {}
+    for col, ns in daily_sets.items():
+        sets[col] = ns.union(d[col].to_numpy(dtype=np.int64), gid, len(df_view))
+        df_view[col] = np.arange(len(df_view), dtype=np.int64)
+
+    # Chart (demanda x capacidade)
+    chart = d.groupby("Periodo", dropna=False).agg({"Volume": "sum"}).reset_index().rename(columns={"Periodo": "Data", "Volume": "Demanda (m³)"})
+    if cap_periodo is not None:
+        # capacidade real do período (linhas x dias do calendário, com feriados e turnos)
+        cap = cap_periodo.rename("Capacidade (m³)").rename_axis("Data").reset_index()
+        chart = chart.merge(cap, on="Data", how="outer").sort_values("Data", kind="mergesort")
+        chart = chart.fillna({"Demanda (m³)": 0.0, "Capacidade (m³)": 0.0})
+    else:
+        # capacidade por período:
+        # diária -> 1 dia; semanal/mensal -> nº de dias únicos (do daily)
+        days_per_period = d.groupby("Periodo")["Data"].nunique().reset_index().rename(columns={"Periodo": "Data", "Data": "Dias"})
+        chart = chart.merge(days_per_period, on="Data", how="left")
+        chart["Capacidade (m³)"] = chart["Dias"].fillna(0).astype(float) * float(capacidade_m3_dia)
+        chart = chart.drop(columns=["Dias"])
+    chart = chart.set_index("Data")
+
+    return df_view, chart, sets
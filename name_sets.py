@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class NameSets:
+    """Listas de nomes codificadas como inteiros (formato CSR).
+
+    O conjunto ``i`` é ``names[codes[offsets[i]:offsets[i + 1]]]``. ``names`` é o
+    dicionário ordenado e os códigos de cada conjunto são únicos e crescentes,
+    então a ordem dos códigos é a ordem alfabética dos nomes. As uniões são
+    feitas sobre os códigos; as strings ``"A;B;C"`` só são montadas em
+    ``join`` (exibição/exportação).
+    """
+    names: np.ndarray
+    offsets: np.ndarray
+    codes: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @classmethod
+    def empty(cls, n_sets: int = 0) -> "NameSets":
+        return cls(
+            names=np.array([], dtype=object),
+            offsets=np.zeros(n_sets + 1, dtype=np.int64),
+            codes=np.zeros(0, dtype=np.int32),
+        )
+
+    @classmethod
+    def from_pairs(cls, set_ids: np.ndarray, codes: np.ndarray, n_sets: int, names: np.ndarray) -> "NameSets":
+        """Monta os conjuntos a partir de pares (conjunto, código), removendo repetidos."""
+        n_names = max(len(names), 1)
+        key = np.unique(np.asarray(set_ids, dtype=np.int64) * n_names + np.asarray(codes, dtype=np.int64))
+        sid = key // n_names
+        offsets = np.zeros(n_sets + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sid, minlength=n_sets), out=offsets[1:])
+        return cls(names=names, offsets=offsets, codes=(key % n_names).astype(np.int32))
+
+    @classmethod
+    def encode(cls, set_ids: np.ndarray, values, n_sets: int, sep: Optional[str] = None) -> "NameSets":
+        """Codifica ``values[i]`` no conjunto ``set_ids[i]``.
+
+        Com ``sep``, cada valor é quebrado em partes (ex.: nomes já unidos por ";").
+        Valores vazios são ignorados.
+        """
+        v = pd.Series(values, dtype=object).astype(str)
+        ids = pd.Series(np.asarray(set_ids, dtype=np.int64), index=v.index)
+        if sep is not None and v.str.contains(sep, regex=False).any():
+            v = v.str.split(sep).explode()
+            ids = ids.loc[v.index]
+        v = v.str.strip()
+        ok = (v != "").to_numpy()
+        codes, names = pd.factorize(v[ok], sort=True)
+        return cls.from_pairs(ids.to_numpy()[ok], codes, n_sets, np.asarray(names, dtype=object))
+
+    def union(self, member_ids: np.ndarray, group_ids: np.ndarray, n_groups: int) -> "NameSets":
+        """Conjunto ``g`` = união dos conjuntos ``member_ids[r]`` com ``group_ids[r] == g``."""
+        member_ids = np.asarray(member_ids, dtype=np.int64)
+        starts = self.offsets[member_ids]
+        lens = self.offsets[member_ids + 1] - starts
+        total = int(lens.sum())
+        rows = np.repeat(np.asarray(group_ids, dtype=np.int64), lens)
+        # posição de cada código: início do conjunto + deslocamento dentro dele
+        shift = np.repeat(starts - (np.cumsum(lens) - lens), lens)
+        codes = self.codes[shift + np.arange(total, dtype=np.int64)]
+        return NameSets.from_pairs(rows, codes, n_groups, self.names)
+
+    def take(self, ids: np.ndarray) -> "NameSets":
+        ids = np.asarray(ids, dtype=np.int64)
+        return self.union(ids, np.arange(len(ids), dtype=np.int64), len(ids))
+
+    @staticmethod
+    def concat(a: "NameSets", b: "NameSets") -> "NameSets":
+        """Conjuntos de ``a`` seguidos dos de ``b`` (dicionários unificados)."""
+        names = np.asarray(pd.Index(a.names).union(pd.Index(b.names)), dtype=object)
+        pos = pd.Index(names)
+        a_codes = pos.get_indexer(a.names)[a.codes] if len(a.codes) else a.codes
+        b_codes = pos.get_indexer(b.names)[b.codes] if len(b.codes) else b.codes
+        return NameSets(
+            names=names,
+            offsets=np.concatenate((a.offsets, b.offsets[1:] + a.offsets[-1])),
+            codes=np.concatenate((a_codes, b_codes)).astype(np.int32),
+        )
+
+    def fingerprint(self) -> np.ndarray:
+        """Hash (uint64) de cada conjunto, para comparar conjuntos sem montar strings."""
+        out = np.zeros(len(self), dtype=np.uint64)
+        if len(self.codes) == 0:
+            return out
+        h = pd.util.hash_array(self.names.astype(object))[self.codes]
+        lens = np.diff(self.offsets)
+        nonempty = lens > 0
+        out[nonempty] = np.bitwise_xor.reduceat(h, self.offsets[:-1][nonempty])
+        return out
+
+    def join(self, sep: str = ";") -> np.ndarray:
+        """Materializa cada conjunto como string ordenada ``"A;B;C"``."""
+        parts = self.names[self.codes].tolist() if len(self.codes) else []
+        off = self.offsets.tolist()
+        return np.array([sep.join(parts[off[i]:off[i + 1]]) for i in range(len(self))], dtype=object)
+
+
+def materialize(df: pd.DataFrame, sets: Dict[str, NameSets]) -> pd.DataFrame:
+    """Troca as colunas de ids de conjunto pelas strings (para exibir/exportar)."""
+    if df is None or df.empty or not sets:
+        return df
+    out = df.copy()
+    for col, ns in sets.items():
+        if col in out.columns:
+            out[col] = ns.join()[out[col].to_numpy(dtype=np.int64)]
+    return out
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+import key_index
+
+
+BASE_COLS = ["CT", "NOME OBRA", "ATIVA (S/N)", "GC", "XML (S/N)", "PEÇA x PEÇA (S/N)"]
+SEARCH_COLS = ["CT", "NOME OBRA", "GC"]
+
+# pontos por termo, conforme onde ele aparece (soma dos termos = relevância)
+_SCORE_CT_EXACT = 100
+_SCORE_CT_PREFIX = 60
+_SCORE_WORD_PREFIX = {"CT": 50, "NOME OBRA": 40, "GC": 30}
+_SCORE_SUBSTRING = {"CT": 20, "NOME OBRA": 10, "GC": 5}
+
+_GRAM = 3
+
+
+def fold(s) -> str:
+    """Texto para busca: sem acentos, minúsculo e com espaços simples."""
+    s = unicodedata.normalize("NFKD", str(s)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"\s+", " ", s.lower()).strip()
+
+
+def _field(v) -> str:
+    return "" if v is None or (not isinstance(v, str) and pd.isna(v)) else fold(v)
+
+
+def _grams(s: str) -> Set[str]:
+    return {s[i:i + _GRAM] for i in range(len(s) - _GRAM + 1)}
+
+
+def obras_base(df_obras_etapas: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Uma linha por CT (índice CT, ordenado): primeiro valor de cada coluna pelo nome da obra."""
+    if df_obras_etapas is None or df_obras_etapas.empty or "CT" not in df_obras_etapas.columns:
+        return pd.DataFrame(columns=BASE_COLS[1:], index=pd.Index([], name="CT"))
+    tmp = df_obras_etapas.copy()
+    for c in BASE_COLS:
+        if c not in tmp.columns:
+            tmp[c] = None
+    tmp["CT"] = tmp["CT"].astype(str).str.strip()
+    tmp["NOME OBRA"] = tmp["NOME OBRA"].astype(str).str.strip()
+    return (
+        tmp.sort_values(["CT", "NOME OBRA"], kind="mergesort")
+           .groupby("CT")[BASE_COLS[1:]]
+           .first()
+    )
+
+
+class ObrasIndex:
+    """Base das obras (1 linha por CT) e índice de trigramas para a busca.
+
+    Textos sem acento e minúsculos; cada trigrama aponta para os CTs que o
+    contêm. Salvar uma obra/etapa atualiza só o CT salvo (``update``).
+    ``source`` é a versão de ``df_obras_etapas`` que o índice reflete.
+    """
+
+    def __init__(self, df_obras_etapas: Optional[pd.DataFrame]) -> None:
+        self.base = obras_base(df_obras_etapas)
+        self.source = df_obras_etapas
+        self._text: Dict[str, Dict[str, str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        for ct, row in zip(self.base.index, self.base.itertuples(index=False)):
+            self._add(ct, dict(zip(BASE_COLS[1:], row)))
+
+    def __len__(self) -> int:
+        return len(self.base)
+
+    def _add(self, ct: str, row: Dict[str, object]) -> None:
+        text = {"CT": fold(ct), "NOME OBRA": _field(row.get("NOME OBRA")), "GC": _field(row.get("GC"))}
+        self._text[ct] = text
+        for g in set().union(*(_grams(t) for t in text.values())):
+            self._postings.setdefault(g, set()).add(ct)
+
+    def _remove(self, ct: str) -> None:
+        text = self._text.pop(ct, None)
+        if text is None:
+            return
+        for g in set().union(*(_grams(t) for t in text.values())):
+            cts = self._postings.get(g)
+            if cts is not None:
+                cts.discard(ct)
+                if not cts:
+                    del self._postings[g]
+
+    def update(self, df_obras_etapas: pd.DataFrame, cts: Iterable[str]) -> None:
+        """Reindexa só ``cts`` a partir da nova versão da tabela (e passa a refleti-la)."""
+        cts = {str(c).strip() for c in cts if str(c).strip()}
+        kidx = key_index.index_for(df_obras_etapas, key_index.CT_LEVELS)
+        rows = pd.concat([kidx.take(df_obras_etapas, ct) for ct in cts]) if cts else df_obras_etapas.iloc[:0]
+        fresh = obras_base(rows)
+        for ct in cts:
+            self._remove(ct)
+        keep = self.base.index.difference(list(cts))
+        self.base = pd.concat([self.base.loc[keep], fresh]).sort_index(kind="mergesort")
+        for ct, row in zip(fresh.index, fresh.itertuples(index=False)):
+            self._add(ct, dict(zip(BASE_COLS[1:], row)))
+        self.source = df_obras_etapas
+
+    def _candidates(self, term: str) -> Set[str]:
+        grams = _grams(term)
+        if not grams:
+            return set(self._text)
+        out: Optional[Set[str]] = None
+        for g in sorted(grams, key=lambda g: len(self._postings.get(g, ()))):
+            hits = self._postings.get(g)
+            if not hits:
+                return set()
+            out = set(hits) if out is None else (out & hits)
+            if not out:
+                return out
+        return out or set()
+
+    @staticmethod
+    def _score(text: Dict[str, str], term: str) -> int:
+        if text["CT"] == term:
+            return _SCORE_CT_EXACT
+        if text["CT"].startswith(term):
+            return _SCORE_CT_PREFIX
+        best = 0
+        for c in SEARCH_COLS:
+            t = text[c]
+            pos = t.find(term)
+            if pos < 0:
+                continue
+            if pos == 0 or not t[pos - 1].isalnum():
+                best = max(best, _SCORE_WORD_PREFIX[c])
+            else:
+                best = max(best, _SCORE_SUBSTRING[c])
+        return best
+
+    def search(self, query: str) -> List[str]:
+        """CTs que contêm todos os termos da busca, do mais ao menos relevante."""
+        terms = fold(query).split()
+        if not terms:
+            return list(self.base.index)
+        cands: Optional[Set[str]] = None
+        for t in sorted(terms, key=len, reverse=True):
+            c = self._candidates(t)
+            cands = c if cands is None else (cands & c)
+            if not cands:
+                return []
+        scored = []
+        for ct in cands:
+            text = self._text[ct]
+            total = 0
+            for t in terms:
+                s = self._score(text, t)
+                if s == 0:
+                    break
+                total += s
+            else:
+                scored.append((-total, ct))
+        return [ct for _, ct in sorted(scored)]
+
+    def frame(self, cts: Optional[List[str]] = None) -> pd.DataFrame:
+        """Base (colunas ``BASE_COLS``) das obras pedidas, na ordem pedida."""
+        b = self.base if cts is None else self.base.loc[cts]
+        return b.reset_index()[BASE_COLS]
+
+
+def index_for(session_state) -> ObrasIndex:
+    """Índice das obras da sessão; refeito só se ``df_obras_etapas`` mudou sem ``update``."""
+    df = session_state.get("df_obras_etapas")
+    idx = session_state.get("obras_index")
+    if idx is None or idx.source is not df:
+        idx = ObrasIndex(df)
+        session_state["obras_index"] = idx
+    return idx
+
+
+def saved(session_state, df_obras_etapas: pd.DataFrame, cts: Iterable[str]) -> None:
+    """Grava a nova versão de ``df_obras_etapas`` na sessão, reindexando só ``cts``."""
+    idx = session_state.get("obras_index")
+    if idx is not None and idx.source is session_state.get("df_obras_etapas"):
+        idx.update(df_obras_etapas, cts)
+    session_state["df_obras_etapas"] = df_obras_etapas
@@ -1,18 +1,21 @@
 from __future__ import annotations
 
 from io import BytesIO
-from typing import Optional, List
-
 import pandas as pd
 import streamlit as st
 
+import key_index
+import obras_search
+import project_store
 from constants import REQUIRED_OBRAS_ETAPAS_COLS, REQUIRED_SEQ_PROD_COLS
-from io_excel import read_excel_any, coerce_dates
+from io_excel import read_excel_sheets, coerce_dates
 from ui import set_toast
 
 
 ASSETS = "assets"
 TEMPLATE_PATH = f"{ASSETS}/FaciliFlow_Modelo_Cadastro_Obras.xlsx"
+OBRAS_POR_PAGINA = 25   # obras montadas por rerun no board
+SEQ_DATE_COLS = ["DATA_INICIO_PRODUÇÃO", "DATA_FIM_PRODUÇÃO", "DATA_INICIO_MONTAGEM", "DATA_FIM_MONTAGEM"]
 
 
 def _export_excel(df_obras: pd.DataFrame, df_seq: pd.DataFrame) -> bytes:
@@ -23,15 +26,6 @@ def _export_excel(df_obras: pd.DataFrame, df_seq: pd.DataFrame) -> bytes:
     return bio.getvalue()
 
 
-def _try_read_sheet(content: bytes, candidates: List[str]) -> Optional[pd.DataFrame]:
-    for s in candidates:
-        try:
-            return read_excel_any(content, sheet=s)
-        except Exception:
-            continue
-    return None
-
-
 def page_cadastro_obras() -> None:
     st.subheader("Obras")
 
@@ -96,10 +90,8 @@ def page_cadastro_obras() -> None:
 
                 dup = False
                 if not df_obras_etapas.empty:
-                    dup = (
-                        (df_obras_etapas["CT"].astype(str).str.strip() == ct_new) &
-                        (df_obras_etapas["ETAPA"].astype(str).str.strip().str.upper() == etapa_new.upper())
-                    ).any()
+                    same_ct = key_index.index_for(df_obras_etapas, key_index.CT_LEVELS).take(df_obras_etapas, ct_new)
+                    dup = (same_ct["ETAPA"].astype(str).str.strip().str.upper() == etapa_new.upper()).any()
 
                 if dup:
                     st.warning("Essa obra/etapa já existe. Use a expansão da obra para editar ou adicionar novas etapas.")
@@ -114,15 +106,19 @@ def page_cadastro_obras() -> None:
                         "PEÇA x PEÇA (S/N)": peca_new,
                     }
                     df_obras_etapas = pd.concat([df_obras_etapas, pd.DataFrame([row])], ignore_index=True)
-                    st.session_state["df_obras_etapas"] = df_obras_etapas
+                    obras_search.saved(st.session_state, df_obras_etapas, [ct_new])
+                    project_store.append_rows("df_obras_etapas", ct_new, pd.DataFrame([row]))
                     set_toast("Obra adicionada com sucesso.")
                     st.rerun()
 
     # ------- Importação: aplica ao carregar arquivo
     if up is not None and do_import:
         content = up.getvalue()
-        df_obras = _try_read_sheet(content, ["OBRAS", "OBRA", "CADASTRO_OBRAS"])
-        df_seq = _try_read_sheet(content, ["SEQUENCIA DE MONTAGEM", "SEQUENCIAS_MONTAGEM", "SEQUENCIAS MONTAGEM"])
+        sheets = read_excel_sheets(content, {
+            "obras": ["OBRAS", "OBRA", "CADASTRO_OBRAS"],
+            "seq": ["SEQUENCIA DE MONTAGEM", "SEQUENCIAS_MONTAGEM", "SEQUENCIAS MONTAGEM"],
+        })
+        df_obras, df_seq = sheets["obras"], sheets["seq"]
 
         if df_obras is None:
             st.error("Aba 'OBRAS' não encontrada.")
@@ -140,41 +136,26 @@ def page_cadastro_obras() -> None:
 
         df_obras = df_obras[REQUIRED_OBRAS_ETAPAS_COLS].copy()
         df_seq = df_seq[REQUIRED_SEQ_PROD_COLS].copy()
-        df_seq = coerce_dates(df_seq, ["DATA_INICIO_PRODUÇÃO","DATA_FIM_PRODUÇÃO","DATA_INICIO_MONTAGEM","DATA_FIM_MONTAGEM"])
+        df_seq = coerce_dates(df_seq, SEQ_DATE_COLS)
 
         st.session_state["df_obras_etapas"] = df_obras
         st.session_state["df_seq_montagem"] = df_seq
+        project_store.save_table("df_obras_etapas", df_obras)
+        project_store.save_table("df_seq_montagem", df_seq)
         set_toast("Cadastro importado com sucesso.")
         st.rerun()
 
     # ------- Dados atuais
+    # sequências: só as do CT aberto são lidas do disco (a tabela inteira só
+    # está na sessão se outra página já a carregou, ex.: Mix de Produção)
     df_obras_etapas = st.session_state.get("df_obras_etapas")
     df_seq = st.session_state.get("df_seq_montagem")
 
     if df_obras_etapas is None:
         df_obras_etapas = pd.DataFrame(columns=REQUIRED_OBRAS_ETAPAS_COLS)
-    if df_seq is None:
-        df_seq = pd.DataFrame(columns=REQUIRED_SEQ_PROD_COLS)
-
-    # base (1 linha por CT)
-    base_cols = ["CT","NOME OBRA","ATIVA (S/N)","GC","XML (S/N)","PEÇA x PEÇA (S/N)"]
-    obras_base = pd.DataFrame(columns=base_cols)
-    if not df_obras_etapas.empty and "CT" in df_obras_etapas.columns:
-        tmp = df_obras_etapas.copy()
-        tmp["CT"] = tmp["CT"].astype(str).str.strip()
-        tmp["NOME OBRA"] = tmp["NOME OBRA"].astype(str).str.strip()
-        obras_base = (
-            tmp.dropna(subset=["CT"])
-               .sort_values(["CT","NOME OBRA"])
-               .groupby("CT", as_index=False)
-               .agg({
-                   "NOME OBRA":"first",
-                   "ATIVA (S/N)":"first",
-                   "GC":"first",
-                   "XML (S/N)":"first",
-                   "PEÇA x PEÇA (S/N)":"first",
-               })
-        )[base_cols]
+
+    # base (1 linha por CT) e busca: índice mantido entre reruns (obras_search)
+    obras_idx = obras_search.index_for(st.session_state)
 
     st.divider()
     st.markdown("### Lista de obras")
@@ -190,14 +171,7 @@ def page_cadastro_obras() -> None:
     with f4:
         peca = st.selectbox("Peça x Peça", ["(todas)", "S", "N"], index=0)
 
-    filt = obras_base.copy()
-    if q.strip():
-        qq = q.strip().lower()
-        filt = filt[
-            filt["CT"].astype(str).str.lower().str.contains(qq)
-            | filt["NOME OBRA"].astype(str).str.lower().str.contains(qq)
-            | filt["GC"].astype(str).str.lower().str.contains(qq)
-        ]
+    filt = obras_idx.frame(obras_idx.search(q) if q.strip() else None)
     if ativa != "(todas)":
         filt = filt[filt["ATIVA (S/N)"].astype(str).str.upper().str.strip() == ativa]
     if xml != "(todas)":
@@ -207,11 +181,27 @@ def page_cadastro_obras() -> None:
 
     if "obra_open" not in st.session_state:
         st.session_state["obra_open"] = {}
+    if "obra_seq_open" not in st.session_state:
+        st.session_state["obra_seq_open"] = {}
 
     if filt.empty:
         st.info("Nenhuma obra encontrada com os filtros atuais.")
         return
 
+    # paginação: só as obras da página viram widgets; filtro novo volta à página 1
+    n_pages = max(1, -(-len(filt) // OBRAS_POR_PAGINA))
+    sig = (q.strip(), ativa, xml, peca)
+    if st.session_state.get("obras_filter_sig") != sig:
+        st.session_state["obras_filter_sig"] = sig
+        st.session_state["obras_page"] = 1
+    if int(st.session_state.get("obras_page", 1)) > n_pages:
+        st.session_state["obras_page"] = n_pages
+    p1, p2 = st.columns([1, 3], vertical_alignment="center")
+    page = int(p1.number_input("Página", min_value=1, max_value=n_pages, step=1, key="obras_page"))
+    p2.caption(f"{len(filt)} obras · página {page} de {n_pages}")
+    start = (page - 1) * OBRAS_POR_PAGINA
+    page_rows = filt.iloc[start:start + OBRAS_POR_PAGINA].to_dict("records")
+
     # cabeçalho estilo board
     h1, h2, h3, h4, h5, h6 = st.columns([0.6, 1.2, 2.8, 1.2, 1.2, 1.4])
     h1.markdown("")
@@ -221,16 +211,34 @@ def page_cadastro_obras() -> None:
     h5.markdown("**XML**")
     h6.markdown("**Peça x Peça**")
 
+    # fatias por CT pelo índice (montado uma vez por versão das tabelas)
+    et_idx = key_index.index_for(df_obras_etapas, key_index.CT_LEVELS)
+    seq_idx = key_index.index_for(df_seq, key_index.CT_LEVELS) if df_seq is not None else None
+
+    def _seq_of(ct: str) -> pd.DataFrame:
+        if seq_idx is not None:
+            return seq_idx.take(df_seq, ct)
+        part = project_store.load_cts(st.session_state, "df_seq_montagem", [ct])
+        return part if part is not None else pd.DataFrame(columns=REQUIRED_SEQ_PROD_COLS)
+
     def _save_seq_for_ct(ct: str, edited: pd.DataFrame) -> None:
-        nonlocal df_seq
-        rest = df_seq[df_seq["CT"].astype(str).str.strip() != ct].copy()
-        merged = pd.concat([rest, edited], ignore_index=True)
-        merged = coerce_dates(merged, ["DATA_INICIO_PRODUÇÃO","DATA_FIM_PRODUÇÃO","DATA_INICIO_MONTAGEM","DATA_FIM_MONTAGEM"])
-        st.session_state["df_seq_montagem"] = merged
+        edited = coerce_dates(edited, SEQ_DATE_COLS)
+        if seq_idx is not None:
+            merged = pd.concat([seq_idx.drop(df_seq, ct), edited], ignore_index=True)
+            st.session_state["df_seq_montagem"] = merged
+            # regrava só o CT editado (e CTs digitados nas linhas novas)
+            project_store.save_cts("df_seq_montagem", merged, [ct, *edited["CT"].dropna().astype(str)])
+        else:
+            # só o CT aberto foi lido: regrava a partição dele; linhas digitadas
+            # com outro CT entram na partição daquele CT
+            keys = edited["CT"].astype(str).str.strip()
+            project_store.save_partition("df_seq_montagem", ct, edited[keys == ct])
+            for other in set(keys[edited["CT"].notna()]) - {ct}:
+                project_store.append_rows("df_seq_montagem", other, edited[keys == other])
         set_toast("Sequências salvas com sucesso.")
         st.rerun()
 
-    for _, row in filt.iterrows():
+    for row in page_rows:
         ct = str(row["CT"]).strip()
         open_now = st.session_state["obra_open"].get(ct, False)
         arrow = "▼" if open_now else "▶"
@@ -254,26 +262,39 @@ def page_cadastro_obras() -> None:
 
             if st.session_state["obra_open"].get(ct, False):
                 st.markdown("#### Etapas")
-                df_et = df_obras_etapas[df_obras_etapas["CT"].astype(str).str.strip() == ct].copy()
+                df_et = et_idx.take(df_obras_etapas, ct).copy()
                 df_et_edit = st.data_editor(df_et, num_rows="dynamic", use_container_width=True, key=f"editor_etapas_{ct}")
 
                 b1, b2 = st.columns([1, 1])
                 with b1:
                     if st.button("Salvar etapas", key=f"save_etapas_{ct}", type="primary", use_container_width=True):
-                        rest = df_obras_etapas[df_obras_etapas["CT"].astype(str).str.strip() != ct].copy()
+                        rest = et_idx.drop(df_obras_etapas, ct)
                         merged = pd.concat([rest, df_et_edit], ignore_index=True)
-                        st.session_state["df_obras_etapas"] = merged
+                        obras_search.saved(st.session_state, merged, [ct, *df_et_edit["CT"].dropna().astype(str)])
+                        project_store.save_cts("df_obras_etapas", merged, [ct, *df_et_edit["CT"].dropna().astype(str)])
                         set_toast("Etapas salvas com sucesso.")
                         st.rerun()
 
                 with b2:
-                    with st.popover("Sequências de produção", use_container_width=True):
-                        df_s = df_seq[df_seq["CT"].astype(str).str.strip() == ct].copy()
+                    seq_open = st.session_state["obra_seq_open"].get(ct, False)
+                    if st.button(
+                        ("▼ " if seq_open else "▶ ") + "Sequências de produção",
+                        key=f"toggle_seq_{ct}",
+                        use_container_width=True,
+                    ):
+                        st.session_state["obra_seq_open"][ct] = not seq_open
+                        st.rerun()
+
+                # editor de sequências montado só quando aberto
+                if st.session_state["obra_seq_open"].get(ct, False):
+                    with st.container(border=True):
+                        st.markdown("#### Sequências de produção")
+                        df_s = _seq_of(ct).copy()
                         if df_s.empty:
                             df_s = pd.DataFrame(columns=REQUIRED_SEQ_PROD_COLS)
 
                         # Datas como date (calendário)
-                        for c in ["DATA_INICIO_PRODUÇÃO","DATA_FIM_PRODUÇÃO","DATA_INICIO_MONTAGEM","DATA_FIM_MONTAGEM"]:
+                        for c in SEQ_DATE_COLS:
                             if c in df_s.columns:
                                 df_s[c] = pd.to_datetime(df_s[c], errors="coerce").dt.date
 
@@ -282,10 +303,18 @@ def page_cadastro_obras() -> None:
                             _save_seq_for_ct(ct, df_s_edit)
 
     st.divider()
-    st.download_button(
-        "Exportar cadastro (Excel)",
-        data=_export_excel(st.session_state.get("df_obras_etapas", df_obras_etapas), st.session_state.get("df_seq_montagem", df_seq)),
-        file_name="FaciliFlow_Cadastro_Export.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        use_container_width=True,
-    )
+    # a exportação precisa de todas as sequências: lidas só quando pedida
+    if st.button("Exportar cadastro (Excel)", use_container_width=True):
+        seq_all = df_seq if df_seq is not None else project_store.load_table("df_seq_montagem")
+        if seq_all is None:
+            seq_all = pd.DataFrame(columns=REQUIRED_SEQ_PROD_COLS)
+        st.session_state["obras_export"] = _export_excel(df_obras_etapas, seq_all)
+    export = st.session_state.pop("obras_export", None)
+    if export is not None:
+        st.download_button(
+            "Baixar cadastro (Excel)",
+            data=export,
+            file_name="FaciliFlow_Cadastro_Export.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            use_container_width=True,
+        )
@@ -2,18 +2,59 @@ from __future__ import annotations
 
 import streamlit as st
 
+from constants import DEFAULT_PARAMS
+from d5_list import DEFAULT_D5_DIAS_UTEIS, build_d5, d5_excel_bytes, summarize_d5
+from grid import show_grid
+from profiling import span
+
 
 def page_d5() -> None:
     st.subheader("Programação de Projeto (D-5)")
     st.write("Toda peça precisa estar detalhada **D-5 dias úteis** antes da data de fabricação.")
 
-    params = st.session_state.get("params", {})
-    st.metric("Regra atual", f"D-{params.get('d5_dias_uteis', 5)} dias úteis")
+    params = st.session_state.get("params", DEFAULT_PARAMS.copy())
+    params["d5_dias_uteis"] = int(st.number_input(
+        "Antecedência da engenharia (dias úteis)",
+        min_value=0,
+        max_value=60,
+        value=int(params.get("d5_dias_uteis", DEFAULT_D5_DIAS_UTEIS)),
+        step=1,
+    ))
+    st.session_state["params"] = params
+    n = params["d5_dias_uteis"]
+    st.metric("Regra atual", f"D-{n} dias úteis")
 
+    starts = st.session_state.get("mix_inicio_lotes")
     df_d5 = st.session_state.get("df_d5")
+    if starts is not None and (df_d5 is None or st.session_state.get("df_d5_dias") != n):
+        with span("Lista D-5", rows=len(starts.lots)):
+            df_d5 = build_d5(starts, n)
+        st.session_state["df_d5"] = df_d5
+        st.session_state["df_d5_dias"] = n
+        st.session_state.pop("df_d5_excel", None)
+
     if df_d5 is None or df_d5.empty:
-        st.info("Gere a programação na aba **Programação** para criar a lista D-5.")
+        st.info("Gere a programação na aba **Mix de Produção** para criar a lista D-5.")
         return
 
-    st.markdown("### Entregas da Engenharia (D-5)")
-    st.dataframe(df_d5, use_container_width=True)
+    atrasadas = int((df_d5["DIAS ÚTEIS ATÉ ENTREGA"] < 0).sum())
+    c1, c2 = st.columns(2)
+    c1.metric("Peças na lista", len(df_d5))
+    c2.metric("Entregas já vencidas", atrasadas)
+
+    st.markdown("### Entregas da Engenharia por sequência")
+    show_grid(summarize_d5(df_d5), key="grid_d5_seq", height=320)
+
+    st.markdown("### Entregas da Engenharia por peça")
+    show_grid(df_d5, key="grid_d5_pecas", height=460)
+
+    if st.session_state.get("df_d5_excel") is None:
+        with span("Exportação Excel (D-5)", rows=len(df_d5)):
+            st.session_state["df_d5_excel"] = d5_excel_bytes(df_d5)
+    st.download_button(
+        "Baixar lista D-5 (Excel)",
+        data=st.session_state["df_d5_excel"],
+        file_name=f"FaciliFlow_D{n}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        use_container_width=True,
+    )
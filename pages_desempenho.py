@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import List
+
+import pandas as pd
+import streamlit as st
+
+from profiling import LOG_PATH, Trace, read_log
+from schema import memory_report
+
+
+def _spans_frame(spans: List[dict]) -> pd.DataFrame:
+    return pd.DataFrame([
+        {
+            "Fase": "· " * int(s.get("depth", 0)) + str(s["name"]),
+            "Início (s)": round(float(s.get("start", 0.0)), 3),
+            "Tempo (s)": round(float(s["seconds"]), 4),
+            "Linhas": s.get("rows"),
+            "Δ Memória (MB)": None if s.get("mem_delta_mb") is None else round(float(s["mem_delta_mb"]), 1),
+        }
+        for s in spans
+    ])
+
+
+def render_profiling_panel(traces: List[Trace]) -> None:
+    """Painel (somente admin): fases das últimas execuções, histórico do log e memória da sessão."""
+    with st.expander("Desempenho", expanded=False):
+        t1, t2, t3 = st.tabs(["Execuções recentes", "Histórico", "Memória da sessão"])
+
+        with t3:
+            rep = memory_report(st.session_state)
+            if rep.empty:
+                st.caption("Nenhuma tabela na sessão.")
+            else:
+                st.metric("Total das tabelas", f"{rep['Memória (MB)'].sum():,.1f} MB")
+                st.dataframe(rep, use_container_width=True, hide_index=True)
+
+        with t1:
+            if not traces:
+                st.caption("Nenhuma execução medida nesta sessão.")
+            else:
+                labels = [f"{tr.started_at} • {tr.name} • {tr.seconds:.3f}s" for tr in reversed(traces)]
+                i = st.selectbox("Execução", range(len(labels)), format_func=lambda k: labels[k], key="prof_exec")
+                tr = list(reversed(traces))[i]
+                if tr.spans:
+                    st.dataframe(_spans_frame(tr.to_dict()["spans"]), use_container_width=True, hide_index=True)
+                else:
+                    st.caption("Nenhuma fase instrumentada nesta execução.")
+
+        with t2:
+            runs = read_log()
+            if not runs:
+                st.caption(f"Sem execuções registradas em {LOG_PATH}.")
+                return
+            df = pd.DataFrame([
+                {
+                    "Início": r.get("started_at"),
+                    "Página": r.get("name"),
+                    "Fase": s["name"],
+                    "Tempo (s)": float(s["seconds"]),
+                    "Linhas": s.get("rows"),
+                }
+                for r in runs for s in r.get("spans", [])
+            ])
+            if df.empty:
+                st.caption("As execuções registradas não têm fases instrumentadas.")
+                return
+            g = df.groupby(["Página", "Fase"], sort=False)["Tempo (s)"]
+            summary = pd.DataFrame({
+                "Execuções": g.size(),
+                "Mediana (s)": g.median().round(4),
+                "P90 (s)": g.quantile(0.9).round(4),
+                "Última (s)": g.last().round(4),
+            }).reset_index()
+            st.dataframe(summary, use_container_width=True, hide_index=True)
+
+            fase = st.selectbox("Evolução da fase", sorted(df["Fase"].unique()), key="prof_fase")
+            st.line_chart(df[df["Fase"] == fase].groupby("Início")["Tempo (s)"].sum())
@@ -5,6 +5,7 @@ from io import BytesIO
 import pandas as pd
 import streamlit as st
 
+import project_store
 from io_excel import read_excel_any
 from validators import require_columns
 from constants import REQUIRED_FORMAS_COLS
@@ -47,6 +48,7 @@ def page_formas() -> None:
         vr = require_columns(df, REQUIRED_FORMAS_COLS, "FORMAS")
         if vr.ok:
             st.session_state["df_formas"] = df[REQUIRED_FORMAS_COLS].copy()
+            project_store.save_table("df_formas", st.session_state["df_formas"])
             set_toast("Formas importadas com sucesso.")
             st.rerun()
         else:
@@ -82,6 +84,7 @@ def page_formas() -> None:
                 return
 
             st.session_state["df_formas"] = df_clean[REQUIRED_FORMAS_COLS].reset_index(drop=True)
+            project_store.save_table("df_formas", st.session_state["df_formas"])
             set_toast("Formas salvas com sucesso.")
             st.rerun()
 
@@ -1,41 +1,40 @@
 from __future__ import annotations
 
 import streamlit as st
-import pandas as pd
+
+from bottlenecks import SATURATED_PCT, TOP_N, top_days
+from grid import show_grid
 
 
 def page_gargalos() -> None:
     st.subheader("Gargalos / Alertas")
-    params = st.session_state.get("params", {})
-    cap = float(params.get("capacidade_m3_dia", 30.0))
 
-    df_raw = st.session_state.get("mix_diario_raw")
+    garg = st.session_state.get("mix_gargalos")
     df_pend = st.session_state.get("mix_pendencias")
 
-    if df_raw is None or df_raw.empty:
-        st.info("Gere o MIX na aba **Produção — MIX** para ver gargalos e alertas.")
+    if garg is None or garg.daily.empty:
+        st.info("Gere o mix na aba **Mix de Produção** para ver gargalos e alertas.")
         return
 
-    d = df_raw.copy()
-    d["DATA"] = pd.to_datetime(d["DATA"], errors="coerce")
-
-    resumo = (d.groupby(d["DATA"].dt.date)
-                .agg(VOLUME_M3=("VOLUME (M3)", "sum"),
-                     PISTAS=("QTD PISTAS", "sum"),
-                     SETUPS=("SETUP", "nunique"))
-                .reset_index()
-                .rename(columns={"DATA":"DATA"}))
-    resumo["CAP_M3_DIA"] = cap
-    resumo["UTIL_CAP"] = resumo["VOLUME_M3"] / resumo["CAP_M3_DIA"]
+    daily = garg.daily
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Utilização média", f"{daily['Utilização (%)'].mean():.1f}%")
+    c2.metric("Dias com capacidade esgotada", int((daily["Utilização (%)"] >= SATURATED_PCT).sum()))
+    c3.metric("Volume pendente", f"{garg.pending_total:,.1f} m³")
 
     st.markdown("### Utilização diária (Volume x Capacidade)")
-    st.dataframe(resumo.sort_values("DATA"), use_container_width=True)
-    st.line_chart(resumo.set_index("DATA")[["VOLUME_M3", "CAP_M3_DIA"]])
+    st.line_chart(daily[["Volume (m³)", "Capacidade (m³)"]])
 
     st.markdown("### Dias com maior carga")
-    st.dataframe(resumo.sort_values("UTIL_CAP", ascending=False).head(20), use_container_width=True)
+    n = int(st.number_input("Quantidade de dias", min_value=5, max_value=200, value=TOP_N, step=5))
+    top = garg.top if n == TOP_N else top_days(daily, n)
+    show_grid(top.round(2).reset_index().assign(Data=lambda d: d["Data"].dt.date), key="grid_garg_top", height=360)
+
+    if not garg.pend_ct.empty:
+        st.markdown("### Volume pendente por CT")
+        show_grid(garg.pend_ct.round(2).reset_index(), key="grid_garg_ct", height=300)
 
     if df_pend is not None and not df_pend.empty:
         st.markdown("### Pendências (principal gargalo)")
         st.warning("Pendências indicam que **não coube nas datas** informadas ou **não existe forma compatível**.")
-        st.dataframe(df_pend, use_container_width=True)
+        show_grid(df_pend, key="grid_garg_pend", height=300)
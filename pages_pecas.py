@@ -3,15 +3,19 @@ from __future__ import annotations
 from io import BytesIO
 import re
 import unicodedata
-import uuid
 
 import pandas as pd
 import streamlit as st
 
-from constants import REQUIRED_PECAS_COLS, DEFAULT_PARAMS
+import key_index
+import piece_table
+import project_store
+import schema
+from capacity import normalize_capacidade
+from constants import REQUIRED_CAPACIDADE_COLS, REQUIRED_PECAS_COLS, DEFAULT_PARAMS
 from io_excel import read_excel_any
 from ui import set_toast
-from grid import show_grid
+from grid import selected_ids as selected_ids_of, show_grid
 
 
 ASSETS = "assets"
@@ -72,6 +76,20 @@ def _apply_mapping(df_raw: pd.DataFrame, mapping: dict[str, str | None]) -> pd.D
     return out
 
 
+def _new_ids(n: int):
+    """Ids novos para peças: seguem os da tabela atual e os já entregues na sessão."""
+    df = st.session_state.get("df_pecas")
+    floor = int(st.session_state.get("pecas_next_id", 0))
+    if df is None:
+        # tabela não carregada na sessão: maior ``_id`` gravado (só essa coluna é lida)
+        top = project_store.column_max("df_pecas", schema.ID_COL)
+        floor = max(floor, int(top) + 1 if top is not None else 0)
+    ids = schema.new_ids(df, n, floor=floor)
+    if len(ids):
+        st.session_state["pecas_next_id"] = int(ids[-1]) + 1
+    return ids
+
+
 def _to_excel(df: pd.DataFrame) -> bytes:
     bio = BytesIO()
     df_out = df.copy()
@@ -82,6 +100,46 @@ def _to_excel(df: pd.DataFrame) -> bytes:
     return bio.getvalue()
 
 
+def _delete(table, part, ct, ids) -> None:
+    """Exclui peças pelo ``_id``: na tabela da sessão ou, com só um CT lido, na partição dele."""
+    if table is not None:
+        table.delete(ids)
+    elif part is not None:
+        project_store.save_partition("df_pecas", ct, part[~part[schema.ID_COL].isin(ids).to_numpy()])
+
+
+def _render_linhas() -> None:
+    """Linhas de produção: capacidade por linha/turno, feriados e tipologias aceitas."""
+    df_cap = st.session_state.get("df_capacidade")
+    if df_cap is None:
+        df_cap = pd.DataFrame(columns=REQUIRED_CAPACIDADE_COLS)
+    with st.expander("Linhas de produção e calendário (opcional)", expanded=False):
+        st.caption(
+            "Sem linhas cadastradas, vale a capacidade média acima. Linha sem datas = capacidade padrão "
+            "da linha (TIPOLOGIAS vazio = aceita todas). Linha com DATA_INICIO/DATA_FIM = turno ou "
+            "parada no intervalo; LINHA vazia com datas vale para a fábrica toda e, com capacidade 0, "
+            "tira os dias do calendário (feriado/parada). Capacidade > 0 num sábado ou domingo torna "
+            "o dia trabalhado."
+        )
+        df_edit = st.data_editor(
+            df_cap,
+            num_rows="dynamic",
+            use_container_width=True,
+            key="editor_capacidade",
+            column_config={
+                "DATA_INICIO": st.column_config.DateColumn("DATA_INICIO", format="DD/MM/YYYY"),
+                "DATA_FIM": st.column_config.DateColumn("DATA_FIM", format="DD/MM/YYYY"),
+                "CAPACIDADE_M3_DIA": st.column_config.NumberColumn("CAPACIDADE_M3_DIA", min_value=0.0, step=0.5),
+            },
+        )
+        if st.button("Salvar linhas", key="save_capacidade", use_container_width=True):
+            df_clean = normalize_capacidade(df_edit)
+            st.session_state["df_capacidade"] = df_clean
+            project_store.save_table("df_capacidade", df_clean)
+            set_toast("Linhas de produção salvas.")
+            st.rerun()
+
+
 def page_pecas() -> None:
     st.subheader("Peças")
 
@@ -94,6 +152,7 @@ def page_pecas() -> None:
         step=0.5,
     )
     st.session_state["params"] = params
+    _render_linhas()
 
     st.divider()
 
@@ -158,9 +217,12 @@ def page_pecas() -> None:
                 for c in ["CT", "ETAPA", "SEQUENCIA", "NOME PEÇA", "TIPOLOGIA", "TIPO ARMAÇÃO"]:
                     df[c] = df[c].astype(str).str.strip()
 
-                df["_id"] = [uuid.uuid4().hex for _ in range(len(df))]
+                df["_id"] = _new_ids(len(df))
+                df = schema.compact(df, "df_pecas")
 
+                piece_table.settle(st.session_state)
                 st.session_state["df_pecas"] = df
+                project_store.save_table("df_pecas", df)
                 set_toast("Peças salvas com sucesso.")
                 st.rerun()
         with b2:
@@ -170,36 +232,50 @@ def page_pecas() -> None:
     df = st.session_state.get("df_pecas")
     if df is not None and not df.empty and "_id" not in df.columns:
         df = df.copy()
-        df["_id"] = [uuid.uuid4().hex for _ in range(len(df))]
-        st.session_state["df_pecas"] = df
+        df["_id"] = _new_ids(len(df))
+        st.session_state["df_pecas"] = df = schema.compact(df, "df_pecas")
+    table = piece_table.sync(st.session_state)
 
     st.divider()
     st.markdown("### Consulta")
 
-    if df is None or df.empty:
+    # sem a tabela na sessão, a Consulta começa por um CT e lê só a partição
+    # dele; "(todos)" carrega a tabela inteira
+    stored_cts = sorted(project_store.list_cts("df_pecas")) if df is None else []
+    if (df is None or df.empty) and not stored_cts:
         st.info("Nenhuma peça cadastrada.")
         return
 
     c1, c2, c3 = st.columns(3)
     with c1:
-        cts = sorted([x for x in df["CT"].dropna().astype(str).unique().tolist() if x])
-        ct = st.selectbox("CT", ["(todos)"] + cts, index=0)
+        if df is not None:
+            ct = st.selectbox("CT", ["(todos)"] + key_index.index_for(df, key_index.PECAS_LEVELS).options("CT"), index=0)
+        else:
+            ct = st.selectbox("CT", ["(todos)"] + stored_cts, index=1)
+    ct_v = None if ct == "(todos)" else ct
+
+    part = None
+    if df is None and ct_v is not None:
+        part = project_store.load_cts(st.session_state, "df_pecas", [ct_v])
+        if part is not None and schema.ID_COL not in part.columns:
+            part = None   # gravação antiga sem ``_id``: ids são criados com a tabela inteira
+    if df is None and part is None:
+        project_store.hydrate(st.session_state, ["df_pecas"])
+        if st.session_state.get("df_pecas") is None:
+            st.info("Nenhuma peça cadastrada.")
+            return
+        st.rerun()
+    view = df if part is None else part
+
+    kidx = key_index.index_for(view, key_index.PECAS_LEVELS)
     with c2:
-        df2 = df if ct == "(todos)" else df[df["CT"].astype(str) == ct]
-        etapas = sorted([x for x in df2["ETAPA"].dropna().astype(str).unique().tolist() if x])
-        etapa = st.selectbox("Etapa", ["(todas)"] + etapas, index=0)
+        etapa = st.selectbox("Etapa", ["(todas)"] + kidx.options("ETAPA", ct_v), index=0)
+    etapa_v = None if etapa == "(todas)" else etapa
     with c3:
-        df3 = df2 if etapa == "(todas)" else df2[df2["ETAPA"].astype(str) == etapa]
-        seqs = sorted([x for x in df3["SEQUENCIA"].dropna().astype(str).unique().tolist() if x])
-        seq = st.selectbox("Sequência", ["(todas)"] + seqs, index=0)
-
-    out = df.copy()
-    if ct != "(todos)":
-        out = out[out["CT"].astype(str) == ct]
-    if etapa != "(todas)":
-        out = out[out["ETAPA"].astype(str) == etapa]
-    if seq != "(todas)":
-        out = out[out["SEQUENCIA"].astype(str) == seq]
+        seq = st.selectbox("Sequência", ["(todas)"] + kidx.options("SEQUENCIA", ct_v, etapa_v), index=0)
+    seq_v = None if seq == "(todas)" else seq
+
+    out = kidx.take(view, ct_v, etapa_v, seq_v)
 
     # Seleção para exclusão (opcional)
     sel_mode = st.checkbox("Selecionar linhas para excluir", value=False)
@@ -213,16 +289,7 @@ def page_pecas() -> None:
     )
 
     if sel_mode:
-        selected = []
-        try:
-            selected = (resp.get("selected_rows") if resp else [])
-            if selected is None:
-                selected = []
-        except Exception:
-            selected = []
-        if not isinstance(selected, list):
-            selected = []
-        selected_ids = [r.get("_id") for r in selected if isinstance(r, dict) and r.get("_id")]
+        selected_ids = selected_ids_of(resp)
         st.caption(f"Selecionadas: {len(selected_ids)}")
 
         cdel1, cdel2 = st.columns([1.2, 2.8], vertical_alignment="center")
@@ -234,11 +301,9 @@ def page_pecas() -> None:
                 type="secondary",
                 disabled=(len(selected_ids) == 0 or confirm_sel.strip().upper() != "EXCLUIR"),
             ):
-                df_all = st.session_state.get("df_pecas")
-                if df_all is not None and not df_all.empty and "_id" in df_all.columns:
-                    st.session_state["df_pecas"] = df_all[~df_all["_id"].isin(selected_ids)].reset_index(drop=True)
-                    set_toast("Linhas selecionadas excluídas.")
-                    st.rerun()
+                _delete(table, part, ct_v, selected_ids)
+                set_toast("Linhas selecionadas excluídas.")
+                st.rerun()
 
     st.divider()
     st.markdown("### Exclusão")
@@ -250,31 +315,16 @@ def page_pecas() -> None:
         with col_a:
             confirm = st.text_input("Para confirmar, digite EXCLUIR", value="", key="confirm_delete_pecas")
             if st.button("Excluir peças filtradas", type="secondary", disabled=(confirm.strip().upper() != "EXCLUIR")):
-                df_all = st.session_state.get("df_pecas")
-                if df_all is not None and not df_all.empty:
-                    df_all2 = df_all.copy()
-                    out2 = out.copy()
-                    if "_id" in df_all2.columns and "_id" in out2.columns:
-                        st.session_state["df_pecas"] = df_all2[~df_all2["_id"].isin(out2["_id"].tolist())].reset_index(drop=True)
-                    else:
-                        key_cols = ["CT", "ETAPA", "SEQUENCIA", "NOME PEÇA", "TIPOLOGIA", "TIPO ARMAÇÃO", "FUNDO (CM)", "LATERAL (CM)", "QTDE", "COMPRIMENTO (M)", "VOLUME (M3)"]
-                        for c in key_cols:
-                            if c not in df_all2.columns:
-                                df_all2[c] = None
-                            if c not in out2.columns:
-                                out2[c] = None
-                        sig_all = df_all2[key_cols].astype(str).agg("|".join, axis=1)
-                        sig_out = set(out2[key_cols].astype(str).agg("|".join, axis=1).tolist())
-                        keep = ~sig_all.isin(sig_out)
-                        st.session_state["df_pecas"] = df_all2.loc[keep].reset_index(drop=True)
-
-                    set_toast("Peças filtradas excluídas.")
-                    st.rerun()
+                _delete(table, part, ct_v, out["_id"].to_numpy())
+                set_toast("Peças filtradas excluídas.")
+                st.rerun()
 
         with col_b:
             confirm_all = st.text_input("Para limpar tudo, digite LIMPAR", value="", key="confirm_delete_all_pecas")
             if st.button("Limpar todas as peças", type="secondary", disabled=(confirm_all.strip().upper() != "LIMPAR")):
-                st.session_state["df_pecas"] = pd.DataFrame(columns=[c for c in df.columns if c != "_id"])
+                piece_table.settle(st.session_state)
+                st.session_state["df_pecas"] = pd.DataFrame(columns=[c for c in view.columns if c != "_id"])
+                project_store.save_table("df_pecas", st.session_state["df_pecas"])
                 set_toast("Todas as peças foram removidas.")
                 st.rerun()
 
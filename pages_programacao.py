@@ -1,15 +1,30 @@
 from __future__ import annotations
 
+import time
+import weakref
 from io import BytesIO
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-from scheduler import build_mix_diario_simple
+import jobs
+import mix_cache
+import scenarios
+from bottlenecks import build_bottlenecks
+from capacity import daily_totals, nominal_m3_dia
+from d5_list import DEFAULT_D5_DIAS_UTEIS, build_d5
+from mix_rollup import MODES, build_rollup, period_labels
+from profiling import span
+from scheduler import MixOutputs
 from ui import set_toast
 from grid import show_grid
 
 
+POLL_SECONDS = 0.5
+
+
 def _to_excel_bytes(df: pd.DataFrame, sheet_name: str = "MIX") -> bytes:
     bio = BytesIO()
     with pd.ExcelWriter(bio, engine="openpyxl") as writer:
@@ -17,61 +32,6 @@ def _to_excel_bytes(df: pd.DataFrame, sheet_name: str = "MIX") -> bytes:
     return bio.getvalue()
 
 
-def _pinned_totals_row(df: pd.DataFrame, label_col: str) -> dict:
-    tot_comp = pd.to_numeric(df.get("Comprimento Total de Fundo (m)", pd.Series(dtype=float)), errors="coerce").sum() if "Comprimento Total de Fundo (m)" in df.columns else 0.0
-    tot_vol = pd.to_numeric(df.get("Volume", pd.Series(dtype=float)), errors="coerce").sum() if "Volume" in df.columns else 0.0
-    row = {c: "" for c in df.columns}
-    if label_col in row:
-        row[label_col] = "TOTAL"
-    if "Comprimento Total de Fundo (m)" in row:
-        row["Comprimento Total de Fundo (m)"] = float(tot_comp)
-    if "Volume" in row:
-        row["Volume"] = float(tot_vol)
-    return row
-
-
-def _aggregate(df_daily: pd.DataFrame, mode: str, capacidade_m3_dia: float) -> tuple[pd.DataFrame, pd.DataFrame]:
-    """Retorna (df_view, df_chart)"""
-    if df_daily is None or df_daily.empty:
-        return df_daily, pd.DataFrame()
-
-    d = df_daily.copy()
-    d["Data"] = pd.to_datetime(d["Data"], errors="coerce")
-
-    if mode == "Diária":
-        d["Periodo"] = d["Data"].dt.date.astype(str)
-    elif mode == "Semanal":
-        iso = d["Data"].dt.isocalendar()
-        d["Periodo"] = iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)
-    else:
-        d["Periodo"] = d["Data"].dt.to_period("M").astype(str)
-
-    gcols = ["Periodo", "Tipologia", "Tipo Armação", "Fundo (cm)", "Lateral (cm)", "Setup"]
-    df_view = (
-        d.groupby(gcols, dropna=False)
-         .agg({
-             "Comprimento Total de Fundo (m)": "sum",
-             "Volume": "sum",
-             "Seq de Montagem": lambda s: ";".join(sorted({str(x) for x in s.dropna().astype(str)})),
-             "Nome Peças": lambda s: ";".join(sorted({p.strip() for x in s.dropna().astype(str) for p in str(x).split(";") if p.strip()})),
-         })
-         .reset_index()
-         .rename(columns={"Periodo": "Data"})
-    )
-
-    # Chart (demanda x capacidade)
-    chart = d.groupby("Periodo", dropna=False).agg({"Volume": "sum"}).reset_index().rename(columns={"Periodo": "Data", "Volume": "Demanda (m³)"})
-    # capacidade por período:
-    # diária -> 1 dia; semanal/mensal -> nº de dias únicos (do daily)
-    days_per_period = d.groupby("Periodo")["Data"].nunique().reset_index().rename(columns={"Periodo":"Data","Data":"Dias"})
-    chart = chart.merge(days_per_period, on="Data", how="left")
-    chart["Capacidade (m³)"] = chart["Dias"].fillna(0).astype(float) * float(capacidade_m3_dia)
-    chart = chart.drop(columns=["Dias"])
-    chart = chart.set_index("Data")
-
-    return df_view, chart
-
-
 def page_programacao() -> None:
     st.subheader("Mix de Produção")
 
@@ -79,6 +39,9 @@ def page_programacao() -> None:
     df_pecas = st.session_state.get("df_pecas")
     params = st.session_state.get("params", {})
     capacidade = float(params.get("capacidade_m3_dia", 30.0))
+    df_cap = st.session_state.get("df_capacidade")
+    if df_cap is not None and df_cap.empty:
+        df_cap = None
 
     issues = []
     if df_seq is None or df_seq.empty:
@@ -103,22 +66,74 @@ def page_programacao() -> None:
 
     st.divider()
 
-    mode = st.selectbox("Visualização", ["Diária", "Semanal", "Mensal"], index=0)
+    mode = st.selectbox("Visualização", list(MODES), index=0)
+
+    df_formas = st.session_state.get("df_formas")
+    has_formas = df_formas is not None and not df_formas.empty
+    use_formas = st.checkbox(
+        "Considerar mapa de formas (pistas instaladas)",
+        value=False,
+        disabled=not has_formas,
+        help="Limita a produção diária às pistas INSTALADAS compatíveis e calcula a Qtd de Pistas. "
+             "Marcado, o mix é sempre recalculado por inteiro (sem reaproveitar a execução anterior).",
+    )
+    formas = df_formas if (use_formas and has_formas) else None
+    ordering = "trocas" if st.checkbox(
+        "Minimizar trocas de setup",
+        value=False,
+        help="Reordena os setups dentro de cada sequência (sem mudar a ordem SEQ 1, 2, ...) "
+             "para emendar o mesmo setup em dias seguidos. Desmarcado: ordem alfabética. "
+             "Marcado, o mix é sempre recalculado por inteiro (sem reaproveitar a execução anterior).",
+    ) else "setup"
 
     if st.button("Gerar Mix", type="primary", use_container_width=True):
-        out = build_mix_diario_simple(
-            pecas=df_pecas,
-            seq_producao=df_seq,
-            capacidade_m3_dia=capacidade,
-            use_business_days=True,
-        )
-        st.session_state["mix_diario_raw"] = out.mix_diario
-        st.session_state["mix_pendencias"] = out.pendencias
-        set_toast("Mix gerado com sucesso.")
+        with span("Gerar Mix"):
+            with span("Chave do cache"):
+                cache_key = mix_cache.mix_key(
+                    df_pecas, df_seq, capacidade, use_business_days=True,
+                    df_formas=formas, ordering=ordering, df_capacidade=df_cap,
+                )
+            with span("Consulta ao cache"):
+                out = mix_cache.get(cache_key)
+            if out is None:
+                # roda no pool de processos; reaproveita a execução anterior
+                # (só recalcula a partir do primeiro dia afetado)
+                running = st.session_state.get("mix_job")
+                if running is not None:
+                    jobs.cancel(running["id"])
+                job_id = jobs.submit(
+                    jobs.mix_job,
+                    df_pecas,
+                    df_seq,
+                    capacidade,
+                    use_business_days=True,
+                    previous=st.session_state.get("mix_state"),
+                    formas=formas,
+                    ordering=ordering,
+                    capacidade_linhas=df_cap,
+                )
+                st.session_state["mix_job"] = {"id": job_id, "key": cache_key, "capacidade": capacidade}
+            else:
+                _set_mix(out, cache_key, capacidade)
+                set_toast("Mix gerado com sucesso.")
         st.rerun()
 
+    if st.session_state.get("mix_job") is not None:
+        if hasattr(st, "fragment"):
+            # só o bloco de progresso reroda; o restante da página segue utilizável
+            st.fragment(run_every=POLL_SECONDS)(_poll_mix_job)()
+        else:
+            _poll_mix_job(blocking=True)
+
+    _render_scenarios(df_pecas, df_seq, capacidade, df_cap)
+
+    # sessão nova (ou após deploy): usa o mix já calculado para as mesmas entradas, se houver
+    if st.session_state.get("mix_diario_raw") is None:
+        _probe_cache(df_pecas, df_seq, capacidade, formas, ordering, df_cap)
+
     df_raw = st.session_state.get("mix_diario_raw")
     df_pend = st.session_state.get("mix_pendencias")
+    rollup = st.session_state.get("mix_rollup")
 
     if df_raw is None:
         st.info("Clique em **Gerar Mix** para visualizar.")
@@ -128,8 +143,19 @@ def page_programacao() -> None:
         st.markdown("### Avisos / Pendências")
         show_grid(df_pend, key="grid_pend", height=260)
 
-    # tabela
-    df_view, df_chart = _aggregate(df_raw, mode, capacidade_m3_dia=capacidade)
+    # tabela (pré-agregada na geração do mix)
+    if rollup is None:
+        rollup = build_rollup(
+            df_raw,
+            capacidade_m3_dia=capacidade,
+            name_sets=st.session_state.get("mix_name_sets"),
+            capacidade_dia=daily_totals(st.session_state.get("mix_capacidade")),
+        )
+        st.session_state["mix_rollup"] = rollup
+    with span(f"Montagem da visualização ({mode})") as sp:
+        df_view = rollup.display(mode)
+        sp.rows = 0 if df_view is None else len(df_view)
+    df_chart = rollup.charts.get(mode)
 
     if df_view is None or df_view.empty:
         st.warning("Mix ficou vazio para esta visualização. Veja pendências acima.")
@@ -138,20 +164,26 @@ def page_programacao() -> None:
     st.divider()
     st.markdown(f"### Mix ({mode})")
 
-    # ordena
-    sort_cols = ["Data", "Setup", "Tipologia", "Tipo Armação"]
-    for c in sort_cols:
-        if c not in df_view.columns:
-            sort_cols.remove(c)
-    if sort_cols:
-        df_view = df_view.sort_values(sort_cols, kind="mergesort")
+    metrics = st.session_state.get("mix_metrics") or {}
+    if "Trocas de setup" in metrics:
+        base = metrics.get("Trocas de setup (ordem alfabética)")
+        st.metric(
+            "Trocas de setup",
+            int(metrics["Trocas de setup"]),
+            delta=None if base is None else int(metrics["Trocas de setup"] - base),
+            delta_color="inverse",
+            help="Setups que entram em produção num dia sem terem sido produzidos no dia anterior. "
+                 "A variação compara com a ordem alfabética.",
+        )
 
-    pinned = _pinned_totals_row(df_view, label_col="Data")
-    show_grid(df_view, key=f"grid_mix_{mode}", height=560, pinned_bottom=pinned)
+    show_grid(df_view, key=f"grid_mix_{mode}", height=560, pinned_bottom=rollup.totals.get(mode))
 
+    if mode not in rollup.excel:
+        with span("Exportação Excel", rows=len(df_view)):
+            rollup.excel[mode] = _to_excel_bytes(df_view, sheet_name="MIX")
     st.download_button(
         "Baixar Mix (Excel)",
-        data=_to_excel_bytes(df_view, sheet_name="MIX"),
+        data=rollup.excel[mode],
         file_name=f"FaciliFlow_MIX_{mode}.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         use_container_width=True,
@@ -164,3 +196,158 @@ def page_programacao() -> None:
         st.line_chart(df_chart)
     else:
         st.info("Sem dados para gráfico.")
+
+    _render_line_load(st.session_state.get("mix_capacidade"), mode)
+
+
+def _render_line_load(df_linhas: Optional[pd.DataFrame], mode: str) -> None:
+    """Capacidade x volume por linha de produção no período escolhido."""
+    if df_linhas is None or df_linhas.empty or df_linhas["Linha"].nunique() < 2:
+        return
+    with st.expander("Ocupação por linha", expanded=False):
+        d = df_linhas.assign(Data=pd.to_datetime(df_linhas["Data"]))
+        g = d.assign(Periodo=period_labels(d["Data"])[mode]).groupby(["Periodo", "Linha"], sort=True)[["Capacidade (m³)", "Volume (m³)"]].sum().reset_index()
+        cap = g["Capacidade (m³)"].to_numpy()
+        g["Ocupação (%)"] = np.where(cap > 0, g["Volume (m³)"].to_numpy() / np.where(cap > 0, cap, 1.0) * 100.0, 0.0).round(1)
+        show_grid(g.rename(columns={"Periodo": "Data"}), key=f"grid_linhas_{mode}", height=320)
+
+
+def _render_scenarios(df_pecas: pd.DataFrame, df_seq: pd.DataFrame, capacidade: float, df_cap: Optional[pd.DataFrame]) -> None:
+    """Simulação "e se": várias capacidades de uma vez e busca da capacidade mínima.
+
+    Usa o calendário e o perfil diário da tabela de linhas; a capacidade de um
+    cenário é a de um dia normal (soma das linhas).
+    """
+    capacidade = nominal_m3_dia(df_cap, capacidade)
+    with st.expander("Cenários de capacidade", expanded=False):
+        c1, c2, c3, c4 = st.columns(4)
+        with c1:
+            cap_min = st.number_input("De (m³/dia)", min_value=0.5, value=max(capacidade / 2, 0.5), step=1.0, key="scn_min")
+        with c2:
+            cap_max = st.number_input("Até (m³/dia)", min_value=0.5, value=capacidade * 2, step=1.0, key="scn_max")
+        with c3:
+            n = st.number_input("Cenários", min_value=2, max_value=200, value=10, step=1, key="scn_n")
+        with c4:
+            cal = st.selectbox("Calendário", ["Dias úteis", "Dias corridos", "Ambos"], key="scn_cal")
+        modes = {"Dias úteis": (True,), "Dias corridos": (False,), "Ambos": (True, False)}[cal]
+
+        b1, b2 = st.columns(2)
+        with b1:
+            if st.button("Simular cenários", use_container_width=True):
+                caps = np.linspace(min(cap_min, cap_max), max(cap_min, cap_max), int(n)).round(2)
+                with st.spinner("Simulando…"), span("Cenários de capacidade", rows=len(caps) * len(modes)):
+                    st.session_state["scn_result"] = scenarios.sweep(df_pecas, df_seq, caps, use_business_days=modes, capacidade_linhas=df_cap)
+        with b2:
+            if st.button("Capacidade mínima sem pendências", use_container_width=True):
+                with st.spinner("Buscando…"), span("Busca da capacidade mínima"):
+                    st.session_state["scn_min_result"] = {
+                        bd: scenarios.min_capacity(df_pecas, df_seq, use_business_days=bd, capacidade_linhas=df_cap)
+                        for bd in modes
+                    }
+
+        found = st.session_state.get("scn_min_result")
+        if found:
+            for bd, row in found.items():
+                cal_txt = "dias úteis" if bd else "dias corridos"
+                if row is None:
+                    st.warning(f"Nenhuma capacidade zera as pendências ({cal_txt}): há janelas inviáveis.")
+                else:
+                    st.success(f"Capacidade mínima ({cal_txt}): **{row['Capacidade (m³/dia)']:.2f} m³/dia** — último dia {row['Último dia de produção']:%d/%m/%Y}.")
+
+        df_scn = st.session_state.get("scn_result")
+        if df_scn is not None and not df_scn.empty:
+            show_grid(df_scn, key="grid_cenarios", height=320)
+
+
+def _poll_mix_job(blocking: bool = False) -> None:
+    """Acompanha o job do mix; ao concluir, publica o resultado na sessão e no cache.
+
+    ``blocking``: sem ``st.fragment``, espera ``POLL_SECONDS`` e reroda a página.
+    """
+    job = st.session_state.get("mix_job")
+    if job is None:
+        return
+    stt = jobs.status(job["id"])
+
+    if not stt.finished:
+        label = "Na fila…" if stt.state == "fila" else f"Gerando mix… dia {stt.done} de {stt.total}" if stt.total else "Preparando lotes…"
+        c1, c2 = st.columns([4, 1], vertical_alignment="center")
+        with c1:
+            st.progress(stt.fraction, text=f"{label} ({stt.elapsed:.0f}s)")
+        with c2:
+            if st.button("Cancelar", use_container_width=True, key="cancel_mix_job"):
+                jobs.cancel(job["id"])
+        if blocking:
+            time.sleep(POLL_SECONDS)
+            st.rerun()
+        return
+
+    st.session_state["mix_job"] = None
+    if stt.state == "concluído":
+        out, state = jobs.result(job["id"])
+        st.session_state["mix_state"] = state
+        with span("Gravação no cache"):
+            mix_cache.put(job["key"], out)
+        _set_mix(out, job["key"], job["capacidade"])
+        set_toast("Mix gerado com sucesso.")
+    elif stt.state == "cancelado":
+        set_toast("Geração do mix cancelada.", kind="info")
+    else:
+        set_toast(f"Falha ao gerar o mix: {stt.error}", kind="error")
+    st.rerun()
+
+
+def _probe_cache(
+    df_pecas: pd.DataFrame,
+    df_seq: pd.DataFrame,
+    capacidade: float,
+    formas: Optional[pd.DataFrame],
+    ordering: str,
+    df_cap: Optional[pd.DataFrame],
+) -> None:
+    """Procura no cache o mix das entradas atuais, uma vez por versão das entradas.
+
+    As tabelas da sessão só trocam de objeto quando são salvas; enquanto forem
+    os mesmos objetos (e os mesmos parâmetros), os reruns não refazem o hash.
+    """
+    frames = (df_pecas, df_seq, formas, df_cap)
+    params = (float(capacidade), ordering)
+    last = st.session_state.get("mix_probe")
+    if last is not None and last[0] == params and all(
+        (None if r is None else r()) is f for r, f in zip(last[1], frames)
+    ):
+        return
+    st.session_state["mix_probe"] = (params, tuple(None if f is None else weakref.ref(f) for f in frames))
+    cache_key = mix_cache.mix_key(
+        df_pecas, df_seq, capacidade, use_business_days=True,
+        df_formas=formas, ordering=ordering, df_capacidade=df_cap,
+    )
+    cached = mix_cache.get(cache_key)
+    if cached is not None:
+        _set_mix(cached, cache_key, capacidade)
+
+
+def _set_mix(out: MixOutputs, cache_key: str, capacidade: float) -> None:
+    if out.rollup is None:
+        out.rollup = build_rollup(
+            out.mix_diario,
+            capacidade_m3_dia=capacidade,
+            name_sets=out.name_sets,
+            capacidade_dia=daily_totals(out.capacidade),
+        )
+    if out.gargalos is None:
+        out.gargalos = build_bottlenecks(out.mix_diario, out.capacidade, out.pendencias, capacidade)
+    st.session_state["mix_diario_raw"] = out.mix_diario
+    st.session_state["mix_name_sets"] = out.name_sets
+    st.session_state["mix_pendencias"] = out.pendencias
+    st.session_state["mix_metrics"] = out.metrics
+    st.session_state["mix_capacidade"] = out.capacidade
+    st.session_state["mix_rollup"] = out.rollup
+    st.session_state["mix_gargalos"] = out.gargalos
+    st.session_state["mix_key"] = cache_key
+    # lista D-5 (a página D-5 recalcula se o nº de dias úteis mudar)
+    n_d5 = int(st.session_state.get("params", {}).get("d5_dias_uteis", DEFAULT_D5_DIAS_UTEIS))
+    st.session_state["mix_inicio_lotes"] = out.inicio_lotes
+    st.session_state["df_d5"] = build_d5(out.inicio_lotes, n_d5)
+    st.session_state["df_d5_dias"] = n_d5
+    st.session_state.pop("df_d5_excel", None)
@@ -4,6 +4,7 @@ import re
 import streamlit as st
 import pandas as pd
 
+import key_index
 from constants import DEFAULT_PARAMS, REQUIRED_PECAS_INTERNAL
 from io_excel import read_excel_any
 from validators import require_columns, validate_pecas_internal
@@ -123,10 +124,8 @@ def page_upload() -> None:
     else:
         c1, _ = st.columns([1, 3])
         with c1:
-            cts = sorted([c for c in df_m["CT"].dropna().astype(str).str.strip().unique().tolist() if c])
-            ct = st.selectbox("Filtrar por CT", ["(todos)"] + cts, index=0, key="up_ct_filter")
-        view = df_m.copy()
-        if ct != "(todos)":
-            view = view[view["CT"].astype(str).str.strip() == ct].copy()
+            kidx = key_index.index_for(df_m, key_index.CT_LEVELS)
+            ct = st.selectbox("Filtrar por CT", ["(todos)"] + kidx.options("CT"), index=0, key="up_ct_filter")
+        view = kidx.take(df_m, None if ct == "(todos)" else ct)
         st.caption(f"{view.shape[0]} linhas (mostrando até 200)")
         st.dataframe(view.head(200), use_container_width=True)
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+import key_index
+import project_store
+from schema import ID_COL
+
+
+# uma compactação por vez no servidor; cada uma só regrava os CTs que perderam linhas
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pecas-compact")
+
+_Parts = Tuple[pd.DataFrame, pd.Index, Dict[str, np.ndarray]]
+
+
+def _ct_keys(frame: pd.DataFrame) -> pd.Series:
+    if "CT" not in frame.columns:
+        return pd.Series("", index=frame.index)
+    return frame["CT"].astype(str).str.strip()
+
+
+def _prepare(frame: pd.DataFrame) -> _Parts:
+    """Tabela, índice ``_id`` (tabela hash já montada) e posições por CT."""
+    ids = pd.Index(frame[ID_COL].to_numpy())
+    ids.get_indexer(ids[:1])          # monta a tabela hash agora, não no primeiro delete
+    cts = _ct_keys(frame)
+    ct_pos = {str(k): v for k, v in cts.groupby(cts, sort=False).indices.items()}
+    return frame, ids, ct_pos
+
+
+def _compact(frame: pd.DataFrame, alive: np.ndarray, dirty: Set[str]) -> _Parts:
+    """Roda na thread: tabela sem as linhas mortas, índices novos e CTs afetados regravados."""
+    parts = _prepare(frame.iloc[np.flatnonzero(alive)].reset_index(drop=True))
+    new, _, ct_pos = parts
+    empty = np.empty(0, dtype=np.int64)
+    for ct in dirty:
+        project_store.save_partition("df_pecas", ct, new.iloc[ct_pos.get(ct, empty)])
+    key_index.index_for(new)   # filtros da Consulta já prontos quando a versão entrar na sessão
+    return parts
+
+
+class PieceTable:
+    """Peças da sessão com índice ``_id`` → posição e exclusão por lápide.
+
+    ``delete`` só marca as linhas (custo proporcional às linhas excluídas) e
+    agenda a compactação — tabela sem as linhas mortas, novos índices e
+    regravação dos CTs afetados no ``project_store`` — numa thread. Enquanto
+    ela não termina, a sessão usa ``live()`` (as linhas vivas da tabela
+    atual); ``poll`` troca para a versão compactada quando ela fica pronta,
+    sem esperar.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        self._pending: Optional[Future] = None
+        self._snapshot: Optional[np.ndarray] = None    # ``alive`` enviado à compactação em andamento
+        self._install(_prepare(df if df.index.equals(pd.RangeIndex(len(df))) else df.reset_index(drop=True)))
+        self.synced: Optional[pd.DataFrame] = df       # versão de ``df_pecas`` que a sessão conhece
+
+    def _install(self, parts: _Parts) -> None:
+        self.frame, self.ids, self._ct_pos = parts
+        self.alive = np.ones(len(self.frame), dtype=bool)
+        self._dirty: Set[str] = set()
+        self._live: Optional[pd.DataFrame] = None
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    @property
+    def n_dead(self) -> int:
+        return len(self.alive) - len(self)
+
+    def positions(self, ids: Iterable) -> np.ndarray:
+        """Posições (vivas) dos ids informados; ids desconhecidos são ignorados."""
+        ids = np.asarray(list(ids) if not isinstance(ids, (np.ndarray, pd.Series, pd.Index)) else ids)
+        if ids.size == 0:
+            return np.empty(0, dtype=np.int64)
+        pos = self.ids.get_indexer(ids)
+        pos = pos[pos >= 0]
+        return pos[self.alive[pos]]
+
+    def delete(self, ids: Iterable) -> int:
+        """Marca as linhas como excluídas e agenda a compactação; devolve quantas saíram."""
+        pos = self.positions(ids)
+        if pos.size == 0:
+            return 0
+        self.alive[pos] = False
+        self._live = None
+        self._dirty.update(_ct_keys(self.frame.iloc[pos]).unique().tolist())
+        self._submit()
+        return int(pos.size)
+
+    def _submit(self) -> None:
+        # com uma compactação em andamento, as lápides novas vão na próxima (ver ``poll``)
+        if self._pending is None and self._dirty:
+            self._snapshot = self.alive.copy()
+            self._pending = _executor.submit(_compact, self.frame, self._snapshot, set(self._dirty))
+
+    def live(self) -> pd.DataFrame:
+        """Linhas vivas da tabela atual (a própria tabela quando não há lápides)."""
+        if self._live is None:
+            self._live = self.frame if self.alive.all() else self.frame.iloc[np.flatnonzero(self.alive)].reset_index(drop=True)
+        return self._live
+
+    def live_ct(self, ct: str) -> pd.DataFrame:
+        """Linhas vivas de um CT (pelo índice de CT, sem varrer a tabela)."""
+        pos = self._ct_pos.get(str(ct).strip(), np.empty(0, dtype=np.int64))
+        return self.frame.iloc[pos[self.alive[pos]]]
+
+    def poll(self) -> bool:
+        """Aplica a compactação se já terminou (não espera); ``True`` se trocou de versão."""
+        fut = self._pending
+        if fut is None or not fut.done():
+            return False
+        self._apply(fut)
+        return True
+
+    def wait(self) -> None:
+        """Espera a compactação em andamento (erros de gravação sobem aqui)."""
+        while self._pending is not None:
+            self._apply(self._pending)
+
+    def _apply(self, fut: Future) -> None:
+        parts = fut.result()
+        # excluídas depois do envio: continuam mortas na versão nova
+        late = self.ids[self._snapshot & ~self.alive]
+        self._pending, self._snapshot = None, None
+        self._install(parts)
+        if len(late):
+            self.delete(late)
+
+
+def sync(session_state, build: bool = True) -> Optional[PieceTable]:
+    """Tabela de peças da sessão; mantém ``df_pecas`` com as linhas vivas.
+
+    Não espera a compactação: enquanto ela roda, ``df_pecas`` são as linhas
+    vivas da versão atual. Se ``df_pecas`` foi trocada por fora (importação,
+    limpar tudo), a tabela é refeita (com ``build``) ou descartada.
+    """
+    df = session_state.get("df_pecas")
+    t = session_state.get("pecas_table")
+    if t is not None and df is not None and t.synced is df:
+        t.poll()
+        live = t.live()
+        if live is not df:
+            session_state["df_pecas"] = live
+            t.synced = live
+        return t
+    if t is not None:
+        t.wait()   # compactação antiga não pode gravar por cima da tabela nova
+        session_state.pop("pecas_table", None)
+    if not build or df is None or df.empty or ID_COL not in df.columns:
+        return None
+    t = PieceTable(df)
+    session_state["pecas_table"] = t
+    return t
+
+
+def settle(session_state) -> None:
+    """Antes de substituir ``df_pecas`` inteira: termina a compactação pendente (gravação em disco)."""
+    t = session_state.get("pecas_table")
+    if t is not None:
+        t.wait()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+
+LOG_PATH = Path("data") / "profiling.jsonl"
+LOG_MIN_SECONDS = 0.25           # execuções mais rápidas não vão para o log
+LOG_MAX_BYTES = 5 * 1024 * 1024  # acima disso o log vira profiling.jsonl.1
+
+_log_lock = threading.Lock()
+
+
+@dataclass
+class Span:
+    """Uma fase medida: tempo de parede, linhas processadas e variação de memória (RSS)."""
+    name: str
+    depth: int = 0
+    start: float = 0.0               # segundos desde o início do trace
+    seconds: float = 0.0
+    rows: Optional[int] = None
+    mem_delta_mb: Optional[float] = None
+
+
+@dataclass
+class Trace:
+    """Spans de uma execução (um rerun de página), na ordem em que foram abertos."""
+    name: str
+    started_at: str
+    spans: List[Span] = field(default_factory=list)
+    seconds: float = 0.0
+    _t0: float = 0.0
+    _depth: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "spans": [asdict(s) for s in self.spans],
+        }
+
+
+# trace ativo da sessão/thread atual (cada sessão do Streamlit roda na sua thread)
+_active: ContextVar[Optional[Trace]] = ContextVar("profiling_trace", default=None)
+
+
+def _rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@contextmanager
+def trace(name: str, log: Optional[bool] = None) -> Iterator[Trace]:
+    """Coleta os spans abertos dentro do bloco.
+
+    Ao sair, grava uma linha em ``LOG_PATH`` se ``log`` for verdadeiro (ou, com
+    ``log=None``, se a execução levou pelo menos ``LOG_MIN_SECONDS``).
+    """
+    tr = Trace(name=name, started_at=datetime.now().isoformat(timespec="seconds"), _t0=time.perf_counter())
+    token = _active.set(tr)
+    try:
+        yield tr
+    finally:
+        _active.reset(token)
+        tr.seconds = time.perf_counter() - tr._t0
+        if log or (log is None and tr.seconds >= LOG_MIN_SECONDS):
+            _append_log(tr)
+
+
+@contextmanager
+def span(name: str, rows: Optional[int] = None) -> Iterator[Span]:
+    """Mede o bloco dentro do trace ativo (sem trace ativo, não registra nada).
+
+    ``rows`` pode ser informado depois, no objeto devolvido (``sp.rows = len(df)``).
+    """
+    tr = _active.get()
+    if tr is None:
+        yield Span(name=name, rows=rows)
+        return
+
+    sp = Span(name=name, depth=tr._depth, start=time.perf_counter() - tr._t0, rows=rows)
+    tr.spans.append(sp)
+    tr._depth += 1
+    mem0 = _rss_mb()
+    t0 = time.perf_counter()
+    try:
+        yield sp
+    finally:
+        sp.seconds = time.perf_counter() - t0
+        mem1 = _rss_mb()
+        if mem0 is not None and mem1 is not None:
+            sp.mem_delta_mb = mem1 - mem0
+        tr._depth -= 1
+
+
+def _append_log(tr: Trace) -> None:
+    line = json.dumps(tr.to_dict(), ensure_ascii=False)
+    try:
+        with _log_lock:
+            LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+            if LOG_PATH.exists() and LOG_PATH.stat().st_size > LOG_MAX_BYTES:
+                os.replace(LOG_PATH, LOG_PATH.with_name(LOG_PATH.name + ".1"))
+            with open(LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError:
+        # disco somente leitura: o painel continua mostrando o trace da sessão
+        pass
+
+
+def read_log(limit: int = 500) -> List[dict]:
+    """Últimas ``limit`` execuções gravadas (mais antigas primeiro)."""
+    try:
+        with open(LOG_PATH, encoding="utf-8") as f:
+            lines = f.readlines()[-limit:]
+    except OSError:
+        return []
+    out = []
+    for ln in lines:
+        try:
+            out.append(json.loads(ln))
+        except ValueError:
+            continue
+    return out
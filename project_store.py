@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import schema
+
+
+STORE_DIR = Path("data") / "store"
+
+# tabela (chave no session_state) -> coluna de partição (None = partição única)
+TABLES: Dict[str, Optional[str]] = {
+    "df_obras_etapas": "CT",
+    "df_seq_montagem": "CT",
+    "df_pecas": "CT",
+    "df_formas": None,
+    "df_capacidade": None,
+}
+
+_ALL = "_all"
+_lock = threading.Lock()
+
+
+def _part_name(ct: str) -> str:
+    """Nome de pasta seguro para o CT (legível + hash curto)."""
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", str(ct))[:40]
+    return f"{slug}-{hashlib.sha1(str(ct).encode('utf-8')).hexdigest()[:8]}"
+
+
+def _table_dir(table: str) -> Path:
+    if table not in TABLES:
+        raise ValueError(f"Tabela desconhecida: {table}")
+    return STORE_DIR / table
+
+
+def _write_partition(path: Path, key: str, df: pd.DataFrame) -> None:
+    """Grava uma partição: um .npy por coluna + meta.json (troca atômica da pasta)."""
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    cols = []
+    for i, c in enumerate(df.columns):
+        s = df[c]
+        fname = f"c{i}.npy"
+        spec = {"name": str(c), "file": fname}
+        if pd.api.types.is_bool_dtype(s) and not s.isna().any():
+            spec["kind"] = "bool"
+            np.save(tmp / fname, s.to_numpy(dtype=bool))
+        elif pd.api.types.is_numeric_dtype(s) and not isinstance(s.dtype, pd.CategoricalDtype):
+            spec["kind"] = "num"
+            # inteiros com vazios viram float; float32 (schema.compact) continua float32
+            has_na = s.isna().any() and not pd.api.types.is_float_dtype(s)
+            np.save(tmp / fname, s.to_numpy(dtype=float if has_na else None))
+        elif pd.api.types.is_datetime64_any_dtype(s):
+            spec["kind"] = "dt"
+            np.save(tmp / fname, s.to_numpy(dtype="datetime64[ns]"))
+        else:
+            # texto: dicionário + códigos (-1 = vazio)
+            vals = s.astype(object).where(s.notna(), None)
+            codes, cats = pd.factorize(vals.map(lambda v: None if v is None else str(v)), sort=True)
+            spec["kind"] = "cat"
+            spec["categories"] = [str(x) for x in cats]
+            np.save(tmp / fname, codes.astype(np.int32))
+        cols.append(spec)
+
+    meta = {"key": key, "rows": int(len(df)), "columns": cols}
+    (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    old = path.with_name(path.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if path.exists():
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _read_partition(path: Path, mmap: bool = True, categorical: Iterable[str] = ()) -> pd.DataFrame:
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    categorical = set(categorical)
+    data = {}
+    for spec in meta["columns"]:
+        arr = np.load(path / spec["file"], mmap_mode="r" if mmap else None, allow_pickle=False)
+        if spec["kind"] == "cat" and spec["name"] in categorical:
+            # direto dos códigos gravados, sem criar uma string por linha
+            data[spec["name"]] = pd.Categorical.from_codes(np.asarray(arr), categories=spec["categories"])
+        elif spec["kind"] == "cat":
+            cats = np.asarray(spec["categories"] + [None], dtype=object)
+            # código -1 cai no último elemento (None)
+            data[spec["name"]] = cats[np.asarray(arr)]
+        else:
+            data[spec["name"]] = arr
+    # copy=False mantém as colunas numéricas mapeadas (somente leitura: copie antes de alterar no lugar)
+    return pd.DataFrame(data, index=pd.RangeIndex(meta["rows"]), copy=False)
+
+
+def _partition_key(path: Path) -> Optional[str]:
+    try:
+        return json.loads((path / "meta.json").read_text(encoding="utf-8")).get("key")
+    except (OSError, ValueError):
+        return None
+
+
+def _partitions(table: str) -> Dict[str, Path]:
+    base = _table_dir(table)
+    if not base.exists():
+        return {}
+    out: Dict[str, Path] = {}
+    for p in sorted(base.iterdir()):
+        if not p.is_dir() or p.name.endswith((".tmp", ".old")):
+            continue
+        key = _partition_key(p)
+        if key is not None:
+            out[key] = p
+    return out
+
+
+def list_cts(table: str) -> List[str]:
+    """CTs gravados para a tabela (sem ler os dados)."""
+    return [k for k in _partitions(table).keys() if k != _ALL]
+
+
+def has_table(table: str) -> bool:
+    return bool(_partitions(table))
+
+
+def load_table(table: str, cts: Optional[Iterable[str]] = None, mmap: bool = True) -> Optional[pd.DataFrame]:
+    """Lê a tabela (ou só os CTs pedidos). Colunas numéricas vêm mapeadas em memória.
+
+    Tabelas com esquema (``schema.CATEGORICAL``) já vêm enxutas (``schema.compact``).
+    """
+    parts = _partitions(table)
+    if not parts:
+        return None
+    if cts is not None:
+        wanted = {str(c).strip() for c in cts}
+        parts = {k: v for k, v in parts.items() if k in wanted}
+    categorical = schema.CATEGORICAL.get(table, ())
+    frames = [_read_partition(p, mmap=mmap, categorical=categorical) for p in parts.values()]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return schema.compact(frames[0], table)
+    # partições com dicionários diferentes: concat devolve texto, compact volta a categoria
+    return schema.compact(pd.concat(frames, ignore_index=True), table)
+
+
+def save_table(table: str, df: Optional[pd.DataFrame]) -> bool:
+    """Substitui a tabela inteira (uma partição por CT)."""
+    key_col = TABLES[table]
+    try:
+        with _lock:
+            base = _table_dir(table)
+            existing = _partitions(table)
+            written = set()
+            if df is not None and not df.empty:
+                if key_col and key_col in df.columns:
+                    keys = df[key_col].astype(str).str.strip()
+                    for ct, idx in keys.groupby(keys, sort=False).groups.items():
+                        _write_partition(base / _part_name(ct), ct, df.loc[idx].reset_index(drop=True))
+                        written.add(ct)
+                else:
+                    _write_partition(base / _part_name(_ALL), _ALL, df.reset_index(drop=True))
+                    written.add(_ALL)
+            elif df is not None:
+                # tabela vazia: guarda só o esquema
+                _write_partition(base / _part_name(_ALL), _ALL, df.reset_index(drop=True))
+                written.add(_ALL)
+            for key, path in existing.items():
+                if key not in written:
+                    shutil.rmtree(path, ignore_errors=True)
+        return True
+    except OSError:
+        return False
+
+
+def save_partition(table: str, ct: str, df_ct: Optional[pd.DataFrame]) -> bool:
+    """Atualiza só as linhas de um CT (``None``/vazio remove a partição)."""
+    ct = str(ct).strip()
+    try:
+        with _lock:
+            path = _table_dir(table) / _part_name(ct)
+            if df_ct is None or df_ct.empty:
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                _write_partition(path, ct, df_ct.reset_index(drop=True))
+        return True
+    except OSError:
+        return False
+
+
+def append_rows(table: str, ct: str, rows: pd.DataFrame) -> bool:
+    """Acrescenta linhas à partição do CT (reescreve só essa partição)."""
+    ct = str(ct).strip()
+    current = load_table(table, cts=[ct], mmap=False)
+    merged = rows if current is None else pd.concat([current, rows], ignore_index=True)
+    return save_partition(table, ct, merged)
+
+
+def save_cts(table: str, df_full: Optional[pd.DataFrame], cts: Iterable[str]) -> bool:
+    """Regrava só as partições dos CTs informados a partir da tabela completa."""
+    key_col = TABLES[table]
+    if key_col is None or df_full is None or key_col not in df_full.columns:
+        return save_table(table, df_full)
+    keys = df_full[key_col].astype(str).str.strip()
+    ok = True
+    for ct in {str(c).strip() for c in cts}:
+        ok = save_partition(table, ct, df_full[keys == ct]) and ok
+    return ok
+
+
+def hydrate(session_state, tables: Optional[Iterable[str]] = None) -> None:
+    """Carrega do disco as tabelas que ainda não estão na sessão."""
+    for t in (TABLES.keys() if tables is None else tables):
+        if session_state.get(t) is None and has_table(t):
+            session_state[t] = load_table(t)
+            session_state.get("store_parts", {}).pop(t, None)
+
+
+def _stamp(path: Path) -> Optional[tuple]:
+    """Versão gravada da partição (cada gravação troca a pasta: inode novo)."""
+    try:
+        st = (path / "meta.json").stat()
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def load_cts(session_state, table: str, cts: Iterable[str]) -> Optional[pd.DataFrame]:
+    """Só as partições dos CTs pedidos, sem carregar a tabela inteira na sessão.
+
+    Cada partição lida fica em ``session_state["store_parts"]`` e é relida
+    apenas quando o arquivo muda (gravação por esta ou por outra sessão).
+    Retorna ``None`` se nenhum dos CTs está gravado.
+    """
+    cache = session_state.setdefault("store_parts", {}).setdefault(table, {})
+    categorical = schema.CATEGORICAL.get(table, ())
+    frames = []
+    for ct in dict.fromkeys(str(c).strip() for c in cts):
+        path = _table_dir(table) / _part_name(ct)
+        stamp = _stamp(path)
+        if stamp is None:
+            cache.pop(ct, None)
+            continue
+        hit = cache.get(ct)
+        if hit is None or hit[0] != stamp:
+            hit = (stamp, schema.compact(_read_partition(path, categorical=categorical), table))
+            cache[ct] = hit
+        frames.append(hit[1])
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+    return schema.compact(pd.concat(frames, ignore_index=True), table)
+
+
+def column_max(table: str, col: str) -> Optional[float]:
+    """Maior valor de uma coluna numérica na tabela gravada (lê só essa coluna de cada partição)."""
+    best: Optional[float] = None
+    for path in _partitions(table).values():
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        spec = next((c for c in meta["columns"] if c["name"] == col and c["kind"] == "num"), None)
+        if spec is None or not meta["rows"]:
+            continue
+        arr = np.load(path / spec["file"], mmap_mode="r", allow_pickle=False)
+        v = float(np.nanmax(arr)) if np.isfinite(arr).any() else None
+        if v is not None and (best is None or v > best):
+            best = v
+    return best
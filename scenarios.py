@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from capacity import build_capacity_model, nominal_m3_dia
+from factory_calendar import calendar_from_capacidade
+from scheduler import MixOutputs, _allocate_events, _build_lots, _LotArrays, _normalize, _Prepared
+
+
+# custo aproximado de subir o pool (spawn + imports); abaixo disso roda tudo no processo atual
+POOL_STARTUP_SECONDS = 2.0
+
+SUMMARY_COLS = [
+    "Capacidade (m³/dia)",
+    "Dias úteis",
+    "Volume pendente (m³)",
+    "Sequências pendentes",
+    "Último dia de produção",
+    "Pico de utilização (%)",
+    "Utilização média (%)",
+]
+
+
+@dataclass
+class _Base:
+    """Lotes já normalizados de um tipo de calendário, compartilhados pelos cenários.
+
+    ``profile`` é a capacidade de cada dia relativa a um dia normal (1.0):
+    turnos extras/reduzidos da tabela de linhas mudam o fator do dia.
+    """
+    prep: _Prepared
+    la: _LotArrays
+    profile: np.ndarray
+
+
+def _bases(
+    pecas: pd.DataFrame,
+    seq_producao: pd.DataFrame,
+    modes: Iterable[bool],
+    capacidade_linhas: Optional[pd.DataFrame] = None,
+) -> Dict[bool, Optional[_Base]]:
+    """Normaliza uma vez e monta os lotes uma vez por tipo de calendário.
+
+    Usa o mesmo ``FactoryCalendar`` do mix (feriados e dias extras da tabela
+    de linhas) e o perfil diário de capacidade do ``CapacityModel``.
+    Aproximação: as linhas formam um único pool por dia (restrição de
+    tipologia por linha não entra nos cenários).
+    """
+    norm = _normalize(pecas, seq_producao)
+    nominal = nominal_m3_dia(capacidade_linhas, 1.0)
+    out: Dict[bool, Optional[_Base]] = {}
+    for bd in modes:
+        calendar = calendar_from_capacidade(capacidade_linhas, bd)
+        prep = norm if isinstance(norm, MixOutputs) else _build_lots(*norm, use_business_days=bd, calendar=calendar)
+        if isinstance(prep, MixOutputs):
+            out[bd] = None
+            continue
+        model = build_capacity_model(capacidade_linhas, prep.days, 1.0, calendar)
+        profile = model.total() / nominal if nominal > 0 else np.ones(len(prep.days))
+        out[bd] = _Base(prep=prep, la=_LotArrays(prep), profile=profile)
+    return out
+
+
+def _evaluate(base: Optional[_Base], cap: float, bd: bool) -> dict:
+    row = {
+        "Capacidade (m³/dia)": float(cap),
+        "Dias úteis": bool(bd),
+        "Volume pendente (m³)": 0.0,
+        "Sequências pendentes": 0,
+        "Último dia de produção": pd.NaT,
+        "Pico de utilização (%)": 0.0,
+        "Utilização média (%)": 0.0,
+    }
+    if base is None:
+        return row
+
+    la = base.la.clone()
+    caps = float(cap) * base.profile
+    _, pend = _allocate_events(base.prep, caps, la=la)
+    row["Volume pendente (m³)"] = float(sum(p["VOLUME_RESTANTE_M3"] for p in pend))
+    row["Sequências pendentes"] = len(pend)
+
+    day, _, take = la.allocations()
+    if len(day) and cap > 0:
+        load = np.bincount(day, weights=take, minlength=len(caps))
+        first, last = int(day[0]), int(day[-1])
+        row["Último dia de produção"] = base.prep.days[last]
+        open_ = caps > 0
+        row["Pico de utilização (%)"] = float((load[open_] / caps[open_]).max() * 100.0) if open_.any() else 0.0
+        # média entre o primeiro e o último dia com produção
+        span_cap = caps[first:last + 1].sum()
+        row["Utilização média (%)"] = float(load[first:last + 1].sum() / span_cap * 100.0) if span_cap > 0 else 0.0
+    return row
+
+
+# ---- execução em paralelo: cada processo recebe as bases uma única vez (initializer)
+_worker_bases: Dict[bool, Optional[_Base]] = {}
+
+
+def _init_worker(bases: Dict[bool, Optional[_Base]]) -> None:
+    global _worker_bases
+    _worker_bases = bases
+
+
+def _evaluate_in_worker(cap: float, bd: bool) -> dict:
+    return _evaluate(_worker_bases[bd], cap, bd)
+
+
+def _pool(bases: Dict[bool, Optional[_Base]], n: int) -> Optional[Executor]:
+    if n <= 1:
+        return None
+    try:
+        return ProcessPoolExecutor(
+            max_workers=n,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(bases,),
+        )
+    except (OSError, NotImplementedError, PermissionError):
+        return None
+
+
+def _run(bases: Dict[bool, Optional[_Base]], tasks: List[Tuple[float, bool]], ex: Optional[Executor]) -> List[dict]:
+    if ex is None:
+        return [_evaluate(bases[bd], cap, bd) for cap, bd in tasks]
+    return list(ex.map(_evaluate_in_worker, *zip(*tasks)))
+
+
+def _timed(bases: Dict[bool, Optional[_Base]], cap: float, bd: bool) -> Tuple[dict, float]:
+    t0 = time.perf_counter()
+    row = _evaluate(bases[bd], cap, bd)
+    return row, time.perf_counter() - t0
+
+
+def _n_workers(workers: Optional[int], n_tasks: int, seconds_each: float) -> int:
+    """Processos a usar: ``workers`` explícito, ou automático (só vale a pena se o trabalho pagar a subida do pool)."""
+    cpus = os.cpu_count() or 1
+    if workers is not None:
+        return max(1, min(workers, n_tasks))
+    if cpus <= 1 or seconds_each * n_tasks < 2 * POOL_STARTUP_SECONDS:
+        return 1
+    return min(cpus, n_tasks)
+
+
+def sweep(
+    pecas: pd.DataFrame,
+    seq_producao: pd.DataFrame,
+    capacidades: Iterable[float],
+    use_business_days: Iterable[bool] = (True,),
+    workers: Optional[int] = None,
+    capacidade_linhas: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """Avalia cada capacidade (x tipo de calendário) e devolve uma linha de resumo por cenário.
+
+    A capacidade de um cenário é a de um dia normal; com ``capacidade_linhas``
+    os demais dias seguem a proporção da tabela (ver ``_bases``).
+    Normalização e lotes são feitos uma vez; os cenários rodam o motor ``eventos``
+    sobre cópias dos saldos, em paralelo quando ``workers`` > 1. Com ``workers=None``
+    o paralelismo só é usado se o tempo estimado compensar a subida do pool.
+    Pendências sem relação com a capacidade (peças sem chave, sem volume) não entram no resumo.
+    """
+    caps = [float(c) for c in capacidades]
+    modes = list(dict.fromkeys(bool(b) for b in use_business_days))
+    tasks = [(c, bd) for bd in modes for c in caps]
+    if not tasks:
+        return pd.DataFrame(columns=SUMMARY_COLS)
+
+    bases = _bases(pecas, seq_producao, modes, capacidade_linhas)
+    # o primeiro cenário roda aqui e serve de estimativa de custo dos demais
+    first, secs = _timed(bases, *tasks[0])
+    rest = tasks[1:]
+    ex = _pool(bases, _n_workers(workers, len(rest), secs)) if rest else None
+    try:
+        rows = [first] + _run(bases, rest, ex)
+    finally:
+        if ex is not None:
+            ex.shutdown()
+    return pd.DataFrame(rows, columns=SUMMARY_COLS)
+
+
+def min_capacity(
+    pecas: pd.DataFrame,
+    seq_producao: pd.DataFrame,
+    use_business_days: bool = True,
+    tol: float = 0.01,
+    workers: Optional[int] = None,
+    capacidade_linhas: Optional[pd.DataFrame] = None,
+) -> Optional[dict]:
+    """Menor capacidade (m³/dia, com precisão ``tol``) que zera as pendências de capacidade.
+
+    Busca em ``[0, volume total]``: a cada rodada avalia ``k`` pontos
+    igualmente espaçados (``k`` = processos; busca binária quando ``k`` = 1) e
+    estreita o intervalo. Retorna a linha de resumo do cenário encontrado, ou ``None``
+    quando nem a capacidade máxima resolve (janelas inviáveis).
+    """
+    bases = _bases(pecas, seq_producao, [use_business_days], capacidade_linhas)
+    base = bases[use_business_days]
+    if base is None or not (base.profile > 0).any():
+        return None
+
+    # todo o volume cabe no dia de menor capacidade
+    hi = float(base.la.vol_total.sum()) / float(base.profile[base.profile > 0].min()) + tol
+    best, secs = _timed(bases, hi, use_business_days)
+    if best["Volume pendente (m³)"] > 0:
+        return None
+
+    rounds = max(1, math.ceil(math.log2(max(hi / max(tol, 1e-9), 2.0))))
+    k = min(_n_workers(workers, rounds, secs), 16)
+    ex = _pool(bases, k)
+    lo = 0.0
+    try:
+        while hi - lo > tol:
+            points = [lo + (hi - lo) * (i + 1) / (k + 1) for i in range(k)]
+            rows = _run(bases, [(c, use_business_days) for c in points], ex)
+            ok = [r for r in rows if r["Volume pendente (m³)"] <= 0]
+            if ok:
+                best = min(ok, key=lambda r: r["Capacidade (m³/dia)"])
+                hi = best["Capacidade (m³/dia)"]
+            # maior capacidade que ainda deixa pendência
+            below = [r["Capacidade (m³/dia)"] for r in rows if r["Volume pendente (m³)"] > 0 and r["Capacidade (m³/dia)"] < hi]
+            lo = max(below) if below else lo
+    finally:
+        if ex is not None:
+            ex.shutdown()
+    return best
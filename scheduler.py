@@ -1,16 +1,70 @@
 from __future__ import annotations
 
+import copy
+import heapq
 import re
-from dataclasses import dataclass
-from typing import List, Dict, Tuple
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
+from name_sets import NameSets
+from capacity import CapacityModel, build_capacity_model
+from d5_list import LotStarts
+from factory_calendar import FactoryCalendar, calendar_from_capacidade
+from profiling import span
+from setup_order import ORDER_BUDGET_SECONDS, OrderStats, count_setup_changes, plan_setup_order
+
+if TYPE_CHECKING:
+    from bottlenecks import Bottlenecks
+    from formas_index import FormIndex
+    from mix_rollup import MixRollup
+
+
+ENGINES = ("python", "numpy", "eventos")
+
+# ordem dos lotes dentro de cada sequência:
+# "setup" = alfabética (SETUP, TIPOLOGIA, TIPO ARMAÇÃO); "trocas" = minimiza trocas de setup entre dias
+ORDERINGS = ("setup", "trocas")
+
+# versão do resultado dos motores: incrementar quando a regra de alocação mudar
+# (invalida o cache de mix em disco)
+ENGINE_VERSION = 7
+
+# identifica um lote (SETUP dentro de CT/ETAPA/SEQUENCIA) entre execuções
+_LOT_KEY = ["_CT", "_ETAPA", "_SEQ", "TIPOLOGIA", "TIPO ARMAÇÃO", "FUNDO (CM)", "LATERAL (CM)", "SETUP"]
+
 
 @dataclass
 class MixOutputs:
+    # as tabelas podem ser compartilhadas entre sessões (mix_cache): somente leitura
     mix_diario: pd.DataFrame
     pendencias: pd.DataFrame
+    # agregações Diária/Semanal/Mensal (mix_rollup.build_rollup), preenchidas pela página
+    rollup: Optional["MixRollup"] = None
+    # "Nome Peças" e "Seq de Montagem" no mix_diario são ids destes conjuntos
+    # (name_sets.materialize monta as strings para exibir/exportar)
+    name_sets: Dict[str, NameSets] = field(default_factory=dict)
+    # indicadores do mix ("Trocas de setup", ...)
+    metrics: Dict[str, float] = field(default_factory=dict)
+    # capacidade e volume usado por Data x Linha (capacity.CapacityModel.frame)
+    capacidade: Optional[pd.DataFrame] = None
+    # primeiro dia de cada lote, para a lista D-5 (d5_list.build_d5)
+    inicio_lotes: Optional[LotStarts] = None
+    # utilização por dia e pendências por CT (bottlenecks.build_bottlenecks), preenchidos com o rollup
+    gargalos: Optional["Bottlenecks"] = None
+
+
+@dataclass
+class _Prepared:
+    """Estado comum aos motores de alocação (após normalização e criação dos lotes)."""
+    lots: pd.DataFrame
+    lot_names: NameSets
+    win: Dict[Tuple[str, str, str], Tuple[pd.Timestamp, pd.Timestamp]]
+    seq_list_by_stage: Dict[Tuple[str, str], List[Tuple[str, str, str]]]
+    days: pd.DatetimeIndex
+    pend: List[dict]
 
 
 def _extract_seq_number(val) -> str:
@@ -29,8 +83,15 @@ def build_mix_diario_simple(
     seq_producao: pd.DataFrame,
     capacidade_m3_dia: float,
     use_business_days: bool = True,
+    engine: str = "python",
+    formas: Optional[pd.DataFrame] = None,
+    ordering: str = "setup",
+    ordering_budget_s: float = ORDER_BUDGET_SECONDS,
+    capacidade_linhas: Optional[pd.DataFrame] = None,
 ) -> MixOutputs:
-    """MVP simples (sem mapa de formas).
+    """Mix diário completo: capacidade em m³ por dia, por linha de produção ou
+    limitada às pistas do mapa de formas, com ordem alfabética ou com menos
+    trocas de setup dentro de cada sequência.
 
     Regras:
     - Volume (M3) na lista de peças é total da linha
@@ -38,7 +99,376 @@ def build_mix_diario_simple(
     - Distribuição sequencial por SETUP respeitando capacidade diária.
     - Prioridade **estrita** por CT/ETAPA: executa SEQ 1, depois SEQ 2, etc.
       Só avança para a próxima sequência quando a anterior estiver concluída.
+
+    Motores (``engine``):
+    - ``"python"``: referência, percorre os lotes um a um.
+    - ``"numpy"``: lotes em arrays; o consumo de cada etapa é feito com
+      soma acumulada + searchsorted. Mesmo resultado (a menos de arredondamento
+      de ponto flutuante na ordem das somas).
+    - ``"eventos"``: mesmos arrays, mas pula dias ociosos e emite em bloco os
+      trechos estáveis; custo proporcional ao trabalho, não ao calendário.
+
+    Calendário: dias úteis do ``factory_calendar.FactoryCalendar`` montado da
+    mesma tabela (feriados/paradas da fábrica saem do calendário; sábados com
+    turno entram), sobre seg-sex (``use_business_days``) ou todos os dias.
+
+    Capacidade: ``capacidade_linhas`` (tabela de linhas de produção, ver
+    ``capacity.build_capacity_model``) vira uma matriz linha x dia; sem tabela,
+    ``capacidade_m3_dia`` vale para todos os dias. Se todas as linhas aceitam
+    todas as tipologias, os motores consomem a capacidade total de cada dia;
+    com restrição de tipologia, o motor é o lote a lote (``_allocate_restricted``).
+    ``capacidade`` no resultado traz capacidade e volume por dia e linha.
+
+    Com ``formas`` (mapa de formas com ao menos uma forma INSTALADA) o motor
+    também é o ``_allocate_restricted``: além da capacidade em m³, cada dia só
+    tem as pistas das formas compatíveis, e o mix ganha a coluna "Qtd Pistas".
+
+    Com ``ordering="trocas"`` os lotes de cada sequência são reordenados antes da
+    alocação para reduzir trocas de setup entre dias (``_order_by_setup_changes``);
+    a ordem das sequências (SEQ 1, 2, ...) não muda. ``metrics`` traz as trocas
+    de setup do mix (e, com ``"trocas"``, as da ordem alfabética, para comparação).
     """
+    if engine not in ENGINES:
+        raise ValueError(f"Motor desconhecido: {engine!r}. Use um de: {', '.join(ENGINES)}.")
+    if ordering not in ORDERINGS:
+        raise ValueError(f"Ordenação desconhecida: {ordering!r}. Use uma de: {', '.join(ORDERINGS)}.")
+
+    calendar = calendar_from_capacidade(capacidade_linhas, use_business_days)
+    prep = _prepare(pecas, seq_producao, use_business_days, calendar)
+    if isinstance(prep, MixOutputs):
+        return prep
+    model = build_capacity_model(capacidade_linhas, prep.days, capacidade_m3_dia, calendar)
+    return _run_full(prep, model, calendar, engine, _form_index(formas), ordering, ordering_budget_s)
+
+
+def _run_full(
+    prep: _Prepared,
+    model: CapacityModel,
+    calendar: FactoryCalendar,
+    engine: str,
+    form_index: Optional["FormIndex"],
+    ordering: str,
+    ordering_budget_s: float,
+) -> MixOutputs:
+    caps = model.total()
+    stats = None
+    if ordering == "trocas":
+        with span("Ordem por trocas de setup") as sp:
+            stats = _order_by_setup_changes(prep, caps, ordering_budget_s)
+            sp.rows = len(prep.lots)
+
+    pistas = None
+    if form_index is not None or not model.uniform:
+        with span(f"Alocação ({'formas' if form_index is not None else 'linhas'})") as sp:
+            mix_df, pend_rest, pistas, used = _allocate_restricted(prep, model, form_index)
+            sp.rows = len(mix_df)
+    else:
+        with span(f"Alocação ({engine})") as sp:
+            if engine == "numpy":
+                mix_df, pend_rest = _allocate_numpy(prep, caps)
+            elif engine == "eventos":
+                mix_df, pend_rest = _allocate_events(prep, caps)
+            else:
+                mix_df, pend_rest = _allocate_python(prep, caps)
+            sp.rows = len(mix_df)
+        used = model.fill_in_order(_used_by_day(mix_df, prep.days))
+
+    with span("Agregação dia/setup") as sp:
+        mix_diario, sets = _aggregate_day_setup(mix_df, prep, pistas)
+        sp.rows = len(mix_diario)
+    with span("Início dos lotes (D-5)"):
+        if mix_df.empty:
+            alloc_lot = alloc_day = np.zeros(0, dtype=np.int64)
+        else:
+            alloc_lot = mix_df["_LOT"].to_numpy(dtype=np.int64)
+            alloc_day = prep.days.get_indexer(pd.to_datetime(mix_df["Data"]))
+        starts = LotStarts.from_allocations(prep.lots, prep.lot_names, prep.days, alloc_lot, alloc_day, calendar)
+    return MixOutputs(
+        mix_diario=mix_diario,
+        pendencias=pd.DataFrame(prep.pend + pend_rest),
+        name_sets=sets,
+        metrics=_mix_metrics(mix_diario, stats),
+        capacidade=model.frame(used),
+        inicio_lotes=starts,
+    )
+
+
+def _cap_days(capacidade: Union[float, np.ndarray], n_days: int) -> np.ndarray:
+    """Capacidade por dia do calendário (escalar = a mesma em todos os dias)."""
+    if np.ndim(capacidade) == 0:
+        return np.full(n_days, float(capacidade))
+    caps = np.asarray(capacidade, dtype=float)
+    if len(caps) != n_days:
+        raise ValueError(f"Capacidade com {len(caps)} dias para um calendário de {n_days}.")
+    return caps
+
+
+def _used_by_day(mix_df: pd.DataFrame, days: pd.DatetimeIndex) -> np.ndarray:
+    """Volume alocado por dia do calendário (linhas brutas dos motores)."""
+    if mix_df.empty:
+        return np.zeros(len(days))
+    di = days.get_indexer(pd.to_datetime(mix_df["Data"]))
+    return np.bincount(di, weights=mix_df["Volume"].to_numpy(dtype=float), minlength=len(days))
+
+
+def _mix_metrics(mix_diario: pd.DataFrame, stats: Optional[OrderStats] = None) -> Dict[str, float]:
+    if mix_diario is None or mix_diario.empty:
+        return {}
+    out: Dict[str, float] = {"Trocas de setup": count_setup_changes(mix_diario["Data"], mix_diario["Setup"])}
+    if stats is not None:
+        out["Trocas de setup (ordem alfabética)"] = stats.trocas_inicial
+    return out
+
+
+def _order_by_setup_changes(prep: _Prepared, capacidade_m3_dia: Union[float, np.ndarray], time_budget_s: float) -> OrderStats:
+    """Grava em ``prep.lots["_ORD"]`` a ordem dos lotes que reduz as trocas de setup.
+
+    O quanto cada sequência consome por dia não depende da ordem dos seus lotes,
+    então basta uma alocação com a ordem alfabética (motor ``eventos``) para
+    conhecer esse consumo; ``setup_order.plan_setup_order`` decide, dia a dia,
+    qual setup ocupa cada trecho (guloso + busca local limitada a ``time_budget_s``).
+    No motor lote a lote (formas/linhas) o consumo pode mudar com a ordem; lá a
+    ordem é uma heurística.
+    """
+    la = _LotArrays(prep)
+    _allocate_events(prep, capacidade_m3_dia, la=la)
+    day, li, take = la.allocations()
+    setup_codes = pd.factorize(la.lots["SETUP"].astype(str))[0]
+    perm, stats = plan_setup_order(
+        la.lot_seq,
+        setup_codes,
+        np.where(la.vol_total > 1e-9, la.vol_total, 0.0),
+        la.stage_seqs,
+        day,
+        li,
+        take,
+        time_budget_s=time_budget_s,
+    )
+    pos = np.empty(len(perm), dtype=np.int64)
+    pos[perm] = np.arange(len(perm))
+    rank = np.empty(len(perm), dtype=np.int64)
+    rank[la.lots["_LOT"].to_numpy()] = pos
+    prep.lots = prep.lots.assign(_ORD=rank)
+    return stats
+
+
+@dataclass
+class MixState:
+    """Estado de uma execução, reaproveitado por ``build_mix_incremental``.
+
+    - alloc: alocações brutas (DIA = índice no calendário, chave do lote, TAKE)
+    - cap_left: capacidade restante ao fim de cada dia do calendário
+    - cap_days: capacidade total de cada dia (para detectar mudanças de capacidade)
+    """
+    outputs: MixOutputs
+    prep: _Prepared
+    alloc: pd.DataFrame
+    cap_left: np.ndarray
+    cap_days: np.ndarray
+    use_business_days: bool
+
+
+def build_mix_incremental(
+    pecas: pd.DataFrame,
+    seq_producao: pd.DataFrame,
+    capacidade_m3_dia: float,
+    use_business_days: bool = True,
+    previous: Optional[MixState] = None,
+    changed_keys: Optional[Iterable[Tuple[str, str, str]]] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    formas: Optional[pd.DataFrame] = None,
+    ordering: str = "setup",
+    capacidade_linhas: Optional[pd.DataFrame] = None,
+) -> Tuple[MixOutputs, Optional[MixState]]:
+    """Reprograma a partir do primeiro dia afetado pelas mudanças.
+
+    As chaves CT/ETAPA/SEQUENCIA alteradas (janela, lotes ou nomes de peças) são
+    detectadas comparando com ``previous``; ``changed_keys`` acrescenta chaves
+    conhecidas pelo chamador. Uma mudança na sequência ``k`` só altera a
+    alocação a partir da menor data de início entre ``k`` e as sequências
+    seguintes da mesma etapa (antes disso nenhuma delas consome capacidade), então
+    o prefixo do ``mix_diario`` é reaproveitado e apenas os dias seguintes são
+    recalculados (motor ``eventos``). Uma mudança na capacidade ou no calendário
+    (feriado, sábado trabalhado) recalcula a partir do primeiro dia diferente. Sem
+    ``previous`` compatível (tipo de calendário ou primeiro dia diferentes),
+    recalcula tudo.
+
+    ``progress(dia, total)`` acompanha a alocação (ver ``_allocate_events``).
+
+    Com ``formas``, ``ordering="trocas"`` ou linhas com restrição de tipologia a
+    programação é sempre completa (esses motores e a ordem por trocas dependem do
+    calendário inteiro) e não há estado para reaproveitar.
+
+    Retorna ``(MixOutputs, MixState)``; o estado é ``None`` quando não há o que programar.
+    """
+    calendar = calendar_from_capacidade(capacidade_linhas, use_business_days)
+    prep = _prepare(pecas, seq_producao, use_business_days, calendar)
+    if isinstance(prep, MixOutputs):
+        return prep, None
+    model = build_capacity_model(capacidade_linhas, prep.days, capacidade_m3_dia, calendar)
+    form_index = _form_index(formas)
+    if form_index is not None or ordering != "setup" or not model.uniform:
+        return _run_full(prep, model, calendar, "eventos", form_index, ordering, ORDER_BUDGET_SECONDS), None
+
+    caps = model.total()
+    la = _LotArrays(prep)
+    start_di = 0
+    prefix = None
+
+    # dias iguais no início dos dois calendários (feriado novo = calendário muda dali em diante)
+    m = _common_days(previous.prep.days, prep.days) if previous is not None else 0
+    if previous is not None and previous.use_business_days == use_business_days and m > 0:
+        changed = _changed_seq_keys(previous.prep, prep) | set(changed_keys or ())
+        cap_diff = np.flatnonzero(previous.cap_days[:m] != caps[:m])
+        same_days = m == len(previous.prep.days) == len(prep.days)
+        if not changed and not cap_diff.size and same_days:
+            return previous.outputs, previous
+
+        first_day = _first_affected_day(previous.prep, prep, changed) if changed else None
+        start_di = int(prep.days.searchsorted(first_day)) if first_day is not None else len(prep.days)
+        start_di = min(start_di, int(cap_diff[0]) if cap_diff.size else m)
+
+        prefix = previous.alloc[previous.alloc["DIA"] < start_di]
+        lot_idx = la.lot_index(prefix)
+        if (lot_idx < 0).any():
+            # lote do prefixo sumiu (não deveria acontecer): recalcula tudo
+            la = _LotArrays(prep)
+            start_di, prefix = 0, None
+        else:
+            la.restore(lot_idx, prefix["TAKE"].to_numpy(dtype=float))
+
+    with span("Alocação (incremental)") as sp:
+        mix_new, pend_rest = _allocate_events(prep, caps, la=la, start_di=start_di, progress=progress)
+        sp.rows = len(mix_new)
+    with span("Agregação dia/setup") as sp:
+        mix_df, sets = _aggregate_day_setup(mix_new, prep)
+        sp.rows = len(mix_df)
+
+    if prefix is not None and start_di > 0:
+        # corte pelo calendário anterior: um dia que virou feriado também sai do prefixo
+        old_days = previous.prep.days
+        mix_df, sets = _concat_mix(previous.outputs, mix_df, sets, old_days[start_di].date() if start_di < len(old_days) else None)
+
+    day, li, take = la.allocations()
+    new_alloc = la.lots.iloc[li][_LOT_KEY].reset_index(drop=True)
+    new_alloc.insert(0, "DIA", day)
+    new_alloc["TAKE"] = take
+    alloc = pd.concat([prefix, new_alloc], ignore_index=True) if prefix is not None else new_alloc
+
+    with span("Início dos lotes (D-5)"):
+        pos = np.concatenate([lot_idx, li]) if prefix is not None else li
+        starts = LotStarts.from_allocations(
+            prep.lots, prep.lot_names, prep.days,
+            la.lots["_LOT"].to_numpy(dtype=np.int64)[pos], alloc["DIA"].to_numpy(dtype=np.int64), calendar,
+        )
+
+    used = np.bincount(alloc["DIA"].to_numpy(dtype=np.int64), weights=alloc["TAKE"].to_numpy(dtype=float), minlength=len(prep.days))
+
+    out = MixOutputs(
+        mix_diario=mix_df,
+        pendencias=pd.DataFrame(prep.pend + pend_rest),
+        name_sets=sets,
+        metrics=_mix_metrics(mix_df),
+        capacidade=model.frame(model.fill_in_order(used)),
+        inicio_lotes=starts,
+    )
+    state = MixState(
+        outputs=out,
+        prep=prep,
+        alloc=alloc,
+        cap_left=caps - used,
+        cap_days=caps,
+        use_business_days=use_business_days,
+    )
+    return out, state
+
+
+def _common_days(a: pd.DatetimeIndex, b: pd.DatetimeIndex) -> int:
+    """Quantos dias iniciais os dois calendários têm em comum."""
+    m = min(len(a), len(b))
+    diff = np.flatnonzero(a.values[:m] != b.values[:m])
+    return int(diff[0]) if diff.size else m
+
+
+def _concat_mix(prev: MixOutputs, mix_df: pd.DataFrame, sets: Dict[str, NameSets], cut) -> Tuple[pd.DataFrame, Dict[str, NameSets]]:
+    """Prefixo do mix anterior (dias < ``cut``) seguido das linhas recalculadas."""
+    prev_mix = prev.mix_diario
+    if prev_mix.empty:
+        return mix_df, sets
+    keep = (prev_mix if cut is None else prev_mix[prev_mix["Data"] < cut]).reset_index(drop=True)
+    if keep.empty:
+        return mix_df, sets
+
+    out_sets: Dict[str, NameSets] = {}
+    for col, ns_prev in prev.name_sets.items():
+        head = ns_prev.take(keep[col].to_numpy(dtype=np.int64))
+        tail = sets.get(col, NameSets.empty(len(mix_df)))
+        out_sets[col] = NameSets.concat(head, tail)
+        keep[col] = np.arange(len(keep), dtype=np.int64)
+    if mix_df.empty:
+        return keep, out_sets
+    mix_df = mix_df.copy()
+    for col in out_sets:
+        mix_df[col] = mix_df[col].to_numpy(dtype=np.int64) + len(keep)
+    return pd.concat([keep, mix_df], ignore_index=True), out_sets
+
+
+def _changed_seq_keys(old: _Prepared, new: _Prepared) -> Set[Tuple[str, str, str]]:
+    """Chaves CT/ETAPA/SEQUENCIA cuja janela ou lotes mudaram entre duas preparações."""
+    changed: Set[Tuple[str, str, str]] = set()
+    for k in set(old.win) | set(new.win):
+        if old.win.get(k) != new.win.get(k):
+            changed.add(k)
+
+    cols = ["CT", "ETAPA", "SEQUENCIA", "TIPOLOGIA", "TIPO ARMAÇÃO", "FUNDO (CM)", "LATERAL (CM)", "SETUP",
+            "COMP_TOTAL_FUNDO_M", "VOL_TOTAL_M3", "_NOMES_HASH"]
+    both = old.lots[cols].merge(new.lots[cols], on=cols, how="outer", indicator=True)
+    diff = both[both["_merge"] != "both"]
+    for ct, etapa, seq in diff[["CT", "ETAPA", "SEQUENCIA"]].drop_duplicates().itertuples(index=False, name=None):
+        changed.add((str(ct).strip(), str(etapa).strip(), str(seq).strip()))
+    return changed
+
+
+def _first_affected_day(old: _Prepared, new: _Prepared, changed: Set[Tuple[str, str, str]]) -> Optional[pd.Timestamp]:
+    """Menor data de início (antiga ou nova) entre cada sequência alterada e as seguintes da etapa."""
+    first: Optional[pd.Timestamp] = None
+    for prep in (old, new):
+        for k in changed:
+            keys = prep.seq_list_by_stage.get((k[0], k[1]), [])
+            if k not in keys:
+                continue
+            for kk in keys[keys.index(k):]:
+                w_start = prep.win[kk][0]
+                if first is None or w_start < first:
+                    first = w_start
+    return first
+
+
+def _prepare(
+    pecas: pd.DataFrame,
+    seq_producao: pd.DataFrame,
+    use_business_days: bool,
+    calendar: Optional[FactoryCalendar] = None,
+) -> Union[_Prepared, MixOutputs]:
+    """Normaliza peças/sequências, cria os lotes por SETUP e o calendário.
+
+    Retorna ``MixOutputs`` diretamente quando não há o que programar.
+    """
+    with span("Normalização", rows=len(pecas)):
+        norm = _normalize(pecas, seq_producao)
+    if isinstance(norm, MixOutputs):
+        return norm
+    with span("Lotes por setup") as sp:
+        prep = _build_lots(*norm, use_business_days=use_business_days, calendar=calendar)
+        sp.rows = len(prep.lots) if isinstance(prep, _Prepared) else 0
+    return prep
+
+
+def _normalize(
+    pecas: pd.DataFrame,
+    seq_producao: pd.DataFrame,
+) -> Union[Tuple[pd.DataFrame, pd.DataFrame, List[dict]], MixOutputs]:
+    """Limpa peças e sequências; retorna (peças, sequências com datas, pendências)."""
     p = pecas.copy()
     s = seq_producao.copy()
 
@@ -52,7 +482,8 @@ def build_mix_diario_simple(
 
     for c in ["QTDE", "COMPRIMENTO (M)", "VOLUME (M3)", "FUNDO (CM)", "LATERAL (CM)"]:
         if c in p.columns:
-            p[c] = pd.to_numeric(p[c], errors="coerce")
+            # float64 nas contas (a tabela da sessão pode estar em float32/int32, ver schema)
+            p[c] = pd.to_numeric(p[c], errors="coerce").astype(float)
 
     p["COMP_TOTAL_FUNDO_M"] = (p.get("QTDE", 0).fillna(0) * p.get("COMPRIMENTO (M)", 0).fillna(0)).astype(float)
     p["VOL_TOTAL_M3"] = p.get("VOLUME (M3)", 0).fillna(0).astype(float)
@@ -103,27 +534,73 @@ def build_mix_diario_simple(
     p["FUNDO (CM)"] = p.get("FUNDO (CM)", 0).fillna(0)
     p["LATERAL (CM)"] = p.get("LATERAL (CM)", 0).fillna(0)
     p["SETUP"] = p["FUNDO (CM)"].astype(int).astype(str) + "x" + p["LATERAL (CM)"].astype(int).astype(str)
+    return p, seq_keys, pend
+
 
+def _build_lots(
+    p: pd.DataFrame,
+    seq_keys: pd.DataFrame,
+    pend: List[dict],
+    use_business_days: bool,
+    calendar: Optional[FactoryCalendar] = None,
+) -> Union[_Prepared, MixOutputs]:
+    """Agrupa as peças em lotes por SETUP e monta janelas e calendário.
+
+    Sem ``calendar``, seg-sex (``use_business_days``) ou todos os dias, sem feriados.
+    """
     lot_cols = ["CT", "ETAPA", "SEQUENCIA", "TIPOLOGIA", "TIPO ARMAÇÃO", "FUNDO (CM)", "LATERAL (CM)", "SETUP"]
-    lots = (
-        p.groupby(lot_cols, dropna=False)
-         .agg({
-             "COMP_TOTAL_FUNDO_M": "sum",
-             "VOL_TOTAL_M3": "sum",
-             "NOME PEÇA": lambda x: ";".join(sorted({str(v).strip() for v in x.dropna().astype(str) if str(v).strip()})),
-         })
-         .reset_index()
-    )
-    lots = lots[lots["VOL_TOTAL_M3"] > 0].copy()
+    g = p.groupby(lot_cols, dropna=False)
+    lots = g.agg({"COMP_TOTAL_FUNDO_M": "sum", "VOL_TOTAL_M3": "sum"}).reset_index()
+    # nomes das peças de cada lote como códigos inteiros
+    lot_names = NameSets.encode(g.ngroup().to_numpy(), p["NOME PEÇA"].to_numpy(), len(lots), sep=";")
+
+    keep = (lots["VOL_TOTAL_M3"] > 0).to_numpy()
+    lots = lots[keep].reset_index(drop=True)
+    lot_names = lot_names.take(np.flatnonzero(keep))
+    lots["_NOMES_HASH"] = lot_names.fingerprint()
     if lots.empty:
         pend.append({"MOTIVO": "Peças sem volume > 0."})
         return MixOutputs(mix_diario=pd.DataFrame(), pendencias=pd.DataFrame(pend))
 
+    # prepara calendário global
+    start = seq_keys["DATA_INICIO_PRODUÇÃO"].min().normalize()
+    end = seq_keys["DATA_FIM_PRODUÇÃO"].max().normalize()
+    cal = calendar if calendar is not None else FactoryCalendar.default(use_business_days)
+    days = cal.days(start, end)
+
+    # índice de janelas por CT/ETAPA/SEQ
+    win: Dict[Tuple[str, str, str], Tuple[pd.Timestamp, pd.Timestamp]] = {}
+    for _, r in seq_keys.iterrows():
+        key = (str(r["CT"]).strip(), str(r["ETAPA"]).strip(), str(r["SEQUENCIA"]).strip())
+        win[key] = (r["DATA_INICIO_PRODUÇÃO"].normalize(), r["DATA_FIM_PRODUÇÃO"].normalize())
+
+    # lista de sequências por CT/ETAPA (ordenadas)
+    seq_list_by_stage: Dict[Tuple[str, str], List[Tuple[str, str, str]]] = {}
+    for key in win.keys():
+        ct, etapa, seq = key
+        seq_list_by_stage.setdefault((ct, etapa), []).append(key)
+    for stage, keys in list(seq_list_by_stage.items()):
+        seq_list_by_stage[stage] = sorted(keys, key=lambda k: _seqnum(k[2]))
+
+    return _Prepared(lots=lots, lot_names=lot_names, win=win, seq_list_by_stage=seq_list_by_stage, days=days, pend=pend)
+
+
+def _allocate_python(prep: _Prepared, capacidade_m3_dia: Union[float, np.ndarray]) -> Tuple[pd.DataFrame, List[dict]]:
+    """Motor de referência: fila de dicts por sequência, consumida lote a lote.
+
+    ``capacidade_m3_dia``: escalar ou um valor por dia do calendário.
+    """
+    lots = prep.lots
+    win = prep.win
+    seq_list_by_stage = prep.seq_list_by_stage
+    pend: List[dict] = []
+
     # filas por sequência
     by_seq: Dict[Tuple[str, str, str], List[dict]] = {}
-    for _, r in lots.iterrows():
+    for lot_pos, r in lots.iterrows():
         key = (str(r["CT"]).strip(), str(r["ETAPA"]).strip(), str(r["SEQUENCIA"]).strip())
         by_seq.setdefault(key, []).append({
+            "_LOT": lot_pos,
             "CT": key[0],
             "ETAPA": key[1],
             "SEQUENCIA": key[2],
@@ -133,42 +610,27 @@ def build_mix_diario_simple(
             "FUNDO (CM)": float(r["FUNDO (CM)"]) if pd.notna(r["FUNDO (CM)"]) else 0.0,
             "LATERAL (CM)": float(r["LATERAL (CM)"]) if pd.notna(r["LATERAL (CM)"]) else 0.0,
             "SETUP": r["SETUP"],
-            "NOME PEÇAS": r["NOME PEÇA"],
             "vol_total": float(r["VOL_TOTAL_M3"]),
             "comp_total": float(r["COMP_TOTAL_FUNDO_M"]),
             "vol_rem": float(r["VOL_TOTAL_M3"]),
         })
 
-    # ordena setups dentro de cada sequência (por setup)
+    # ordena setups dentro de cada sequência (por setup, ou pela ordem calculada em "_ORD")
+    order = lots["_ORD"].to_numpy() if "_ORD" in lots.columns else None
     for k in list(by_seq.keys()):
-        by_seq[k].sort(key=lambda x: (str(x["SETUP"]), str(x["TIPOLOGIA"]), str(x["TIPO_ARMAÇÃO"])))
-
-    # prepara calendário global
-    start = seq_keys["DATA_INICIO_PRODUÇÃO"].min().normalize()
-    end = seq_keys["DATA_FIM_PRODUÇÃO"].max().normalize()
-    days = pd.bdate_range(start=start, end=end, freq="B") if use_business_days else pd.date_range(start=start, end=end, freq="D")
-
-    # índice de janelas por CT/ETAPA/SEQ
-    win: Dict[Tuple[str, str, str], Tuple[pd.Timestamp, pd.Timestamp]] = {}
-    for _, r in seq_keys.iterrows():
-        key = (str(r["CT"]).strip(), str(r["ETAPA"]).strip(), str(r["SEQUENCIA"]).strip())
-        win[key] = (r["DATA_INICIO_PRODUÇÃO"].normalize(), r["DATA_FIM_PRODUÇÃO"].normalize())
-
-    # lista de sequências por CT/ETAPA (ordenadas)
-    seq_list_by_stage: Dict[Tuple[str, str], List[Tuple[str, str, str]]] = {}
-    for key in win.keys():
-        ct, etapa, seq = key
-        seq_list_by_stage.setdefault((ct, etapa), []).append(key)
-    for stage, keys in list(seq_list_by_stage.items()):
-        seq_list_by_stage[stage] = sorted(keys, key=lambda k: _seqnum(k[2]))
+        if order is not None:
+            by_seq[k].sort(key=lambda x: order[x["_LOT"]])
+        else:
+            by_seq[k].sort(key=lambda x: (str(x["SETUP"]), str(x["TIPOLOGIA"]), str(x["TIPO_ARMAÇÃO"])))
 
     # ponteiro de sequência corrente por CT/ETAPA
     current_idx: Dict[Tuple[str, str], int] = {stage: 0 for stage in seq_list_by_stage.keys()}
 
     mix_rows: List[dict] = []
 
-    for day in days:
-        cap_rest = float(capacidade_m3_dia)
+    caps = _cap_days(capacidade_m3_dia, len(prep.days))
+    for di, day in enumerate(prep.days):
+        cap_rest = float(caps[di])
 
         # percorre CT/ETAPA em ordem estável
         for stage in sorted(seq_list_by_stage.keys(), key=lambda x: (x[0], x[1])):
@@ -226,8 +688,7 @@ def build_mix_diario_simple(
                     "Setup": lot["SETUP"],
                     "Comprimento Total de Fundo (m)": float(comp_take),
                     "Volume": float(take),
-                    "Seq de Montagem": lot["SEQUENCIA"],
-                    "Nome Peças": lot["NOME PEÇAS"],
+                    "_LOT": lot["_LOT"],
                 })
 
                 if lot["vol_rem"] <= 1e-9:
@@ -248,20 +709,577 @@ def build_mix_diario_simple(
                 "VOLUME_RESTANTE_M3": float(vol_left),
             })
 
-    mix_df = pd.DataFrame(mix_rows)
-
-    # agrega por dia e setup
-    if not mix_df.empty:
-        gcols = ["Data", "Tipologia", "Tipo Armação", "Fundo (cm)", "Lateral (cm)", "Setup"]
-        mix_df = (
-            mix_df.groupby(gcols, dropna=False)
-                  .agg({
-                      "Comprimento Total de Fundo (m)": "sum",
-                      "Volume": "sum",
-                      "Seq de Montagem": lambda s: ";".join(sorted({str(x) for x in s.dropna().astype(str)})),
-                      "Nome Peças": lambda s: ";".join(sorted({p.strip() for x in s.dropna().astype(str) for p in str(x).split(";") if p.strip()})),
-                  })
-                  .reset_index()
+    return pd.DataFrame(mix_rows), pend
+
+
+class _LotArrays:
+    """Lotes em arrays contíguos por sequência (motores ``numpy`` e ``eventos``).
+
+    Cada sequência ocupa a faixa ``[lo, hi)`` dos arrays (já na ordem de SETUP);
+    ``ptr`` aponta para o primeiro lote com saldo. ``avail`` é o saldo consumível
+    (lotes com saldo <= 1e-9 nunca geram linha) e ``rem`` o saldo real, usado nas
+    pendências.
+    """
+
+    def __init__(self, prep: _Prepared) -> None:
+        lots = (
+            prep.lots.assign(
+                _LOT=np.arange(len(prep.lots)),
+                _CT=prep.lots["CT"].astype(str).str.strip(),
+                _ETAPA=prep.lots["ETAPA"].astype(str).str.strip(),
+                _SEQ=prep.lots["SEQUENCIA"].astype(str).str.strip(),
+            )
+            .sort_values(
+                ["_CT", "_ETAPA", "_SEQ", "_ORD"] if "_ORD" in prep.lots.columns
+                else ["_CT", "_ETAPA", "_SEQ", "SETUP", "TIPOLOGIA", "TIPO ARMAÇÃO"],
+                kind="mergesort",
+            )
+            .reset_index(drop=True)
         )
+        self.lots = lots
+        self.days = prep.days
+
+        # sequências na ordem de primeira aparição (mesma ordem das filas do motor python)
+        self.lot_seq = lots.groupby(["_CT", "_ETAPA", "_SEQ"], sort=False).ngroup().to_numpy(dtype=np.int64)
+        self.seq_keys = list(lots[["_CT", "_ETAPA", "_SEQ"]].drop_duplicates().itertuples(index=False, name=None))
+        n_seq = len(self.seq_keys)
+        seq_id = {k: i for i, k in enumerate(self.seq_keys)}
+
+        self.lo = np.searchsorted(self.lot_seq, np.arange(n_seq), side="left")
+        self.hi = np.searchsorted(self.lot_seq, np.arange(n_seq), side="right")
+
+        self.vol_total = lots["VOL_TOTAL_M3"].to_numpy(dtype=float)
+        self.comp_total = lots["COMP_TOTAL_FUNDO_M"].to_numpy(dtype=float)
+        self.rem = self.vol_total.copy()
+        self.avail = np.where(self.vol_total > 1e-9, self.vol_total, 0.0)
+        self.seq_total = np.bincount(self.lot_seq, weights=self.vol_total, minlength=n_seq)
+
+        # janelas como ordinais de dia
+        self.win_start = np.zeros(n_seq, dtype=np.int64)
+        self.win_end = np.full(n_seq, -1, dtype=np.int64)
+        for k, (w_start, w_end) in prep.win.items():
+            i = seq_id.get(k)
+            if i is not None:
+                self.win_start[i] = _day_ordinal(w_start)
+                self.win_end[i] = _day_ordinal(w_end)
+
+        # sequências (com lotes) por etapa; sequências sem lotes seriam puladas de qualquer forma
+        stages = sorted(prep.seq_list_by_stage.keys(), key=lambda x: (x[0], x[1]))
+        self.stage_seqs = [[seq_id[k] for k in prep.seq_list_by_stage[st] if k in seq_id] for st in stages]
+
+        self.ptr = self.lo.copy()
+        self.visited = np.zeros(n_seq, dtype=bool)
+
+        self._out_day: List[np.ndarray] = []
+        self._out_lot: List[np.ndarray] = []
+        self._out_take: List[np.ndarray] = []
+
+    def clone(self) -> "_LotArrays":
+        """Cópia com saldos próprios (estruturas imutáveis compartilhadas), para rodar cenários."""
+        other = copy.copy(self)
+        other.rem = self.rem.copy()
+        other.avail = self.avail.copy()
+        other.ptr = self.ptr.copy()
+        other.visited = self.visited.copy()
+        other._out_day, other._out_lot, other._out_take = [], [], []
+        return other
+
+    def is_done(self, s: int) -> bool:
+        if self.visited[s]:
+            return self.ptr[s] >= self.hi[s]
+        return self.seq_total[s] <= 1e-9
+
+    def _emit(self, day_idx: np.ndarray, lot_idx: np.ndarray, takes: np.ndarray) -> None:
+        keep = takes > 0
+        if keep.any():
+            self._out_day.append(day_idx[keep])
+            self._out_lot.append(lot_idx[keep])
+            self._out_take.append(takes[keep])
+
+    def _advance_ptr(self, s: int) -> None:
+        a, b = int(self.ptr[s]), int(self.hi[s])
+        nz = np.flatnonzero(self.avail[a:b] > 0)
+        self.ptr[s] = a + int(nz[0]) if nz.size else b
+
+    def consume(self, s: int, cap_rest: float, di: int) -> float:
+        """Consome até ``cap_rest`` da sequência ``s`` no dia ``di``; retorna o volume tomado."""
+        self.visited[s] = True
+        a, b = int(self.ptr[s]), int(self.hi[s])
+        seg = self.avail[a:b]
+        cum = np.cumsum(seg)
+        n = int(np.searchsorted(cum, cap_rest, side="right"))
+        taken = float(cum[n - 1]) if n else 0.0
+
+        lot_idx = np.arange(a, a + n)
+        takes = seg[:n].copy()
+        self.rem[a:a + n] -= takes
+        self.avail[a:a + n] = 0.0
+
+        left = cap_rest - taken
+        if n < len(seg) and left > 1e-9:
+            j = a + n
+            self.rem[j] -= left
+            self.avail[j] = self.rem[j] if self.rem[j] > 1e-9 else 0.0
+            lot_idx = np.append(lot_idx, j)
+            takes = np.append(takes, left)
+            taken += left
+
+        self._emit(np.full(len(takes), di, dtype=np.int64), lot_idx, takes)
+        self._advance_ptr(s)
+        return taken
+
+    def consume_run(self, s: int, caps: np.ndarray, di: int) -> None:
+        """Consome ``caps[k]`` no dia ``di + k`` da sequência ``s`` (``len(caps)`` dias).
+
+        Pressupõe que a sequência tem saldo para todos os dias (não termina no trecho).
+        As linhas saem da interseção entre os intervalos acumulados dos lotes e os
+        intervalos de cada dia.
+        """
+        self.visited[s] = True
+        a, b = int(self.ptr[s]), int(self.hi[s])
+        seg = self.avail[a:b]
+        cum = np.cumsum(seg)
+        day_ends = np.cumsum(caps)
+        total = float(day_ends[-1])
+
+        pts = np.concatenate(([0.0], np.sort(np.concatenate((cum[cum < total], day_ends)))))
+        starts, ends = pts[:-1], pts[1:]
+        lengths = ends - starts
+        ok = lengths > 1e-9
+        seg_lot = np.searchsorted(cum, ends[ok], side="left")
+        seg_day = np.searchsorted(day_ends, ends[ok], side="left")
+        self._emit(di + seg_day, a + seg_lot, lengths[ok])
+
+        full = int(np.searchsorted(cum, total, side="right"))
+        self.rem[a:a + full] -= seg[:full]
+        self.avail[a:a + full] = 0.0
+        if full < len(seg):
+            j = a + full
+            self.rem[j] -= total - (float(cum[full - 1]) if full else 0.0)
+            self.avail[j] = self.rem[j] if self.rem[j] > 1e-9 else 0.0
+        self._advance_ptr(s)
+
+    def pendencias(self) -> List[dict]:
+        # para sequências já visitadas, lotes zerados saem da fila
+        left_mask = ~self.visited[self.lot_seq] | (self.rem > 1e-9)
+        vol_left = np.bincount(self.lot_seq, weights=np.where(left_mask, self.rem, 0.0), minlength=len(self.seq_keys))
+        pend: List[dict] = []
+        for i in np.flatnonzero(vol_left > 1e-6):
+            ct, etapa, seq = self.seq_keys[i]
+            pend.append({
+                "CT": ct,
+                "ETAPA": etapa,
+                "SEQUENCIA": seq,
+                "MOTIVO": "Não coube nas datas de produção (capacidade média)",
+                "VOLUME_RESTANTE_M3": float(vol_left[i]),
+            })
+        return pend
+
+    def allocations(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Alocações brutas (dia, lote, volume) ordenadas por dia."""
+        if not self._out_lot:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=float)
+        day = np.concatenate(self._out_day)
+        li = np.concatenate(self._out_lot)
+        take = np.concatenate(self._out_take)
+        # motor por eventos emite trechos fora de ordem: ordena por dia mantendo a ordem das etapas
+        order = np.argsort(day, kind="stable")
+        return day[order], li[order], take[order]
+
+    def lot_index(self, keys: pd.DataFrame) -> np.ndarray:
+        """Posição dos lotes (colunas ``_LOT_KEY``) nestes arrays; -1 se não existir."""
+        idx = pd.MultiIndex.from_frame(self.lots[_LOT_KEY])
+        return idx.get_indexer(pd.MultiIndex.from_frame(keys[_LOT_KEY]))
+
+    def restore(self, lot_idx: np.ndarray, takes: np.ndarray) -> None:
+        """Reaplica alocações de uma execução anterior (sem emitir linhas)."""
+        if len(lot_idx) == 0:
+            return
+        self.rem -= np.bincount(lot_idx, weights=takes, minlength=len(self.rem))
+        seqs = np.unique(self.lot_seq[lot_idx])
+        self.visited[seqs] = True
+        touched = self.visited[self.lot_seq]
+        self.avail = np.where(touched, np.where(self.rem > 1e-9, self.rem, 0.0), self.avail)
+        for s in seqs:
+            self._advance_ptr(int(s))
+
+    def mix_rows(self) -> pd.DataFrame:
+        if not self._out_lot:
+            return pd.DataFrame()
+
+        day, li, take = self.allocations()
+
+        vt = self.vol_total[li]
+        comp_take = np.where(vt > 1e-9, self.comp_total[li] * (take / np.where(vt > 1e-9, vt, 1.0)), 0.0)
+        lots = self.lots
+        return pd.DataFrame({
+            "Data": self.days[day].date,
+            "Tipologia": lots["TIPOLOGIA"].to_numpy()[li],
+            "Tipo Armação": lots["TIPO ARMAÇÃO"].to_numpy()[li],
+            "Fundo (cm)": lots["FUNDO (CM)"].to_numpy(dtype=float)[li],
+            "Lateral (cm)": lots["LATERAL (CM)"].to_numpy(dtype=float)[li],
+            "Setup": lots["SETUP"].to_numpy()[li],
+            "Comprimento Total de Fundo (m)": comp_take,
+            "Volume": take,
+            "_LOT": lots["_LOT"].to_numpy()[li],
+        })
+
+
+def _allocate_numpy(prep: _Prepared, capacidade_m3_dia: Union[float, np.ndarray]) -> Tuple[pd.DataFrame, List[dict]]:
+    """Motor vetorizado: percorre o calendário dia a dia, mas consome cada etapa
+    com ``cumsum`` + ``searchsorted`` sobre a faixa de lotes da sequência corrente:
+    os ``n`` primeiros lotes saem inteiros e o seguinte (se couber) sai parcial.
+    """
+    la = _LotArrays(prep)
+    current_idx = [0] * len(la.stage_seqs)
+    day_ord = prep.days.values.astype("datetime64[D]").astype(np.int64)
+    caps = _cap_days(capacidade_m3_dia, len(day_ord))
+
+    for di, d in enumerate(day_ord):
+        cap_rest = float(caps[di])
+
+        for si, seqs in enumerate(la.stage_seqs):
+            if cap_rest <= 1e-9:
+                break
+
+            idx = current_idx[si]
+            while idx < len(seqs) and la.is_done(seqs[idx]):
+                idx += 1
+            current_idx[si] = idx
+
+            if idx >= len(seqs):
+                continue
+
+            s = seqs[idx]
+            if not (la.win_start[s] <= d <= la.win_end[s]):
+                continue
+
+            cap_rest -= la.consume(s, cap_rest, di)
+
+    return la.mix_rows(), la.pendencias()
+
+
+def _allocate_events(
+    prep: _Prepared,
+    capacidade_m3_dia: Union[float, np.ndarray],
+    la: Optional[_LotArrays] = None,
+    start_di: int = 0,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[pd.DataFrame, List[dict]]:
+    """Motor por eventos: só visita os dias em que o conjunto de etapas elegíveis muda.
+
+    Uma etapa é elegível quando a janela da sua sequência corrente contém o dia.
+    Um heap guarda, por etapa, o próximo evento (abertura da janela, fechamento
+    da janela ou fim da sequência). Entre dois eventos o conjunto é constante e
+    toda a capacidade vai para a primeira etapa elegível; enquanto a sequência
+    dela tiver saldo para dias inteiros (soma acumulada da capacidade de cada
+    dia), os dias são emitidos em bloco (``consume_run``). Os dias de transição usam o mesmo passo diário do motor
+    ``numpy``; dias ociosos são pulados.
+
+    ``la``/``start_di`` permitem retomar a partir de um dia com os saldos já
+    restaurados (reprogramação incremental). ``progress(dia, total)`` é chamado
+    a cada ~1% do calendário; se levantar exceção, a alocação é interrompida.
+    """
+    if la is None:
+        la = _LotArrays(prep)
+    n_stages = len(la.stage_seqs)
+    day_ord = prep.days.values.astype("datetime64[D]").astype(np.int64)
+    n_days = len(day_ord)
+    caps = _cap_days(capacidade_m3_dia, n_days)
+
+    if n_days == 0 or caps.max() <= 1e-9:
+        return la.mix_rows(), la.pendencias()
+    # cum_caps[i] = capacidade dos dias [0, i)
+    cum_caps = np.concatenate(([0.0], np.cumsum(caps)))
+
+    # janelas como índices no calendário: elegível em [ws, we)
+    ws = np.searchsorted(day_ord, la.win_start, side="left")
+    we = np.searchsorted(day_ord, la.win_end, side="right")
+
+    current_idx = [0] * n_stages
+    version = [0] * n_stages
+    eligible = np.zeros(n_stages, dtype=bool)
+    heap: List[Tuple[int, int, int]] = []
+
+    def schedule(si: int, di: int) -> None:
+        seqs = la.stage_seqs[si]
+        idx = current_idx[si]
+        while idx < len(seqs) and la.is_done(seqs[idx]):
+            idx += 1
+        current_idx[si] = idx
+        version[si] += 1
+        eligible[si] = False
+        if idx >= len(seqs):
+            return
+        s = seqs[idx]
+        if di < ws[s]:
+            heapq.heappush(heap, (int(ws[s]), si, version[si]))
+        elif di < we[s]:
+            eligible[si] = True
+            heapq.heappush(heap, (int(we[s]), si, version[si]))
+        # janela já passou: a etapa fica parada nessa sequência (como no motor diário)
+
+    for si in range(n_stages):
+        schedule(si, start_di)
+
+    report_step = max(n_days // 100, 1)
+    next_report = start_di
+    di = start_di
+    while di < n_days:
+        if progress is not None and di >= next_report:
+            progress(di, n_days)
+            next_report = di + report_step
+        while heap and heap[0][0] <= di:
+            _, si, v = heapq.heappop(heap)
+            if v == version[si]:
+                schedule(si, di)
+
+        active = np.flatnonzero(eligible)
+        if active.size == 0:
+            if not heap:
+                break
+            di = heap[0][0]
+            continue
+
+        next_evt = heap[0][0] if heap else n_days
+        run = min(next_evt, n_days) - di
+
+        s0 = la.stage_seqs[active[0]][current_idx[active[0]]]
+        # dias inteiros que a sequência ainda cobre (com um dia de folga)
+        target = cum_caps[di] + la.avail[la.ptr[s0]:la.hi[s0]].sum()
+        full_days = int(np.searchsorted(cum_caps, target, side="left")) - 1 - di - 1
+        bulk = min(run, full_days)
+        if bulk > 0:
+            la.consume_run(s0, caps[di:di + bulk], di)
+            di += bulk
+            continue
+
+        # dia de transição: passo diário sobre as etapas elegíveis, em ordem
+        cap_rest = float(caps[di])
+        for si in active:
+            if cap_rest <= 1e-9:
+                break
+            s = la.stage_seqs[si][current_idx[si]]
+            cap_rest -= la.consume(s, cap_rest, di)
+            if la.is_done(s):
+                # próxima sequência da etapa só começa no dia seguinte
+                eligible[si] = False
+                version[si] += 1
+                heapq.heappush(heap, (di + 1, si, version[si]))
+        di += 1
+
+    if progress is not None:
+        progress(n_days, n_days)
+    return la.mix_rows(), la.pendencias()
+
+
+def _form_index(formas: Optional[pd.DataFrame]) -> Optional["FormIndex"]:
+    if formas is None or formas.empty:
+        return None
+    from formas_index import build_form_index
+    return build_form_index(formas)
+
+
+def _allocate_restricted(
+    prep: _Prepared,
+    model: CapacityModel,
+    forms: Optional["FormIndex"] = None,
+) -> Tuple[pd.DataFrame, List[dict], Optional[pd.DataFrame], np.ndarray]:
+    """Motor lote a lote: capacidade por linha (com tipologias aceitas) e, com
+    ``forms``, pistas por dia.
+
+    Mesma ordem do motor de referência (CT/ETAPA, sequência estrita, lotes por
+    SETUP). Cada lote só consome das linhas que aceitam a sua tipologia (na
+    ordem da tabela). Cada forma tem ``qty`` pistas de ``length`` m por dia;
+    uma pista aberta para um setup só recebe peças desse setup (pode juntar
+    CTs). O comprimento de fundo tomado de um lote é proporcional ao volume.
+    Lote que não cabe nas linhas/pistas livres do dia é adiado e a fila segue
+    para o próximo setup da sequência. Lotes sem nenhuma linha ou forma
+    compatível viram pendência e não travam a sequência.
+
+    Retorna (linhas do mix, pendências, pistas por dia/setup ou ``None`` sem
+    formas, volume usado por linha x dia).
+    """
+    la = _LotArrays(prep)
+    length_per_vol = np.where(la.vol_total > 1e-9, la.comp_total / np.where(la.vol_total > 1e-9, la.vol_total, 1.0), 0.0)
+
+    # linhas aceitas por lote
+    tip = la.lots["TIPOLOGIA"].astype(str).to_numpy()
+    tip_codes, tip_uniq = pd.factorize(tip)
+    tip_masks = np.array([model.mask(t) for t in tip_uniq], dtype=bool).reshape(len(tip_uniq), len(model.lines))
+    has_cap = model.cap.sum(axis=1) > 1e-9
+
+    pend: List[dict] = []
+
+    def drop(mask: np.ndarray, motivo) -> None:
+        for li in np.flatnonzero(mask):
+            r = la.lots.iloc[li]
+            pend.append({
+                "CT": r["_CT"],
+                "ETAPA": r["_ETAPA"],
+                "SEQUENCIA": r["_SEQ"],
+                "MOTIVO": motivo(r),
+                "VOLUME_RESTANTE_M3": float(la.vol_total[li]),
+            })
+
+    live = la.vol_total > 1e-9
+    no_line = ~(tip_masks[tip_codes] & has_cap).any(axis=1) & live
+    drop(no_line, lambda r: f"Sem linha de produção para a tipologia {r['TIPOLOGIA']}")
+    blocked = no_line
+    if forms is not None:
+        setup_id, compat = forms.table(la.lots)
+        no_form = np.array([len(compat[k]) == 0 for k in setup_id], dtype=bool) & live & ~no_line
+        drop(no_form, lambda r: f"Sem forma compatível instalada ({r['TIPOLOGIA']} {r['TIPO ARMAÇÃO']} {r['SETUP']})")
+        blocked = blocked | no_form
+    la.rem[blocked] = 0.0
+    la.avail[blocked] = 0.0
+    la.seq_total = np.bincount(la.lot_seq, weights=np.where(blocked, 0.0, la.vol_total), minlength=len(la.seq_keys))
+
+    day_ord = prep.days.values.astype("datetime64[D]").astype(np.int64)
+    ws = np.searchsorted(day_ord, la.win_start, side="left")
+    we = np.searchsorted(day_ord, la.win_end, side="right")
+
+    if forms is not None:
+        length = forms.length.tolist()
+        qty = forms.qty.tolist()
+    avail = la.avail
+    line_used = np.zeros_like(model.cap)
+    out_day: List[int] = []
+    out_lot: List[int] = []
+    out_take: List[float] = []
+    pistas: List[Tuple[int, int, int]] = []
+    current_idx = [0] * len(la.stage_seqs)
+
+    for di in range(len(day_ord)):
+        line_rest = model.cap[:, di].copy()
+        if line_rest.sum() <= 1e-9:
+            continue
+        if forms is not None:
+            free = list(qty)                   # pistas livres por forma
+            open_len: Dict[int, float] = {}    # setup -> metros livres nas pistas já abertas hoje
+            used: Dict[int, int] = {}          # setup -> pistas abertas hoje
+
+        for si, seqs in enumerate(la.stage_seqs):
+            if line_rest.sum() <= 1e-9:
+                break
+            idx = current_idx[si]
+            while idx < len(seqs) and la.is_done(seqs[idx]):
+                idx += 1
+            current_idx[si] = idx
+            if idx >= len(seqs):
+                continue
+            s = seqs[idx]
+            if not (ws[s] <= di < we[s]):
+                continue
+
+            la.visited[s] = True
+            for li in range(int(la.ptr[s]), int(la.hi[s])):
+                if line_rest.sum() <= 1e-9:
+                    break
+                if avail[li] <= 0:
+                    continue
+                lines = tip_masks[tip_codes[li]]
+                room_lines = line_rest[lines]
+                take = min(avail[li], float(room_lines.sum()))
+                if take <= 1e-9:
+                    continue   # linhas desta tipologia já cheias hoje
+                lpv = length_per_vol[li]
+                if forms is not None and lpv > 0:
+                    k = int(setup_id[li])
+                    room = open_len.get(k, 0.0) + sum(free[g] * length[g] for g in compat[k])
+                    take = min(take, room / lpv)
+                    if take <= 1e-9:
+                        continue   # sem pista hoje para este setup
+                    need = take * lpv
+                    got = open_len.get(k, 0.0)
+                    for g in compat[k]:
+                        while free[g] > 0 and got < need - 1e-9:
+                            free[g] -= 1
+                            got += length[g]
+                            used[k] = used.get(k, 0) + 1
+                        if got >= need - 1e-9:
+                            break
+                    open_len[k] = max(got - need, 0.0)
+
+                # consome das linhas aceitas, na ordem da tabela
+                fill = np.clip(take - (np.cumsum(room_lines) - room_lines), 0.0, room_lines)
+                line_rest[lines] = room_lines - fill
+                line_used[lines, di] += fill
+
+                out_day.append(di)
+                out_lot.append(li)
+                out_take.append(take)
+                avail[li] -= take
+                la.rem[li] -= take
+                if avail[li] <= 1e-9:
+                    avail[li] = 0.0
+            la._advance_ptr(s)
+
+        if forms is not None:
+            pistas.extend((di, k, n) for k, n in used.items())
+
+    la._emit(np.asarray(out_day, dtype=np.int64), np.asarray(out_lot, dtype=np.int64), np.asarray(out_take, dtype=float))
+    motivo = "Não coube nas datas de produção (capacidade/formas)" if forms is not None else "Não coube nas datas de produção (capacidade das linhas)"
+    for p in la.pendencias():
+        p["MOTIVO"] = motivo
+        pend.append(p)
+
+    rows = la.mix_rows()
+    if forms is None:
+        return rows, pend, None, line_used
+
+    # pistas por dia/setup, com as mesmas colunas do agrupamento do mix
+    first_lot = pd.Series(np.arange(len(setup_id))).groupby(setup_id).first()
+    if pistas and not rows.empty:
+        p_day, p_setup, p_n = (np.asarray(x) for x in zip(*pistas))
+        li = first_lot.reindex(p_setup).to_numpy()
+        lots = la.lots
+        df_pistas = pd.DataFrame({
+            "Data": prep.days[p_day].date,
+            "Tipologia": lots["TIPOLOGIA"].to_numpy()[li],
+            "Tipo Armação": lots["TIPO ARMAÇÃO"].to_numpy()[li],
+            "Fundo (cm)": lots["FUNDO (CM)"].to_numpy(dtype=float)[li],
+            "Lateral (cm)": lots["LATERAL (CM)"].to_numpy(dtype=float)[li],
+            "Setup": lots["SETUP"].to_numpy()[li],
+            "Qtd Pistas": p_n.astype(int),
+        })
+    else:
+        df_pistas = pd.DataFrame(columns=["Data", "Tipologia", "Tipo Armação", "Fundo (cm)", "Lateral (cm)", "Setup", "Qtd Pistas"])
+    return rows, pend, df_pistas, line_used
+
+
+def _day_ordinal(ts: pd.Timestamp) -> int:
+    return int(np.datetime64(ts.normalize().date(), "D").astype(np.int64))
+
+
+def _aggregate_day_setup(
+    mix_df: pd.DataFrame,
+    prep: _Prepared,
+    pistas: Optional[pd.DataFrame] = None,
+) -> Tuple[pd.DataFrame, Dict[str, NameSets]]:
+    """Agrega as linhas de alocação por dia e setup.
+
+    As listas "Seq de Montagem" e "Nome Peças" são uniões de conjuntos de
+    códigos (sem montar strings); a coluna guarda o id do conjunto. ``pistas``
+    (motor de formas) acrescenta "Qtd Pistas" por dia/setup.
+    """
+    if mix_df.empty:
+        return mix_df, {}
+
+    gcols = ["Data", "Tipologia", "Tipo Armação", "Fundo (cm)", "Lateral (cm)", "Setup"]
+    g = mix_df.groupby(gcols, dropna=False)
+    out = g.agg({"Comprimento Total de Fundo (m)": "sum", "Volume": "sum"}).reset_index()
+    gid = g.ngroup().to_numpy()
+    lot = mix_df["_LOT"].to_numpy(dtype=np.int64)
 
-    return MixOutputs(mix_diario=mix_df, pendencias=pd.DataFrame(pend))
+    sets = {
+        "Seq de Montagem": NameSets.encode(gid, prep.lots["SEQUENCIA"].astype(str).str.strip().to_numpy()[lot], len(out)),
+        "Nome Peças": prep.lot_names.union(lot, gid, len(out)),
+    }
+    out["Seq de Montagem"] = np.arange(len(out), dtype=np.int64)
+    out["Nome Peças"] = np.arange(len(out), dtype=np.int64)
+    if pistas is not None:
+        out = out.merge(pistas, on=gcols, how="left")
+        out["Qtd Pistas"] = out["Qtd Pistas"].fillna(0).astype(int)
+    return out, sets
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# colunas de texto repetitivas guardadas como categoria (códigos + dicionário)
+CATEGORICAL: Dict[str, List[str]] = {
+    "df_pecas": ["CT", "ETAPA", "SEQUENCIA", "TIPOLOGIA", "TIPO ARMAÇÃO"],
+    "mix_diario": ["Tipologia", "Tipo Armação", "Setup"],
+}
+
+# colunas numéricas que podem ir para float32/int32 quando a conversão é exata
+NUMERIC: Dict[str, List[str]] = {
+    "df_pecas": ["QTDE", "FUNDO (CM)", "LATERAL (CM)", "COMPRIMENTO (M)", "VOLUME (M3)"],
+    "mix_diario": ["Fundo (cm)", "Lateral (cm)", "Seq de Montagem", "Nome Peças", "Qtd Pistas"],
+}
+
+ID_COL = "_id"
+
+
+def _downcast(s: pd.Series) -> pd.Series:
+    """int32/float32 só se todos os valores voltam idênticos (sem perda de precisão)."""
+    if not pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+        return s
+    v = s.to_numpy()
+    if v.dtype in (np.int32, np.float32):
+        return s
+    if v.dtype.kind in "iu":
+        if v.size == 0 or (v.min() >= np.iinfo(np.int32).min and v.max() <= np.iinfo(np.int32).max):
+            return s.astype(np.int32)
+        return s
+    if v.dtype.kind == "f":
+        v32 = v.astype(np.float32)
+        same = (v32.astype(v.dtype) == v) | (np.isnan(v) & np.isnan(v32))
+        if same.all():
+            return pd.Series(v32, index=s.index, name=s.name)
+    return s
+
+
+def _categorize(s: pd.Series) -> pd.Series:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    return s.astype("category")
+
+
+def compact(df: Optional[pd.DataFrame], table: str) -> Optional[pd.DataFrame]:
+    """Versão enxuta da tabela: categorias, numéricos reduzidos sem perda e ``_id`` int64.
+
+    Tabelas sem esquema voltam como estão. Colunas já no tipo enxuto não são
+    copiadas (as mapeadas do ``project_store`` continuam mapeadas).
+    """
+    if df is None or table not in CATEGORICAL:
+        return df
+    out = df.copy(deep=False)
+    for c in CATEGORICAL[table]:
+        if c in out.columns:
+            out[c] = _categorize(out[c])
+    for c in NUMERIC.get(table, []):
+        if c in out.columns:
+            out[c] = _downcast(out[c])
+    if ID_COL in out.columns:
+        out[ID_COL] = ensure_ids(out[ID_COL])
+    return out
+
+
+def ensure_ids(ids: pd.Series) -> pd.Series:
+    """``_id`` como sequência int64; ids antigos (uuid em texto) são renumerados."""
+    if pd.api.types.is_integer_dtype(ids) and ids.is_unique:
+        return ids.astype(np.int64, copy=False)
+    return pd.Series(np.arange(len(ids), dtype=np.int64), index=ids.index, name=ids.name)
+
+
+def new_ids(existing: Optional[pd.DataFrame], n: int, floor: int = 0) -> np.ndarray:
+    """``n`` ids novos, depois do maior id existente e a partir de ``floor``.
+
+    ``floor`` é a marca dos ids já entregues (ex.: antes de uma tabela ser
+    substituída ou limpa), para um ``_id`` nunca voltar a ser usado.
+    """
+    start = int(floor)
+    if existing is not None and ID_COL in existing.columns and len(existing):
+        ids = existing[ID_COL]
+        if pd.api.types.is_integer_dtype(ids):
+            start = max(start, int(ids.max()) + 1)
+    return np.arange(start, start + int(n), dtype=np.int64)
+
+
+def _mapped(arr: np.ndarray) -> bool:
+    """Array que é (ou é vista de) um arquivo mapeado em memória."""
+    base = arr
+    while base is not None:
+        if isinstance(base, np.memmap):
+            return True
+        base = getattr(base, "base", None)
+    return False
+
+
+def _frame_bytes(df: pd.DataFrame) -> Dict[str, int]:
+    total = int(df.memory_usage(index=True, deep=True).sum())
+    mapped = 0
+    for c in df.columns:
+        s = df[c]
+        if not isinstance(s.dtype, pd.CategoricalDtype) and s.dtype != object:
+            v = s.to_numpy()
+            if _mapped(v):
+                mapped += int(v.nbytes)
+    return {"total": total, "mapped": mapped}
+
+
+def memory_report(session_state, keys: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Bytes de cada tabela (DataFrame) guardada na sessão, da maior para a menor.
+
+    "Mapeado (MB)" é a parte lida direto do disco (``project_store``), que o
+    sistema compartilha entre sessões.
+    """
+    rows = []
+    for k in (session_state.keys() if keys is None else keys):
+        v = session_state.get(k)
+        if not isinstance(v, pd.DataFrame):
+            continue
+        b = _frame_bytes(v)
+        rows.append({
+            "Tabela": str(k),
+            "Linhas": len(v),
+            "Colunas": v.shape[1],
+            "Memória (MB)": round(b["total"] / 2**20, 3),
+            "Mapeado (MB)": round(b["mapped"] / 2**20, 3),
+            "Bytes/linha": round(b["total"] / len(v), 1) if len(v) else 0.0,
+        })
+    out = pd.DataFrame(rows, columns=["Tabela", "Linhas", "Colunas", "Memória (MB)", "Mapeado (MB)", "Bytes/linha"])
+    return out.sort_values("Memória (MB)", ascending=False, kind="mergesort").reset_index(drop=True)
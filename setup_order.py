@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# tempo máximo da busca local (a ordem gulosa sai sempre; a busca só melhora)
+ORDER_BUDGET_SECONDS = 1.0
+
+_EPS = 1e-9
+
+
+def count_setup_changes(days, setups) -> int:
+    """Trocas de setup: em cada dia com produção, setups que não estavam no dia com produção anterior.
+
+    O primeiro dia conta todos os seus setups (montagem inicial das formas).
+    """
+    d = pd.DataFrame({"d": np.asarray(days), "s": np.asarray(setups)}).drop_duplicates()
+    if d.empty:
+        return 0
+    prod = np.sort(d["d"].unique())
+    prev = dict(zip(prod[1:], prod[:-1]))
+    pairs = set(zip(d["d"], d["s"]))
+    return int(sum(1 for day, s in pairs if (prev.get(day), s) not in pairs))
+
+
+@dataclass
+class OrderStats:
+    trocas_inicial: int      # ordem padrão (SETUP/TIPOLOGIA em ordem alfabética)
+    trocas_gulosa: int
+    trocas: int              # após a busca local
+    movimentos: int          # trocas de posição aceitas na busca local
+    segundos: float
+
+
+def _spans(order: List[int], gvol: Dict[int, float], slices: List[Tuple[int, float]]) -> Dict[int, Set[int]]:
+    """Setups que a sequência produz em cada dia, dada a ordem dos grupos e o volume tomado por dia."""
+    out: Dict[int, Set[int]] = {}
+    gi = 0
+    left = gvol[order[0]] if order else 0.0
+    for day, v in slices:
+        cur = out.setdefault(day, set())
+        while v > _EPS and gi < len(order):
+            take = min(v, left)
+            if take > _EPS:
+                cur.add(order[gi])
+            v -= take
+            left -= take
+            if left <= _EPS:
+                gi += 1
+                left = gvol[order[gi]] if gi < len(order) else 0.0
+    return out
+
+
+class _Planner:
+    """Ordem dos setups de cada sequência sobre o consumo diário já conhecido.
+
+    O volume que cada sequência consome por dia não depende da ordem dos lotes
+    dentro dela (só dos totais e das janelas), então ele é calculado uma vez e
+    a ordem só decide *qual* setup ocupa cada trecho.
+    """
+
+    def __init__(
+        self,
+        groups: List[List[int]],
+        gvol: List[Dict[int, float]],
+        slices: List[List[Tuple[int, float]]],
+        stage: np.ndarray,
+        next_seq: np.ndarray,
+    ) -> None:
+        self.groups = groups
+        self.gvol = gvol
+        self.slices = slices
+        self.stage = stage
+        self.next_seq = next_seq
+        days = sorted({d for sl in slices for d, _ in sl})
+        self.prev_day = dict(zip(days[1:], days[:-1]))
+        self.next_day = dict(zip(days[:-1], days[1:]))
+
+    def greedy(self) -> List[List[int]]:
+        """Percorre os dias em ordem; cada sequência que precisa de um novo setup
+        escolhe, nesta prioridade: um setup já montado hoje, um montado no dia
+        anterior, um que a próxima sequência da etapa não usa (os compartilhados
+        ficam para o fim, para emendar) e, por último, o de maior volume.
+        """
+        events = sorted(
+            ((d, int(self.stage[s]), s, v) for s, sl in enumerate(self.slices) for d, v in sl),
+            key=lambda e: (e[0], e[1]),
+        )
+        order: List[List[int]] = [[] for _ in self.groups]
+        rest = [list(g) for g in self.groups]
+        cur = [-1] * len(self.groups)
+        left = [0.0] * len(self.groups)
+        nxt = [set(self.groups[n]) if n >= 0 else set() for n in self.next_seq]
+
+        today: Set[int] = set()
+        prev: Set[int] = set()
+        day = None
+        for d, _, s, v in events:
+            if d != day:
+                if today:
+                    prev = today
+                today, day = set(), d
+            while v > _EPS:
+                if cur[s] < 0:
+                    if not rest[s]:
+                        break
+                    g = min(
+                        rest[s],
+                        key=lambda c: (
+                            0 if c in today else 1 if c in prev else 2,
+                            c in nxt[s],
+                            -self.gvol[s][c],
+                        ),
+                    )
+                    rest[s].remove(g)
+                    order[s].append(g)
+                    cur[s], left[s] = g, self.gvol[s][g]
+                take = min(v, left[s])
+                if take > _EPS:
+                    today.add(cur[s])
+                v -= take
+                left[s] -= take
+                if left[s] <= _EPS:
+                    cur[s] = -1
+        # grupos que não chegaram a ser produzidos (pendências) ficam no fim, na ordem padrão
+        return [o + r for o, r in zip(order, rest)]
+
+    def _setup(self, order: List[List[int]]) -> None:
+        self.order = [list(o) for o in order]
+        self.contrib = [_spans(o, g, sl) for o, g, sl in zip(self.order, self.gvol, self.slices)]
+        self.cnt: Dict[int, Counter] = {}
+        for c in self.contrib:
+            self._add(c, 1)
+
+    def _add(self, contrib: Dict[int, Set[int]], sign: int) -> None:
+        for d, setups in contrib.items():
+            cd = self.cnt.setdefault(d, Counter())
+            for g in setups:
+                cd[g] += sign
+                if cd[g] <= 0:
+                    del cd[g]
+
+    def _term(self, d: int) -> int:
+        cur = self.cnt.get(d, {})
+        prev = self.cnt.get(self.prev_day.get(d), {})
+        return sum(1 for g in cur if g not in prev)
+
+    def total(self) -> int:
+        return sum(self._term(d) for d in self.cnt)
+
+    def _try(self, s: int, new_order: List[int]) -> bool:
+        old_c = self.contrib[s]
+        new_c = _spans(new_order, self.gvol[s], self.slices[s])
+        if new_c == old_c:
+            return False
+        touched = set(old_c) | set(new_c)
+        touched |= {self.next_day[d] for d in touched if d in self.next_day}
+        before = sum(self._term(d) for d in touched)
+        self._add(old_c, -1)
+        self._add(new_c, 1)
+        if sum(self._term(d) for d in touched) < before:
+            self.order[s], self.contrib[s] = new_order, new_c
+            return True
+        self._add(new_c, -1)
+        self._add(old_c, 1)
+        return False
+
+    def improve(self, order: List[List[int]], deadline: float) -> Tuple[List[List[int]], int]:
+        """Busca local (primeira melhora): move um setup para o início/fim da
+        sequência ou troca dois vizinhos, até não haver ganho ou acabar o tempo.
+        """
+        self._setup(order)
+        # só importa a ordem de quem tem 2+ setups espalhados em 2+ dias
+        cand = [s for s, o in enumerate(self.order) if len(o) > 1 and len(self.slices[s]) > 1]
+        moves = 0
+        improved = True
+        while improved and cand:
+            improved = False
+            for s in cand:
+                o = self.order[s]
+                for i in range(len(o)):
+                    if time.perf_counter() > deadline:
+                        return self.order, moves
+                    o = self.order[s]
+                    tries = []
+                    if i + 1 < len(o):
+                        tries.append(o[:i] + [o[i + 1], o[i]] + o[i + 2:])
+                    if i > 0:
+                        tries.append([o[i]] + o[:i] + o[i + 1:])
+                    if i < len(o) - 1:
+                        tries.append(o[:i] + o[i + 1:] + [o[i]])
+                    for t in tries:
+                        if self._try(s, t):
+                            moves += 1
+                            improved = True
+                            break
+        return self.order, moves
+
+
+def plan_setup_order(
+    lot_seq: np.ndarray,
+    lot_setup: np.ndarray,
+    lot_vol: np.ndarray,
+    stage_seqs: List[List[int]],
+    alloc_day: np.ndarray,
+    alloc_lot: np.ndarray,
+    alloc_take: np.ndarray,
+    time_budget_s: float = ORDER_BUDGET_SECONDS,
+) -> Tuple[np.ndarray, OrderStats]:
+    """Nova ordem dos lotes que reduz as trocas de setup entre dias.
+
+    Entradas na ordem padrão dos lotes (``lot_seq`` crescente) e as alocações
+    de uma execução com essa ordem. Retorna a permutação dos lotes (cada
+    sequência continua na sua faixa; lotes do mesmo setup ficam juntos) e as
+    estatísticas (trocas estimadas antes/depois).
+    """
+    t0 = time.perf_counter()
+    n_seq = int(lot_seq.max()) + 1 if len(lot_seq) else 0
+
+    stage = np.zeros(n_seq, dtype=np.int64)
+    next_seq = np.full(n_seq, -1, dtype=np.int64)
+    for si, seqs in enumerate(stage_seqs):
+        for a, s in enumerate(seqs):
+            stage[s] = si
+            if a + 1 < len(seqs):
+                next_seq[s] = seqs[a + 1]
+
+    # grupos de setup por sequência, na ordem padrão
+    groups: List[List[int]] = [[] for _ in range(n_seq)]
+    gvol: List[Dict[int, float]] = [{} for _ in range(n_seq)]
+    for s, g, v in zip(lot_seq.tolist(), lot_setup.tolist(), lot_vol.tolist()):
+        if v <= _EPS:
+            continue
+        if g not in gvol[s]:
+            groups[s].append(g)
+            gvol[s][g] = 0.0
+        gvol[s][g] += v
+
+    # volume consumido por sequência e dia (independe da ordem dos lotes)
+    slices: List[List[Tuple[int, float]]] = [[] for _ in range(n_seq)]
+    if len(alloc_day):
+        sd = pd.DataFrame({"s": lot_seq[alloc_lot], "d": alloc_day, "v": alloc_take})
+        sd = sd.groupby(["s", "d"], sort=True)["v"].sum()
+        for (s, d), v in sd.items():
+            slices[int(s)].append((int(d), float(v)))
+
+    planner = _Planner(groups, gvol, slices, stage, next_seq)
+    planner._setup(groups)
+    trocas_inicial = planner.total()
+    greedy = planner.greedy()
+    planner._setup(greedy)
+    trocas_gulosa = planner.total()
+    final, moves = planner.improve(greedy, t0 + max(float(time_budget_s), 0.0))
+
+    # permutação: lotes de cada sequência pela posição do seu setup (estável na ordem padrão)
+    pos = [{g: k for k, g in enumerate(o)} for o in final]
+    rank = np.array([pos[s].get(g, len(pos[s])) for s, g in zip(lot_seq.tolist(), lot_setup.tolist())], dtype=np.int64)
+    perm = np.lexsort((np.arange(len(lot_seq)), rank, lot_seq))
+
+    stats = OrderStats(
+        trocas_inicial=trocas_inicial,
+        trocas_gulosa=trocas_gulosa,
+        trocas=planner.total(),
+        movimentos=moves,
+        segundos=time.perf_counter() - t0,
+    )
+    return perm, stats